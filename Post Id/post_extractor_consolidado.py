@@ -4,15 +4,28 @@ import time
 import json
 import datetime as dt
 import requests
-import pandas as pd
 from dotenv import load_dotenv
 
 # Agregar el path del directorio para importar leadpier_auth
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Mainteinance and Scaling'))
+from lazy_imports import lazy_import
 from leadpier_auth import ensure_leadpier_token
+from json_decoding import decode_response, decode_response_page
+from meta_insights import iter_records
+from http_transport import http_request, reset_transfer_stats, print_transfer_summary
+from resilience import (CircuitOpenError, DeadlineExceeded, budgeted_sleep, deadline_expired,
+                        with_cycle_deadline, print_circuit_summary)
+from logging_setup import setup_logging, get_logger
+
+pd = lazy_import("pandas")  # Se carga en el primer uso, no al arrancar
+np = lazy_import("numpy")   # Solo lo usa el scoring vectorizado
+log = get_logger("post_extractor")  # Detalle por adset en DEBUG (LOG_LEVEL), resumen por cuenta en INFO
 
 # ================== CONFIG ==================
-load_dotenv(dotenv_path="../Mainteinance and Scaling/enviorement.env")
+# Rutas relativas al script (no al cwd): el daemon aloja varios scripts en un mismo proceso
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_FILE = os.path.join(BASE_DIR, "..", "Mainteinance and Scaling", "enviorement.env")
+load_dotenv(dotenv_path=ENV_FILE)
 
 GRAPH_API_VERSION = "v23.0"
 FB_ACCESS_TOKEN   = os.getenv("FB_ACCESS_TOKEN")
@@ -30,6 +43,13 @@ AD_ACCOUNTS = [
 ROI_POSITIVE_THRESHOLD = 0.0  # ROI >= 0
 MIN_SPEND_THRESHOLD = 20.0    # Spend >= 20
 
+# Deadline de la corrida: timeouts y reintentos se recortan al tiempo restante
+CYCLE_DEADLINE_SECONDS = float(os.getenv("CYCLE_DEADLINE_SECONDS", "540"))
+
+# Modo incremental: estado de la corrida anterior (adsets calificados y sus posts resueltos)
+INCREMENTAL_STATE_FILE = os.path.join(BASE_DIR, "post_extractor_state.json")
+INCREMENTAL_STATE_MAX_AGE_HOURS = 6  # Pasado este tiempo se vuelven a resolver los posts (ads nuevos)
+
 # ================== HELPERS ==================
 def today_utc_minus_4_str():
     """Devuelve la fecha de hoy en UTC-4 (timezone de Facebook)"""
@@ -67,6 +87,8 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
         initial_timeout: timeout inicial en segundos
         **kwargs: otros argumentos para requests (headers, data, params, etc.)
     
+    Los timeouts y esperas se recortan al deadline del ciclo en curso.
+    
     Returns:
         Response object o None si falla después de todos los reintentos
     """
@@ -78,9 +100,9 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             print(f"[Leadpier] Intento {attempt + 1}/{max_retries} (timeout: {timeout}s)...")
             
             if method.upper() == 'GET':
-                response = requests.get(url, timeout=timeout, **kwargs)
+                response = http_request('GET', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             elif method.upper() == 'POST':
-                response = requests.post(url, timeout=timeout, **kwargs)
+                response = http_request('POST', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             else:
                 raise ValueError(f"Método no soportado: {method}")
             
@@ -93,10 +115,16 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             if attempt < max_retries - 1:
                 wait_time = 5 * (attempt + 1)  # Esperar 5s, 10s, 15s...
                 print(f"[Leadpier] Esperando {wait_time}s antes del siguiente intento...")
-                time.sleep(wait_time)
+                if not budgeted_sleep(wait_time):
+                    return None
             else:
                 print("[Leadpier] ERROR: Todos los reintentos fallaron por timeout/conexión")
                 return None
+        
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            # Sin reintentos: el endpoint está caído o el ciclo se quedó sin tiempo
+            print(f"[Leadpier] {e}")
+            return None
                 
         except Exception as e:
             print(f"[Leadpier] Error inesperado: {type(e).__name__}: {e}")
@@ -104,17 +132,24 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
     
     return None
 
-def fb_get(url, params, retries=3, timeout=30):
+def fb_get(url, params, retries=3, timeout=30, fields=None):
     proxies = get_proxies()
     for i in range(retries):
         try:
-            r = requests.get(url, params=params, timeout=timeout, proxies=proxies)
+            r = http_request('GET', url, attempt=i + 1, params=params, timeout=timeout, proxies=proxies, stream=bool(fields))
             if r.status_code == 200:
-                return r.json()
+                if fields:
+                    # Páginas grandes: solo los campos necesarios de cada registro
+                    return decode_response_page(r, fields)
+                return decode_response(r)
             print(f"[FB GET] {r.status_code}: {r.text[:200]}")
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[FB GET] {e}")
+            return {}
         except Exception as e:
             print(f"[FB GET] intento {i+1} error: {e}")
-        time.sleep(2)
+        if i < retries - 1 and not budgeted_sleep(2):
+            break
     return {}
 
 # ================== LEADPIER ==================
@@ -147,7 +182,7 @@ def fetch_leadpier_sources_df():
         return pd.DataFrame()
 
     try:
-        data = r.json()
+        data = decode_response(r)
     except Exception as e:
         print("[Leadpier] JSON error:", e, r.text[:200])
         return pd.DataFrame()
@@ -207,59 +242,39 @@ def fetch_leadpier_sources_df():
     return df
 
 # ================== META ==================
-def fetch_account_adsets(account_id):
-    """Obtiene todos los adsets activos de una cuenta"""
+ADSET_FIELDS = ("id", "name", "status")
+
+def iter_account_adsets(account_id):
+    """Recorre los adsets activos de una cuenta página por página"""
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/adsets"
     params = {
         "access_token": FB_ACCESS_TOKEN,
-        "fields": "id,name,status",
+        "fields": ",".join(ADSET_FIELDS),
         "limit": 200
     }
-    rows = []
-    while True:
-        page = fb_get(url, params) or {}
-        rows.extend(page.get("data", []))
-        next_url = page.get("paging", {}).get("next")
-        if not next_url:
-            break
-        url, params = next_url, {}
-    
-    # Filtrar solo adsets activos
-    active_rows = [row for row in rows if row.get("status") == "ACTIVE"]
-    return active_rows
+    for row in iter_records(fb_get, url, params, fields=ADSET_FIELDS):
+        if row.get("status") == "ACTIVE":
+            yield row
 
-def fetch_adsets_report(account_id, start_date, end_date):
-    """Obtiene reporte completo de adsets para un rango de fechas usando Ads Reporting API"""
+REPORT_FIELDS = ("adset_id", "adset_name", "spend")
+
+def iter_adsets_report(account_id, start_date, end_date):
+    """Recorre el reporte de adsets de un rango de fechas (Ads Reporting API) registro por registro"""
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/insights"
     params = {
         "access_token": FB_ACCESS_TOKEN,
-        "fields": "adset_id,adset_name,spend",
+        "fields": ",".join(REPORT_FIELDS),
         "time_range": json.dumps({"since": start_date, "until": end_date}),
         "level": "adset",
         "limit": 1000
     }
     
-    all_data = []
-    while True:
-        data = fb_get(url, params) or {}
-        if not data.get("data"):
-            break
-        
-        all_data.extend(data.get("data", []))
-        
-        # Verificar si hay más páginas
-        paging = data.get("paging", {})
-        next_url = paging.get("next")
-        if not next_url:
-            break
-        
-        # Actualizar URL y parámetros para la siguiente página
-        url = next_url
-        params = {}
-    
-    # Convertir a diccionario para búsqueda rápida
+    yield from iter_records(fb_get, url, params, fields=REPORT_FIELDS)
+
+def fetch_adsets_report(account_id, start_date, end_date):
+    """Indexa el reporte de adsets en un dict adset_id -> spend, consumiendo una página a la vez"""
     spend_data = {}
-    for item in all_data:
+    for item in iter_adsets_report(account_id, start_date, end_date):
         adset_id = item.get("adset_id")
         spend = float(item.get("spend", 0) or 0)
         if adset_id:
@@ -286,11 +301,49 @@ def fetch_adset_spend_today(adset_id):
         spend_value = float(data.get("data", [{}])[0].get("spend", 0) or 0)
         return spend_value
     except Exception as e:
-        print(f"[ERROR] Error procesando spend para adset {adset_id}: {e}")
+        log.error("Error procesando spend para adset %s: %s", adset_id, e)
         return 0.0
 
-def fetch_adset_ads_with_posts(adset_id):
-    """Obtiene los ads de un adset y extrae los post_ids"""
+class PostDeduplicator:
+    """
+    Estado de de-duplicación compartido durante una corrida del extractor
+    - Recuerda el story_id resuelto para cada creative_id (evita repetir la llamada a la API)
+    - Recuerda los story_ids ya emitidos (un post compartido por varios ads se emite una sola vez)
+    """
+    
+    def __init__(self):
+        self.creative_story_ids = {}  # creative_id -> story_id (o None si no tiene post)
+        self.seen_story_ids = set()
+        self.duplicates_skipped = 0
+        self.requests_saved = 0
+    
+    def resolve_story_id(self, creative_id):
+        """Devuelve el story_id del creative, consultando la API solo la primera vez"""
+        if creative_id in self.creative_story_ids:
+            self.requests_saved += 1
+            return self.creative_story_ids[creative_id]
+        
+        creative_details = fetch_creative_details(creative_id)
+        story_id = extract_post_id_from_creative(creative_details)
+        self.creative_story_ids[creative_id] = story_id
+        return story_id
+    
+    def is_duplicate(self, story_id):
+        """Registra el story_id y devuelve True si ya había sido emitido antes"""
+        if story_id in self.seen_story_ids:
+            self.duplicates_skipped += 1
+            return True
+        self.seen_story_ids.add(story_id)
+        return False
+
+def resolve_adset_posts(adset_id, dedup):
+    """
+    Obtiene los ads activos de un adset y resuelve el post de cada uno
+    (sin filtrar posts repetidos entre adsets; eso se hace al emitir)
+    
+    Returns:
+        lista de posts, o None si la consulta de ads falló (no distinguir de "sin posts")
+    """
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{adset_id}/ads"
     params = {
         "access_token": FB_ACCESS_TOKEN,
@@ -299,7 +352,9 @@ def fetch_adset_ads_with_posts(adset_id):
     }
     
     ads_data = fb_get(url, params) or {}
-    ads_list = ads_data.get("data", [])
+    if "data" not in ads_data:
+        return None
+    ads_list = ads_data["data"]
     
     post_ids = []
     
@@ -307,10 +362,9 @@ def fetch_adset_ads_with_posts(adset_id):
         if ad.get("status") == "ACTIVE":
             creative = ad.get("creative", {})
             
-            # Obtener detalles del creative
+            # Obtener detalles del creative (solo si no se resolvió antes)
             if creative.get("id"):
-                creative_details = fetch_creative_details(creative["id"])
-                post_id = extract_post_id_from_creative(creative_details)
+                post_id = dedup.resolve_story_id(creative["id"])
                 
                 if post_id:
                     post_ids.append({
@@ -321,6 +375,21 @@ def fetch_adset_ads_with_posts(adset_id):
     
     return post_ids
 
+def fetch_adset_ads_with_posts(adset_id, dedup=None):
+    """
+    Obtiene los ads de un adset y extrae los post_ids
+    
+    Args:
+        adset_id: ID del adset
+        dedup: PostDeduplicator compartido entre adsets (opcional); si se pasa, los
+               creatives ya resueltos no se vuelven a consultar y los posts repetidos se omiten
+    """
+    if dedup is None:
+        dedup = PostDeduplicator()
+    
+    posts = resolve_adset_posts(adset_id, dedup) or []
+    return [post for post in posts if not dedup.is_duplicate(post["post_id"])]
+
 def fetch_creative_details(creative_id):
     """Obtiene solo el effective_object_story_id de un creative de Facebook"""
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{creative_id}"
@@ -397,10 +466,129 @@ def calculate_profit_multiplier(profit):
     else:
         return 1.0
 
+# Tablas de bins para el scoring vectorizado (mismos cortes que las funciones escalares)
+# Tuplas: pasan a arrays dentro del kernel para no importar numpy al cargar el módulo
+SPEND_PUNCTUATION_BINS = (20.0, 100.0, 1000.0, 5000.0)
+SPEND_PUNCTUATION_TABLE = (0, 1, 2, 3, 4)
+PROFIT_PUNCTUATION_BINS = (50.0, 100.0, 200.0, 500.0, 1000.0)
+PROFIT_PUNCTUATION_TABLE = (0.1, 0.2, 0.4, 0.6, 0.8, 1.0)
+PROFIT_MULTIPLIER_BINS = (200.0, 500.0, 1000.0)
+PROFIT_MULTIPLIER_TABLE = (1.0, 1.1, 1.3, 1.5)
+
+def calculate_hybrid_scores(spend, roi, profit):
+    """
+    Kernel vectorizado del sistema híbrido: calcula en una sola pasada por columnas
+    las 4 puntuaciones, base_score y total_score.
+    Equivale a aplicar fila por fila las funciones calculate_*_punctuation / calculate_profit_multiplier.
+    
+    Args:
+        spend, roi, profit: arrays (o Series) de la misma longitud
+    
+    Returns:
+        dict con arrays: spend_punctuation, roi_punctuation, profit_punctuation,
+        profit_multiplier, base_score, total_score
+    """
+    spend = np.asarray(spend, dtype=np.float64)
+    roi = np.asarray(roi, dtype=np.float64)
+    profit = np.asarray(profit, dtype=np.float64)
+    
+    # Spend: lookup por bins [20, 100, 1000, 5000); NaN cae en "else" (0) como en la versión escalar
+    spend_punctuation = np.asarray(SPEND_PUNCTUATION_TABLE)[np.digitize(spend, SPEND_PUNCTUATION_BINS)]
+    spend_punctuation = np.where(np.isnan(spend), 0, spend_punctuation)
+    
+    # ROI: escalones de 10% (sin tope superior), misma aritmética que calculate_roi_punctuation
+    roi_punctuation = np.select(
+        [roi < 0, roi >= 100],
+        [0.0, 1.0 + np.floor_divide(roi - 100, 10) * 0.1],
+        default=(np.floor_divide(roi, 10) + 1) * 0.1,
+    )
+    
+    # Profit: lookup por bins (NaN cae en el último bin, igual que la versión escalar)
+    profit_punctuation = np.asarray(PROFIT_PUNCTUATION_TABLE)[np.digitize(profit, PROFIT_PUNCTUATION_BINS)]
+    
+    # Multiplicador: lookup por bins; NaN no cumple ningún umbral -> 1.0
+    profit_multiplier = np.asarray(PROFIT_MULTIPLIER_TABLE)[np.digitize(profit, PROFIT_MULTIPLIER_BINS)]
+    profit_multiplier = np.where(np.isnan(profit), 1.0, profit_multiplier)
+    
+    # Puntuación híbrida: (Spend × ROI × Profit) × Multiplier
+    base_score = spend_punctuation * roi_punctuation * profit_punctuation
+    total_score = base_score * profit_multiplier
+    
+    return {
+        "spend_punctuation": spend_punctuation,
+        "roi_punctuation": roi_punctuation,
+        "profit_punctuation": profit_punctuation,
+        "profit_multiplier": profit_multiplier,
+        "base_score": base_score,
+        "total_score": total_score,
+    }
+
+# ================== ESTADO INCREMENTAL ==================
+def load_incremental_state(today):
+    """
+    Carga el estado de la corrida anterior si es del mismo día (UTC-4); cada adset vence por
+    separado cuando sus posts se resolvieron hace más de INCREMENTAL_STATE_MAX_AGE_HOURS
+    (así los ads nuevos del día se recogen aunque las corridas sean frecuentes)
+    
+    Returns:
+        dict adset_id -> {"account_id", "adset_name", "posts": [...], "resolved_at"} (vacío si no hay estado válido)
+    """
+    if not os.path.exists(INCREMENTAL_STATE_FILE):
+        print("[INCREMENTAL] Sin estado previo - corrida completa")
+        return {}
+    
+    try:
+        with open(INCREMENTAL_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception as e:
+        print(f"[INCREMENTAL] Error al leer estado: {e} - corrida completa")
+        return {}
+    
+    if state.get("date") != today:
+        print(f"[INCREMENTAL] Estado de otro día ({state.get('date')}) - corrida completa")
+        return {}
+    
+    max_age_seconds = INCREMENTAL_STATE_MAX_AGE_HOURS * 3600
+    now = time.time()
+    adsets = {adset_id: entry for adset_id, entry in state.get("adsets", {}).items()
+              if now - entry.get("resolved_at", 0) <= max_age_seconds}
+    expired = len(state.get("adsets", {})) - len(adsets)
+    print(f"[INCREMENTAL] Estado previo cargado: {len(adsets)} adsets calificados "
+          f"({expired} vencidos por tener más de {INCREMENTAL_STATE_MAX_AGE_HOURS}h se vuelven a resolver)")
+    return adsets
+
+def save_incremental_state(today, qualifying_adsets):
+    """
+    Guarda de forma atómica los adsets calificados de esta corrida y sus posts resueltos
+    (cada adset conserva su resolved_at: reutilizarlo no lo rejuvenece)
+    """
+    state = {
+        "date": today,
+        "updated_at": time.time(),
+        "adsets": qualifying_adsets,
+    }
+    tmp_file = INCREMENTAL_STATE_FILE + ".tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, INCREMENTAL_STATE_FILE)
+        print(f"[INCREMENTAL] Estado guardado: {len(qualifying_adsets)} adsets calificados")
+    except Exception as e:
+        print(f"[INCREMENTAL] Error al guardar estado: {e}")
+
 # ================== MAIN FUNCTION ==================
-def extract_positive_roi_posts():
-    """Función principal que extrae posts de adsets con ROI >= 0 y spend >= 20"""
+@with_cycle_deadline(CYCLE_DEADLINE_SECONDS, "extractor de posts")
+def extract_positive_roi_posts(incremental=False):
+    """
+    Función principal que extrae posts de adsets con ROI >= 0 y spend >= 20
+    
+    Args:
+        incremental: Si True, reutiliza los posts resueltos en la corrida anterior del día
+                     y solo consulta ads de los adsets que recién pasaron los umbrales.
+                     Spend/revenue (y por lo tanto las puntuaciones) siempre se refrescan.
+    """
     print("\n=== EXTRACTOR DE POST IDs", dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "UTC ===")
+    reset_transfer_stats()
     
     # Validar token de Leadpier antes de continuar
     if not ensure_leadpier_token():
@@ -409,7 +597,7 @@ def extract_positive_roi_posts():
     
     # Recargar el token actualizado
     global LEADPIER_BEARER
-    load_dotenv(dotenv_path="../Mainteinance and Scaling/enviorement.env", override=True)
+    load_dotenv(dotenv_path=ENV_FILE, override=True)
     LEADPIER_BEARER = os.getenv("LEADPIER_BEARER")
     
     # 1) Obtener datos de Leadpier
@@ -437,15 +625,26 @@ def extract_positive_roi_posts():
     # 3) Lista para almacenar resultados
     positive_roi_posts = []
     filtered_count = 0
+    dedup = PostDeduplicator()  # De-duplicación temprana de creatives/posts entre adsets
+    
+    previous_adsets = load_incremental_state(today) if incremental else {}
+    qualifying_adsets = {}  # Estado de esta corrida: adset_id -> posts resueltos
+    reused_count = 0
+    fetched_count = 0
     
     # 4) Recorrer cuentas/adsets
     for account in AD_ACCOUNTS:
-        print(f"Procesando cuenta {account}...")
-        adsets = fetch_account_adsets(account)
-        
+        log.info("Procesando cuenta %s...", account)
         # page_id se extraerá del post_id cuando esté disponible
+        account_start = time.perf_counter()
+        account_adsets = account_valid = account_posts = 0
         
-        for adset in adsets:
+        for adset in iter_account_adsets(account):
+            if deadline_expired():
+                log.warning("[DEADLINE] Sin tiempo para seguir procesando %s; se exporta lo procesado", account)
+                break
+            account_adsets += 1
+
             adset_id = adset["id"]
             name = adset.get("name", "")
             
@@ -458,22 +657,42 @@ def extract_positive_roi_posts():
             # Obtener spend del diccionario optimizado
             spend = all_spend_data.get(adset_id, 0.0)
             if spend > 0:
-                print(f"[INFO] Adset {adset_id}: spend ${spend:.2f}")
+                log.debug("Adset %s: spend $%.2f", adset_id, spend)
             else:
-                print(f"[DEBUG] Sin datos de spend para adset {adset_id} en fecha {today}")
+                log.debug("Sin datos de spend para adset %s en fecha %s", adset_id, today)
             
             roi = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
             profit = revenue - spend
             
             # FILTRO: Solo procesar adsets con ROI >= 0 Y spend >= 20
             if roi >= ROI_POSITIVE_THRESHOLD and spend >= MIN_SPEND_THRESHOLD:
-                print(f"🎯 ADSET VÁLIDO: {name[:50]}... | ROI: {roi:.2f}% | Spend: ${spend:.2f} | Profit: ${profit:.2f}")
+                account_valid += 1
+                log.debug("🎯 ADSET VÁLIDO: %s... | ROI: %.2f%% | Spend: $%.2f | Profit: $%.2f", name[:50], roi, spend, profit)
+                
+                # Obtener post_ids de este adset (reutilizando los de la corrida anterior si sigue calificando)
+                if adset_id in previous_adsets:
+                    post_data = previous_adsets[adset_id]["posts"]
+                    resolved_at = previous_adsets[adset_id]["resolved_at"]
+                    reused_count += 1
+                else:
+                    post_data = resolve_adset_posts(adset_id, dedup)
+                    resolved_at = time.time()
+                    fetched_count += 1
                 
-                # Obtener post_ids de este adset
-                post_data = fetch_adset_ads_with_posts(adset_id)
+                if post_data is None:
+                    # Falló la consulta de ads: no se guarda, la próxima corrida lo vuelve a intentar
+                    log.warning("No se pudieron obtener los ads de %s", adset_id)
+                    post_data = []
+                else:
+                    qualifying_adsets[adset_id] = {
+                        "account_id": account,
+                        "adset_name": name,
+                        "posts": post_data,
+                        "resolved_at": resolved_at,
+                    }
                 
                 for post_info in post_data:
-                    if post_info["post_id"]:
+                    if post_info["post_id"] and not dedup.is_duplicate(post_info["post_id"]):
                         # Extraer page_id y post_id del formato page_id_post_id
                         post_id_parts = post_info["post_id"].split("_")
                         if len(post_id_parts) >= 2:
@@ -503,17 +722,36 @@ def extract_positive_roi_posts():
                             "profit": profit
                         })
                         
-                        print(f"   📎 Link: {facebook_link}")
+                        account_posts += 1
+                        log.debug("   📎 Link: %s", facebook_link)
             else:
                 if spend < MIN_SPEND_THRESHOLD:
                     filtered_count += 1
-                    print(f"🚫 FILTRADO (spend < ${MIN_SPEND_THRESHOLD}): {name[:50]}... | Spend: ${spend:.2f}")
+                    log.debug("🚫 FILTRADO (spend < $%s): %s... | Spend: $%.2f", MIN_SPEND_THRESHOLD, name[:50], spend)
                 elif roi < ROI_POSITIVE_THRESHOLD:
-                    print(f"🚫 FILTRADO (ROI < {ROI_POSITIVE_THRESHOLD}%): {name[:50]}... | ROI: {roi:.2f}%")
+                    log.debug("🚫 FILTRADO (ROI < %s%%): %s... | ROI: %.2f%%", ROI_POSITIVE_THRESHOLD, name[:50], roi)
+        
+        log.info("Cuenta %s: %d adsets | %d válidos | %d posts nuevos | %.1fs", account,
+                 account_adsets, account_valid, account_posts, time.perf_counter() - account_start)
     
     print(f"\n📊 RESUMEN DE FILTROS:")
     print(f"   🚫 Adsets filtrados por spend < ${MIN_SPEND_THRESHOLD}: {filtered_count}")
     print(f"   ✅ Adsets válidos procesados: {len(positive_roi_posts)}")
+    print(f"   🗑️ Posts duplicados omitidos antes de resolver: {dedup.duplicates_skipped}")
+    print(f"   💾 Requests de creatives ahorrados: {dedup.requests_saved}")
+    
+    if incremental:
+        dropped_count = len(set(previous_adsets) - set(qualifying_adsets))
+        print(f"\n🔁 RESUMEN INCREMENTAL:")
+        print(f"   ♻️ Adsets reutilizados (sin refetch de posts): {reused_count}")
+        print(f"   🆕 Adsets nuevos consultados: {fetched_count}")
+        print(f"   ➖ Adsets que dejaron de calificar: {dropped_count}")
+    
+    print_transfer_summary()
+    print_circuit_summary()
+    
+    # Guardar siempre el estado para que la próxima corrida pueda ser incremental
+    save_incremental_state(today, qualifying_adsets)
     
     return positive_roi_posts
 
@@ -528,22 +766,18 @@ def remove_duplicates_and_score(posts_data):
     # Convertir a DataFrame para facilitar el procesamiento
     df = pd.DataFrame(posts_data)
     
-    # 1) Remover duplicados basados en facebook_link
+    # 1) Remover duplicados basados en facebook_link (red de seguridad: la mayoría ya se omitió al resolver creatives)
     df_unique = df.drop_duplicates(subset=['facebook_link'], keep='first')
     
     duplicates_removed = len(df) - len(df_unique)
     print(f"   🗑️ Duplicados removidos: {duplicates_removed}")
     print(f"   ✅ Posts únicos: {len(df_unique)}")
     
-    # 2) Calcular puntuaciones individuales
-    df_unique['spend_punctuation'] = df_unique['spend'].apply(calculate_spend_punctuation)
-    df_unique['roi_punctuation'] = df_unique['roi'].apply(calculate_roi_punctuation)
-    df_unique['profit_punctuation'] = df_unique['profit'].apply(calculate_profit_punctuation)
-    df_unique['profit_multiplier'] = df_unique['profit'].apply(calculate_profit_multiplier)
-    
-    # 3) Calcular puntuación híbrida: (Spend × ROI × Profit) × Multiplier
-    df_unique['base_score'] = df_unique['spend_punctuation'] * df_unique['roi_punctuation'] * df_unique['profit_punctuation']
-    df_unique['total_score'] = df_unique['base_score'] * df_unique['profit_multiplier']
+    # 2-3) Calcular puntuaciones individuales e híbrida en un solo kernel vectorizado
+    df_unique = df_unique.copy()
+    scores = calculate_hybrid_scores(df_unique['spend'], df_unique['roi'], df_unique['profit'])
+    for col, values in scores.items():
+        df_unique[col] = values
     
     # 4) Ordenar por puntuación total (mayor a menor)
     df_unique = df_unique.sort_values('total_score', ascending=False)
@@ -588,7 +822,7 @@ def export_results(posts_data):
         return
     
     df = pd.DataFrame(processed_data)
-    output_file = "positive_roi_posts_final.csv"
+    output_file = os.path.join(BASE_DIR, "positive_roi_posts_final.csv")
     df.to_csv(output_file, index=False)
     
     print(f"\n📁 RESULTADOS EXPORTADOS:")
@@ -607,7 +841,7 @@ def export_results(posts_data):
     simple_list = create_simple_list(processed_data)
     
     # Exportar lista simple a archivo de texto (SIN SCORE)
-    simple_file = "lista_ordenada_adsets.txt"
+    simple_file = os.path.join(BASE_DIR, "lista_ordenada_adsets.txt")
     with open(simple_file, 'w', encoding='utf-8') as f:
         f.write("LISTA ORDENADA DE ADSETS CON ROI POSITIVO\n")
         f.write("=" * 50 + "\n\n")
@@ -632,13 +866,19 @@ def export_results(posts_data):
 
 # ================== EXECUTION ==================
 if __name__ == "__main__":
+    # Logging en segundo plano (LOG_LEVEL=DEBUG para ver el detalle por adset)
+    setup_logging()
+    
     print("🚀 EXTRACTOR DE POST IDs CON SISTEMA HÍBRIDO")
     print("🔄 SISTEMA: (Spend × ROI × Profit) × Profit_Multiplier")
     print(f"🚫 FILTROS: ROI >= {ROI_POSITIVE_THRESHOLD}% Y Spend >= ${MIN_SPEND_THRESHOLD}")
     print("=" * 60)
     
-    # Ejecutar extracción
-    results = extract_positive_roi_posts()
+    # Ejecutar extracción (--incremental: solo revisita adsets cuya calificación cambió)
+    incremental = "--incremental" in sys.argv
+    if incremental:
+        print("🔁 MODO INCREMENTAL activado")
+    results = extract_positive_roi_posts(incremental=incremental)
     
     # Exportar resultados
     export_results(results)
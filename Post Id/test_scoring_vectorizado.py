@@ -0,0 +1,103 @@
+"""
+Test del scoring vectorizado del extractor de posts
+Verifica paridad con las funciones escalares y mide el rendimiento a 1M filas
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Mismo layout que el extractor: este directorio + el directorio del sistema principal
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, '..'))
+
+from post_extractor_consolidado import (
+    calculate_hybrid_scores,
+    calculate_spend_punctuation,
+    calculate_roi_punctuation,
+    calculate_profit_punctuation,
+    calculate_profit_multiplier,
+)
+
+BENCHMARK_ROWS = 1_000_000
+
+
+def _sample_columns(n, seed=42):
+    """Genera columnas spend/roi/profit incluyendo bordes de bins y NaN"""
+    rng = np.random.default_rng(seed)
+    spend = rng.uniform(0, 8000, n)
+    roi = rng.uniform(-150, 400, n)
+    profit = rng.uniform(-500, 3000, n)
+
+    # Forzar valores exactamente en los cortes de cada tabla
+    edges_spend = [0, 19.99, 20, 99.99, 100, 999.99, 1000, 4999.99, 5000, np.nan]
+    edges_roi = [-0.01, 0, 9.99, 10, 99.99, 100, 105, 110, 250, np.nan]
+    edges_profit = [-1, 49.99, 50, 100, 199.99, 200, 500, 999.99, 1000, np.nan]
+    k = len(edges_spend)
+    spend[:k] = edges_spend
+    roi[:k] = edges_roi
+    profit[:k] = edges_profit
+    return spend, roi, profit
+
+
+def _scalar_scores(spend, roi, profit):
+    """Referencia: aplica las funciones escalares fila por fila (como el .apply original)"""
+    df = pd.DataFrame({"spend": spend, "roi": roi, "profit": profit})
+    df['spend_punctuation'] = df['spend'].apply(calculate_spend_punctuation)
+    df['roi_punctuation'] = df['roi'].apply(calculate_roi_punctuation)
+    df['profit_punctuation'] = df['profit'].apply(calculate_profit_punctuation)
+    df['profit_multiplier'] = df['profit'].apply(calculate_profit_multiplier)
+    df['base_score'] = df['spend_punctuation'] * df['roi_punctuation'] * df['profit_punctuation']
+    df['total_score'] = df['base_score'] * df['profit_multiplier']
+    return df
+
+
+def test_paridad_con_funciones_escalares():
+    spend, roi, profit = _sample_columns(20_000)
+    expected = _scalar_scores(spend, roi, profit)
+    scores = calculate_hybrid_scores(spend, roi, profit)
+
+    for col, values in scores.items():
+        np.testing.assert_array_equal(values, expected[col].to_numpy(dtype=np.float64), err_msg=col)
+
+
+def test_entrada_vacia():
+    scores = calculate_hybrid_scores([], [], [])
+    assert all(len(values) == 0 for values in scores.values())
+
+
+def benchmark_scoring(n=BENCHMARK_ROWS):
+    """Compara el kernel vectorizado contra los 4 .apply escalares"""
+    spend, roi, profit = _sample_columns(n)
+
+    start = time.perf_counter()
+    _scalar_scores(spend, roi, profit)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculate_hybrid_scores(spend, roi, profit)
+    vector_s = time.perf_counter() - start
+
+    return scalar_s, vector_s
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print(" TEST: Scoring híbrido vectorizado")
+    print("="*70)
+
+    print("\n[TEST 1] Paridad con funciones escalares...")
+    test_paridad_con_funciones_escalares()
+    test_entrada_vacia()
+    print("  ✓ Resultados idénticos (incluye bordes de bins y NaN)")
+
+    print(f"\n[TEST 2] Benchmark a {BENCHMARK_ROWS:,} filas...")
+    scalar_s, vector_s = benchmark_scoring()
+    print(f"  Escalar (.apply x4): {scalar_s:.3f}s")
+    print(f"  Vectorizado:         {vector_s:.3f}s")
+    print(f"  Speedup:             {scalar_s / vector_s:.1f}x")
+
+    print("\n" + "="*70)
@@ -4,15 +4,27 @@ import time
 import json
 import datetime as dt
 import requests
-import pandas as pd
 from dotenv import load_dotenv
 
 # Agregar el path del directorio padre para importar leadpier_auth
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lazy_imports import lazy_import
 from leadpier_auth import ensure_leadpier_token
+from insights_partition_cache import get_insights_partition_cache
+from meta_insights import standard_windows, fetch_adsets_daily_spend, iter_records
+from columnar_records import ColumnarRecords, FLOAT, BOOL, ID, STR, OBJECT, SPARSE
+from json_decoding import decode_response, decode_response_page
+from http_transport import http_request, reset_transfer_stats, print_transfer_summary
+from resilience import (CircuitOpenError, DeadlineExceeded, budgeted_sleep, deadline_expired,
+                        with_cycle_deadline, print_circuit_summary)
+
+pd = lazy_import("pandas")  # Se carga en el primer uso, no al arrancar
 
 # ================== CONFIG ==================
-load_dotenv(dotenv_path="../enviorement.env")
+# Rutas relativas al script (no al cwd): el daemon aloja varios scripts en un mismo proceso
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_FILE = os.path.join(BASE_DIR, "..", "enviorement.env")
+load_dotenv(dotenv_path=ENV_FILE)
 
 GRAPH_API_VERSION = "v23.0"
 FB_ACCESS_TOKEN   = os.getenv("FB_ACCESS_TOKEN")
@@ -30,6 +42,9 @@ AD_ACCOUNTS = [
 MIN_SPEND_THRESHOLD = 100.0  # USD - Mínimo spend requerido
 MIN_ROI_THRESHOLD = 0.0      # ROI mínimo requerido
 
+# Deadline del ciclo: timeouts y reintentos se recortan para no pisar la siguiente corrida
+CYCLE_DEADLINE_SECONDS = float(os.getenv("CYCLE_DEADLINE_SECONDS", "540"))
+
 # ================== HELPERS ==================
 def today_utc_minus_4_str():
     """Devuelve la fecha de hoy en UTC-4 (timezone de Facebook)"""
@@ -82,6 +97,8 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
         initial_timeout: timeout inicial en segundos
         **kwargs: otros argumentos para requests (headers, data, params, etc.)
     
+    Los timeouts y esperas se recortan al deadline del ciclo en curso.
+    
     Returns:
         Response object o None si falla después de todos los reintentos
     """
@@ -93,9 +110,9 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             print(f"[Leadpier] Intento {attempt + 1}/{max_retries} (timeout: {timeout}s)...")
             
             if method.upper() == 'GET':
-                response = requests.get(url, timeout=timeout, **kwargs)
+                response = http_request('GET', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             elif method.upper() == 'POST':
-                response = requests.post(url, timeout=timeout, **kwargs)
+                response = http_request('POST', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             else:
                 raise ValueError(f"Método no soportado: {method}")
             
@@ -108,10 +125,16 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             if attempt < max_retries - 1:
                 wait_time = 5 * (attempt + 1)  # Esperar 5s, 10s, 15s...
                 print(f"[Leadpier] Esperando {wait_time}s antes del siguiente intento...")
-                time.sleep(wait_time)
+                if not budgeted_sleep(wait_time):
+                    return None
             else:
                 print("[Leadpier] ERROR: Todos los reintentos fallaron por timeout/conexión")
                 return None
+        
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            # Sin reintentos: el endpoint está caído o el ciclo se quedó sin tiempo
+            print(f"[Leadpier] {e}")
+            return None
                 
         except Exception as e:
             print(f"[Leadpier] Error inesperado: {type(e).__name__}: {e}")
@@ -119,30 +142,41 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
     
     return None
 
-def fb_get(url, params, retries=3, timeout=30):
+def fb_get(url, params, retries=3, timeout=30, fields=None):
     proxies = get_proxies()
     for i in range(retries):
         try:
-            r = requests.get(url, params=params, timeout=timeout, proxies=proxies)
+            r = http_request('GET', url, attempt=i + 1, params=params, timeout=timeout, proxies=proxies, stream=bool(fields))
             if r.status_code == 200:
-                return r.json()
+                if fields:
+                    # Páginas grandes: solo los campos necesarios de cada registro
+                    return decode_response_page(r, fields)
+                return decode_response(r)
             print(f"[FB GET] {r.status_code}: {r.text[:200]}")
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[FB GET] {e}")
+            return {}
         except Exception as e:
             print(f"[FB GET] intento {i+1} error: {e}")
-        time.sleep(2)
+        if i < retries - 1 and not budgeted_sleep(2):
+            break
     return {}
 
 def fb_post(url, data, retries=3, timeout=30):
     proxies = get_proxies()
     for i in range(retries):
         try:
-            r = requests.post(url, data=data, timeout=timeout, proxies=proxies)
+            r = http_request('POST', url, attempt=i + 1, data=data, timeout=timeout, proxies=proxies)
             if r.status_code in (200, 201):
-                return r.json()
+                return decode_response(r)
             print(f"[FB POST] {r.status_code}: {r.text[:200]}")
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[FB POST] {e}")
+            return {}
         except Exception as e:
             print(f"[FB POST] intento {i+1} error: {e}")
-        time.sleep(2)
+        if i < retries - 1 and not budgeted_sleep(2):
+            break
     return {}
 
 # ================== LEADPIER ==================
@@ -175,7 +209,7 @@ def fetch_leadpier_sources_df():
         return pd.DataFrame()
 
     try:
-        data = r.json()
+        data = decode_response(r)
     except Exception as e:
         print("[Leadpier] JSON error:", e, r.text[:200])
         return pd.DataFrame()
@@ -241,65 +275,29 @@ def fetch_leadpier_sources_df():
     return df
 
 # ================== META ==================
-def fetch_account_adsets_paused(account_id):
-    """Obtiene todos los adsets de una cuenta (activos y pausados)"""
+ADSET_FIELDS = ("id", "name", "status")
+
+def iter_account_adsets_paused(account_id):
+    """Recorre los adsets pausados de una cuenta página por página"""
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/adsets"
     params = {
         "access_token": FB_ACCESS_TOKEN,
-        "fields": "id,name,status",
+        "fields": ",".join(ADSET_FIELDS),
         "limit": 200
     }
-    rows = []
-    while True:
-        page = fb_get(url, params) or {}
-        rows.extend(page.get("data", []))
-        next_url = page.get("paging", {}).get("next")
-        if not next_url:
-            break
-        url, params = next_url, {}
-    
-    # Filtrar solo adsets pausados
-    paused_rows = [row for row in rows if row.get("status") == "PAUSED"]
-    return paused_rows
+    for row in iter_records(fb_get, url, params, fields=ADSET_FIELDS):
+        if row.get("status") == "PAUSED":
+            yield row
 
-def fetch_adsets_report(account_id, start_date, end_date):
-    """Obtiene reporte completo de adsets para un rango de fechas usando Ads Reporting API"""
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/insights"
-    params = {
-        "access_token": FB_ACCESS_TOKEN,
-        "fields": "adset_id,adset_name,spend",
-        "time_range": json.dumps({"since": start_date, "until": end_date}),
-        "level": "adset",
-        "limit": 1000
-    }
-    
-    all_data = []
-    while True:
-        data = fb_get(url, params) or {}
-        if not data.get("data"):
-            break
-        
-        all_data.extend(data.get("data", []))
-        
-        # Verificar si hay más páginas
-        paging = data.get("paging", {})
-        next_url = paging.get("next")
-        if not next_url:
-            break
-        
-        # Actualizar URL y parámetros para la siguiente página
-        url = next_url
-        params = {}
-    
-    # Convertir a diccionario para búsqueda rápida
-    spend_data = {}
-    for item in all_data:
-        adset_id = item.get("adset_id")
-        spend = float(item.get("spend", 0) or 0)
-        if adset_id:
-            spend_data[adset_id] = spend
+def fetch_adsets_spend_days(account_id, days):
+    """
+    Obtiene el spend por adset de varios días en una sola consulta (time_increment=1)
+    Se usa para llenar las particiones faltantes del caché de Insights
     
-    return spend_data
+    Returns:
+        dict día -> {adset_id: spend}, o None si alguna página falló (para no cachear datos incompletos)
+    """
+    return fetch_adsets_daily_spend(fb_get, FB_ACCESS_TOKEN, account_id, min(days), max(days))
 
 def activate_adset(adset_id):
     """Activa un adset pausado"""
@@ -308,10 +306,20 @@ def activate_adset(adset_id):
     return fb_post(url, data)
 
 # ================== MAIN ==================
+# Columnas del reporte de activación (acumulado por columna, ver columnar_records.py)
+ACTIVATION_REPORT_SCHEMA = {
+    "account_id": STR, "adset_id": ID, "name": OBJECT, "status": STR,
+    "spend": FLOAT, "spend_today": FLOAT, "revenue": FLOAT, "roi": FLOAT,
+    "meets_spend_criteria": BOOL, "meets_roi_criteria": BOOL, "is_eligible": BOOL,
+    "activated": BOOL, "activation_result": SPARSE,
+}
+
+@with_cycle_deadline(CYCLE_DEADLINE_SECONDS, "prender adsets")
 def prender_adsets_elegibles():
     """Función principal para prender adsets pausados que cumplan los criterios
     Solo se ejecuta entre las 7PM UTC-4 y las 7AM UTC-4"""
     print("\n=== PRENDER ADSETS PAUSADOS", dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "UTC ===")
+    reset_transfer_stats()
     
     # Verificar horario
     if not is_within_execution_window_utc_minus_4():
@@ -329,7 +337,7 @@ def prender_adsets_elegibles():
     if token_valid:
         # Recargar el token actualizado
         global LEADPIER_BEARER
-        load_dotenv(dotenv_path="../enviorement.env", override=True)
+        load_dotenv(dotenv_path=ENV_FILE, override=True)
         LEADPIER_BEARER = os.getenv("LEADPIER_BEARER")
     else:
         print("[WARNING] Token de Leadpier invalido. Continuando sin datos de Leadpier...")
@@ -346,28 +354,48 @@ def prender_adsets_elegibles():
         print(f"[OK] Datos de Leadpier obtenidos: {len(lp_df)} registros")
         print(f"[DATE] Rango de fechas: {week_ago_utc_minus_4_str()} a {today_utc_minus_4_str()}")
 
-    # 2) Obtener reportes de spend de todas las cuentas
+    # 2) Obtener reportes de spend de todas las cuentas (ventanas hoy + 7 días en un solo mapa)
+    # Los días cerrados salen del caché particionado; los faltantes o mutables se piden en una sola consulta diaria
     print("Obteniendo reportes de spend de Meta para todas las cuentas...")
-    all_spend_data = {}
+    all_spend_windows = {}
+    incomplete_accounts = set()
+    insights_cache = get_insights_partition_cache()
+    today = today_utc_minus_4_str()
+    windows = standard_windows(today, lookback_days=7)
     
     for account in AD_ACCOUNTS:
         print(f"Obteniendo reporte de cuenta {account}...")
-        spend_data = fetch_adsets_report(account, week_ago_utc_minus_4_str(), today_utc_minus_4_str())
-        all_spend_data.update(spend_data)
-        print(f"   [OK] {len(spend_data)} adsets con datos de spend obtenidos")
+        spend_windows, incomplete = insights_cache.get_windows_spend(account, windows, fetch_adsets_spend_days,
+                                                                     today=today)
+        all_spend_windows.update(spend_windows)
+        if incomplete:
+            incomplete_accounts.add(account)
+            print(f"   [WARNING] Spend incompleto para {account}: sus adsets no se evalúan en esta corrida")
+        print(f"   [OK] {len(spend_windows)} adsets con datos de spend obtenidos")
     
-    print(f"[OK] Total de adsets con datos de spend: {len(all_spend_data)}")
+    print(f"[OK] Total de adsets con datos de spend: {len(all_spend_windows)}")
+    insights_cache.cleanup(today=today)  # las particiones viejas ya no entran en ninguna ventana
     
     # 3) Recorrer cuentas/adsets pausados
-    results = []
+    results = ColumnarRecords(ACTIVATION_REPORT_SCHEMA)
     adsets_to_activate = []
     
     for account in AD_ACCOUNTS:
         print(f"Revisando adsets pausados en cuenta {account}...")
-        paused_adsets = fetch_account_adsets_paused(account)
-        print(f"   [STATS] Adsets pausados encontrados: {len(paused_adsets)}")
+        paused_count = 0
+        sin_spend = 0
+
+        for adset in iter_account_adsets_paused(account):
+            if deadline_expired():
+                print(f"[DEADLINE] Sin tiempo para seguir revisando {account}; se exporta lo procesado")
+                break
+
+            paused_count += 1
+            if account in incomplete_accounts:
+                # Ventana de 7 días con días faltantes: el spend queda corto e infla el ROI
+                sin_spend += 1
+                continue
 
-        for adset in paused_adsets:
             adset_id = adset["id"]
             name = adset.get("name", "")
             status = adset.get("status", "")
@@ -378,8 +406,10 @@ def prender_adsets_elegibles():
             # Obtener revenue de Leadpier
             revenue = float(row["revenue"].iloc[0]) if not row.empty else 0.0
             
-            # Obtener spend del diccionario (mucho más eficiente)
-            spend = all_spend_data.get(adset_id, 0.0)
+            # Obtener spend del mapa multi-ventana (criterio sobre los últimos 7 días)
+            spend_windows = all_spend_windows.get(adset_id, {})
+            spend = spend_windows.get("7d", 0.0)
+            spend_today = spend_windows.get("today", 0.0)
             roi = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
 
             # Verificar criterios
@@ -387,23 +417,25 @@ def prender_adsets_elegibles():
             meets_roi_criteria = roi >= MIN_ROI_THRESHOLD
             is_eligible = meets_spend_criteria and meets_roi_criteria
 
-            results.append({
-                "account_id": account,
-                "adset_id": adset_id,
-                "name": name,
-                "status": status,
-                "spend": spend,
-                "revenue": revenue,
-                "roi": roi,
-                "meets_spend_criteria": meets_spend_criteria,
-                "meets_roi_criteria": meets_roi_criteria,
-                "is_eligible": is_eligible,
-                "activated": False,
-                "activation_result": None
-            })
+            row_index = results.append(
+                account_id=account,
+                adset_id=adset_id,
+                name=name,
+                status=status,
+                spend=spend,
+                spend_today=spend_today,
+                revenue=revenue,
+                roi=roi,
+                meets_spend_criteria=meets_spend_criteria,
+                meets_roi_criteria=meets_roi_criteria,
+                is_eligible=is_eligible,
+                activated=False,
+                activation_result=None
+            )
 
             if is_eligible:
                 adsets_to_activate.append({
+                    "row_index": row_index,
                     "adset_id": adset_id,
                     "name": name,
                     "spend": spend,
@@ -411,6 +443,8 @@ def prender_adsets_elegibles():
                     "revenue": revenue
                 })
 
+        print(f"   [STATS] Adsets pausados encontrados: {paused_count} | sin spend: {sin_spend}")
+
     # 4) Activar adsets elegibles
     print(f"\n[TARGET] Adsets elegibles para activar: {len(adsets_to_activate)}")
     
@@ -431,11 +465,8 @@ def prender_adsets_elegibles():
             success = resp.get("success", False) if isinstance(resp, dict) else False
             
             # Actualizar resultado en results
-            for result in results:
-                if result["adset_id"] == adset_id:
-                    result["activated"] = success
-                    result["activation_result"] = resp
-                    break
+            results.set(adset_info["row_index"], "activated", success)
+            results.set(adset_info["row_index"], "activation_result", resp)
             
             if success:
                 print(f"   [OK] Activado exitosamente")
@@ -443,12 +474,12 @@ def prender_adsets_elegibles():
                 print(f"   [ERROR] Error al activar: {str(resp)[:100]}")
 
     # 5) Exportar reporte
-    df = pd.DataFrame(results)
-    out = "adsets_activation_report.csv"
+    df = results.to_dataframe()
+    out = os.path.join(BASE_DIR, "adsets_activation_report.csv")
     df.to_csv(out, index=False)
     
-    activated_count = len([r for r in results if r["activated"]])
-    eligible_count = len([r for r in results if r["is_eligible"]])
+    activated_count = results.count("activated")
+    eligible_count = results.count("is_eligible")
     
     print(f"\n[FILE] Reporte de activación: {out}")
     print(f"[ACTIVANDO] Adsets activados: {activated_count}/{eligible_count} elegibles")
@@ -460,6 +491,8 @@ def prender_adsets_elegibles():
     print(f"   [STATS] ROI mínimo: {MIN_ROI_THRESHOLD}%")
     print(f"   [DATE] Rango de fechas: {week_ago_utc_minus_4_str()} a {today_utc_minus_4_str()}")
     print(f"   [TIME] Horario de ejecución: 7PM UTC-4 a 7AM UTC-4")
+    print_transfer_summary()
+    print_circuit_summary()
 
 # ================== EJECUCIÓN ==================
 if __name__ == "__main__":
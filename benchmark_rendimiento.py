@@ -0,0 +1,296 @@
+"""
+Benchmarks de rendimiento del sistema
+Uso:
+    python benchmark_rendimiento.py arranque [--runs 5] [--guardar]
+    python benchmark_rendimiento.py json [--rows 1000] [--pages 50] [--guardar]
+    python benchmark_rendimiento.py logging [--adsets 3000] [--latencia-us 0] [--guardar]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "benchmark_historial.jsonl")
+
+# Entry points: (nombre, directorio del script, módulo)
+ENTRY_POINTS = [
+    ("scheduler", BASE_DIR, "leadpiertest1"),
+    ("prender_adsets", os.path.join(BASE_DIR, "ReviewAndOn"), "prender_adsets_pausados"),
+    ("post_extractor", os.path.join(BASE_DIR, "Post Id"), "post_extractor_consolidado"),
+]
+
+# Módulos pesados que no deberían cargarse al arrancar
+HEAVY_MODULES = ["selenium", "seleniumwire", "webdriver_manager", "undetected_chromedriver", "pandas"]
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def save_history(kind, results):
+    """Agrega una corrida del benchmark al historial (JSON lines)"""
+    record = {"timestamp": datetime.now().isoformat(), "benchmark": kind, "results": results}
+    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\n[BENCH] Resultado agregado a {HISTORY_FILE}")
+
+
+# ================== ARRANQUE ==================
+def measure_import(script_dir, module):
+    """
+    Importa un entry point en un proceso nuevo con `python -X importtime`
+
+    Returns:
+        dict con cumulative_ms del módulo, wall_ms del proceso y módulos pesados cargados
+    """
+    code = f"import sys; sys.path[:0] = {[script_dir, BASE_DIR]!r}; import {module}"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=script_dir, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}: {proc.stderr.strip().splitlines()[-1:]}")
+
+    cumulative_us = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            cumulative_us[match.group(4)] = int(match.group(2))
+
+    return {
+        "cumulative_ms": cumulative_us.get(module, 0) / 1000,
+        "wall_ms": wall_ms,
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in cumulative_us],
+    }
+
+
+def benchmark_arranque(runs=5):
+    """Mide el tiempo de arranque en frío de cada entry point (mínimo de `runs` procesos)"""
+    print("\n" + "="*70)
+    print(" BENCHMARK: Arranque de entry points (python -X importtime)")
+    print("="*70)
+
+    results = {}
+    for name, script_dir, module in ENTRY_POINTS:
+        samples = [measure_import(script_dir, module) for _ in range(runs)]
+        best = min(samples, key=lambda sample: sample["cumulative_ms"])
+        results[name] = {
+            "import_ms": round(best["cumulative_ms"], 1),
+            "process_ms": round(min(sample["wall_ms"] for sample in samples), 1),
+            "heavy_loaded": best["heavy_loaded"],
+        }
+        heavy = ", ".join(best["heavy_loaded"]) or "ninguno"
+        print(f"\n  {name} ({module})")
+        print(f"    Import:  {results[name]['import_ms']:.1f} ms")
+        print(f"    Proceso: {results[name]['process_ms']:.1f} ms")
+        print(f"    Módulos pesados cargados al arrancar: {heavy}")
+
+    return results
+
+
+# ================== JSON ==================
+def build_insights_page(rows):
+    """Página de Insights sintética (limit=1000) con campos extra como en producción"""
+    data = []
+    for i in range(rows):
+        data.append({
+            "adset_id": str(23850000000000000 + i),
+            "adset_name": f"BM5_1 | Campaña {i % 40} | Adset {i}",
+            "spend": f"{(i * 7.31) % 500:.2f}",
+            "date_start": "2025-01-01",
+            "date_stop": "2025-01-08",
+            "actions": [{"action_type": "lead", "value": str(i % 13)},
+                        {"action_type": "link_click", "value": str(i % 97)}],
+            "cpc": f"{(i % 50) / 10:.2f}",
+        })
+    page = {"data": data, "paging": {"cursors": {"before": "MAZDZD", "after": "MjQZD"},
+                                      "next": "https://graph.facebook.com/v23.0/act_1/insights?after=MjQZD"}}
+    return json.dumps(page).encode()
+
+
+def measure_decoder(decode, payload, pages):
+    """CPU (process_time) y memoria pico (tracemalloc) por página decodificada"""
+    cpu_start = time.process_time()
+    for _ in range(pages):
+        decode(payload)
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / pages
+
+    tracemalloc.start()
+    result = decode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {"cpu_ms": round(cpu_ms, 3), "peak_kb": round(peak / 1024, 1)}
+
+
+def benchmark_json(rows=1000, pages=50):
+    """Compara json.loads, el backend rápido y el modo streaming sobre una página de Insights"""
+    from json_decoding import JSON_BACKEND, STREAMING_AVAILABLE, loads, decode_page
+
+    print("\n" + "="*70)
+    print(f" BENCHMARK: Decodificación JSON ({rows} filas por página, {pages} páginas)")
+    print(f" Backend: {JSON_BACKEND} | Streaming (ijson): {'sí' if STREAMING_AVAILABLE else 'no'}")
+    print("="*70)
+
+    payload = build_insights_page(rows)
+    fields = ("adset_id", "adset_name", "spend")
+    decoders = {
+        "json.loads": json.loads,
+        f"loads ({JSON_BACKEND})": loads,
+        "decode_page (proyección)": lambda p: decode_page(p, fields),
+    }
+
+    print(f"\n  Tamaño de página: {len(payload) / 1024:.1f} KB\n")
+    print(f"  {'Decodificador':<28}{'CPU/página':>14}{'Memoria pico':>16}")
+    results = {}
+    for name, decode in decoders.items():
+        results[name] = measure_decoder(decode, payload, pages)
+        print(f"  {name:<28}{results[name]['cpu_ms']:>11.2f} ms{results[name]['peak_kb']:>13.1f} KB")
+
+    return results
+
+
+# ================== LOGGING ==================
+class SlowStream:
+    """stdout simulado: line-buffered sobre /dev/null, con latencia opcional por write (Colab)"""
+
+    def __init__(self, latency_us=0):
+        self._sink = open(os.devnull, "w", buffering=1, encoding="utf-8")
+        self._latency_s = latency_us / 1e6
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        return self._sink.write(text)
+
+    def flush(self):
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
+
+
+def simulate_cycle(adsets, emit_print=None, log=None, accounts=3):
+    """
+    Ciclo sintético con el mismo patrón de salida que revisar_y_actualizar:
+    - emit_print: salida anterior (4 print por adset)
+    - log: logging con resumen por cuenta en INFO y detalle por adset en DEBUG
+    """
+    per_account = adsets // accounts
+    for account in range(accounts):
+        kept = paused = 0
+        for i in range(per_account):
+            spend = (i * 7.31) % 80
+            revenue = (i * 11.7) % 120
+            roi = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
+            pause = spend >= 25 and roi <= 0
+            reason = f"Spend ${spend:.2f} >= $25 y ROI {roi:.2f}% <= 0%" if pause else "Dentro de umbrales"
+            name = f"BM5_1 | Campaña {i % 40} | Adset {i}"
+            paused += pause
+            kept += not pause
+            if emit_print:
+                print(f"[INFO] Adset {i}: spend ${spend:.2f}")
+                print(f"[OK] MANTENER: {name[:50]}..." if not pause else f"[PAUSADO] PAUSADO: {name[:50]}...")
+                print(f"   [SPEND] Spend: ${spend:.2f} | [STATS] ROI: {roi:.2f}%")
+                print(f"   [REASON] Razón: {reason}")
+            elif log:
+                log.debug("Adset %s: spend $%.2f", i, spend)
+                log.debug("%s: %s | Spend: $%.2f | ROI: %.2f%% | %s",
+                          "PAUSAR" if pause else "MANTENER", name[:50], spend, roi, reason)
+        if log:
+            log.info("Cuenta %d: %d revisados | %d mantener | %d pausados", account, per_account, kept, paused)
+
+
+def benchmark_logging(adsets=3000, latency_us=0, runs=3):
+    """Tiempo de ciclo con la salida anterior (print), con logging en cola (INFO/DEBUG) y sin salida"""
+    from logging_setup import setup_logging, stop_logging, get_logger
+
+    print("\n" + "="*70)
+    print(f" BENCHMARK: Salida del ciclo ({adsets} adsets, latencia de stdout {latency_us} µs/write)")
+    print("="*70)
+
+    log = get_logger("benchmark")
+    modes = {
+        "sin salida": {},
+        "print (antes)": {"emit_print": True},
+        "logging INFO": {"level": "INFO"},
+        "logging DEBUG": {"level": "DEBUG"},
+    }
+
+    results = {}
+    print(f"\n  {'Modo':<18}{'Ciclo':>12}{'Vaciado':>12}{'Writes':>10}")
+    for mode, options in modes.items():
+        cycle_samples, drain_samples = [], []
+        for _ in range(runs):
+            stream = SlowStream(latency_us)
+            level = options.get("level")
+            if level:
+                setup_logging(level=level, stream=stream)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(stream):
+                simulate_cycle(adsets, emit_print=options.get("emit_print"), log=log if level else None)
+            cycle_samples.append(time.perf_counter() - start)
+            if level:
+                stop_logging()  # espera a que el escritor termine
+            drain_samples.append(time.perf_counter() - start - cycle_samples[-1])
+            writes = stream.writes
+            stream.close()
+        results[mode] = {
+            "cycle_ms": round(min(cycle_samples) * 1000, 1),
+            "drain_ms": round(min(drain_samples) * 1000, 1),
+            "writes": writes,
+        }
+        print(f"  {mode:<18}{results[mode]['cycle_ms']:>9.1f} ms{results[mode]['drain_ms']:>9.1f} ms{writes:>10}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    arranque = subparsers.add_parser("arranque", help="Tiempo de arranque de cada entry point")
+    arranque.add_argument("--runs", type=int, default=5, help="Procesos por entry point (se toma el mínimo)")
+    arranque.add_argument("--guardar", action="store_true", help="Agregar el resultado al historial")
+
+    json_parser = subparsers.add_parser("json", help="CPU y memoria pico por página JSON")
+    json_parser.add_argument("--rows", type=int, default=1000, help="Filas por página")
+    json_parser.add_argument("--pages", type=int, default=50, help="Páginas a decodificar")
+    json_parser.add_argument("--guardar", action="store_true", help="Agregar el resultado al historial")
+
+    logging_parser = subparsers.add_parser("logging", help="Tiempo de ciclo con salida por print vs logging en cola")
+    logging_parser.add_argument("--adsets", type=int, default=3000, help="Adsets del ciclo sintético")
+    logging_parser.add_argument("--latencia-us", type=int, default=0, help="Latencia simulada por write de stdout")
+    logging_parser.add_argument("--guardar", action="store_true", help="Agregar el resultado al historial")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "arranque":
+        results = benchmark_arranque(runs=args.runs)
+        if args.guardar:
+            save_history("arranque", results)
+    elif args.benchmark == "json":
+        results = benchmark_json(rows=args.rows, pages=args.pages)
+        if args.guardar:
+            save_history("json", results)
+    elif args.benchmark == "logging":
+        results = benchmark_logging(adsets=args.adsets, latency_us=args.latencia_us)
+        if args.guardar:
+            save_history("logging", results)
+
+    print("\n" + "="*70)
+
+
+if __name__ == "__main__":
+    main()
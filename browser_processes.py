@@ -0,0 +1,235 @@
+"""
+Memoria residente (RSS) de los procesos de un driver de Chrome
+- Suma chromedriver + Chrome + renderers/GPU (todo el árbol de procesos)
+- Usa psutil si está instalado; en Linux cae a /proc sin dependencias
+- Helpers para enumerar y terminar el árbol (ver browser_supervisor.py)
+"""
+import os
+import signal
+
+from lazy_imports import lazy_import, is_available
+
+PSUTIL_AVAILABLE = is_available("psutil")
+psutil = lazy_import("psutil")
+
+_PROC_DIR = "/proc"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def driver_root_pids(driver):
+    """PIDs raíz de un driver: el servicio chromedriver y el navegador (undetected lo lanza aparte)"""
+    pids = []
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    if process is not None and getattr(process, "pid", None):
+        pids.append(process.pid)
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid and browser_pid not in pids:
+        pids.append(browser_pid)
+    return pids
+
+
+def _proc_children():
+    """ppid -> [pid] leyendo /proc/<pid>/stat"""
+    children = {}
+    for entry in os.listdir(_PROC_DIR):
+        if not entry.isdigit():
+            continue
+        # El nombre del proceso va entre paréntesis y puede contener espacios
+        fields = _proc_stat_fields(entry)
+        if fields is None:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), "statm"), "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _proc_stat_fields(pid):
+    """Campos de /proc/<pid>/stat después del nombre (None si el proceso no existe)"""
+    try:
+        with open(os.path.join(_PROC_DIR, str(pid), "stat"), "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    return stat[stat.rfind(b")") + 2:].split()
+
+
+def process_start_time(pid):
+    """
+    Marca de inicio del proceso (None si ya no existe)
+    Junto con el PID identifica al proceso aunque el PID se reutilice
+    """
+    if PSUTIL_AVAILABLE:
+        try:
+            proc = psutil.Process(pid)
+            if proc.status() == psutil.STATUS_ZOMBIE:
+                return None
+            return proc.create_time()
+        except psutil.Error:
+            return None
+    fields = _proc_stat_fields(pid)
+    if fields is None:
+        return None
+    if fields[0] == b"Z":  # zombie: ya terminó, solo falta que el padre lo recoja
+        return None
+    return int(fields[19])  # starttime en ticks desde el arranque
+
+
+def process_tree_pids(root_pids):
+    """
+    PIDs vivos de los procesos raíz y todos sus descendientes
+
+    Returns:
+        lista de PIDs, o None si no hay forma de enumerarlos (sin psutil fuera de Linux)
+    """
+    if not root_pids:
+        return []
+
+    if PSUTIL_AVAILABLE:
+        pids = []
+        for pid in root_pids:
+            try:
+                root = psutil.Process(pid)
+                tree = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            pids.extend(proc.pid for proc in tree if proc.pid not in pids)
+        return pids
+
+    if not os.path.isdir(_PROC_DIR):
+        return None
+
+    children = _proc_children()
+    seen, stack, pids = set(), list(root_pids), []
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        if process_start_time(pid) is not None:
+            pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def kill_process(pid, force=False):
+    """Envía SIGTERM (o SIGKILL con force) a un proceso; False si ya no existía"""
+    if PSUTIL_AVAILABLE:
+        try:
+            proc = psutil.Process(pid)
+            proc.kill() if force else proc.terminate()
+            return True
+        except psutil.Error:
+            return False
+    try:
+        os.kill(pid, signal.SIGKILL if force and hasattr(signal, "SIGKILL") else signal.SIGTERM)
+        return True
+    except OSError:
+        return False
+
+
+def process_rss(pid=None):
+    """RSS (bytes) de un solo proceso (default: el actual); None si no se puede medir"""
+    pid = pid or os.getpid()
+    if PSUTIL_AVAILABLE:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    if not os.path.isdir(_PROC_DIR):
+        return None
+    return _proc_rss(pid)
+
+
+def process_tree_rss(root_pids):
+    """
+    RSS total (bytes) de los procesos raíz y todos sus descendientes
+
+    Returns:
+        bytes, o None si no hay forma de medirlo (sin psutil fuera de Linux)
+    """
+    if not root_pids:
+        return 0
+
+    if PSUTIL_AVAILABLE:
+        seen, total = set(), 0
+        for pid in root_pids:
+            try:
+                root = psutil.Process(pid)
+                tree = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            for proc in tree:
+                if proc.pid in seen:
+                    continue
+                seen.add(proc.pid)
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+        return total
+
+    if not os.path.isdir(_PROC_DIR):
+        return None
+
+    children = _proc_children()
+    seen, stack, total = set(), list(root_pids), 0
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _proc_rss(pid)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def driver_rss(driver):
+    """RSS total del driver (chromedriver + Chrome y sus hijos); None si no se puede medir"""
+    if driver is None:
+        return 0
+    return process_tree_rss(driver_root_pids(driver))
+
+
+def format_rss(n):
+    """Formatea bytes de RSS en MB (o 'n/d' si no se pudo medir)"""
+    if n is None:
+        return "n/d (instalar psutil)"
+    return f"{n / (1024 * 1024):.0f} MB"
+
+
+if __name__ == "__main__":
+    """Test de RSS sobre un árbol de procesos de prueba"""
+    import subprocess
+    import sys
+    import time
+
+    print("\n" + "="*70)
+    print(f" TEST: RSS de árbol de procesos (psutil: {PSUTIL_AVAILABLE})")
+    print("="*70 + "\n")
+
+    # Un proceso que lanza un hijo que reserva ~50 MB
+    child_code = "import time; data = bytearray(50 * 1024 * 1024); time.sleep(5)"
+    parent_code = f"import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', {child_code!r}]); time.sleep(5)"
+    parent = subprocess.Popen([sys.executable, "-c", parent_code])
+    time.sleep(1.5)
+
+    class FakeService:
+        process = parent
+
+    class FakeDriver:
+        service = FakeService()
+
+    rss = driver_rss(FakeDriver())
+    print(f"{'✓' if rss and rss > 50 * 1024 * 1024 else '✗'} RSS del árbol (padre + hijo): {format_rss(rss)}")
+    parent.kill()
+    print(f"{'✓' if driver_rss(None) == 0 else '✗'} Sin driver: 0 bytes")
+
+    print("\n" + "="*70)
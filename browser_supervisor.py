@@ -0,0 +1,253 @@
+"""
+Supervisor de procesos de Chrome/chromedriver
+- Cada driver creado se registra con el árbol de PIDs que lanzó (chromedriver, Chrome, renderers)
+- `quit_driver` refresca el árbol, llama a driver.quit() y mata lo que siga vivo después
+  de un período de gracia (SIGTERM y luego SIGKILL)
+- `reap` elimina los restos de drivers cuyo proceso raíz murió sin quit (crash, referencia perdida)
+- Los PIDs se identifican con su hora de inicio: un PID reutilizado por otro proceso no se mata
+"""
+import os
+import time
+import threading
+
+from browser_processes import (driver_root_pids, process_tree_pids, process_start_time,
+                               process_tree_rss, kill_process, format_rss)
+
+BROWSER_QUIT_GRACE_SECONDS = float(os.getenv("BROWSER_QUIT_GRACE_SECONDS", "5"))
+_KILL_WAIT_SECONDS = 2.0
+_POLL_SECONDS = 0.2
+
+
+class BrowserProcessSupervisor:
+    """Registro de drivers y sus procesos; mata los que sobreviven al quit"""
+
+    def __init__(self, grace_seconds=BROWSER_QUIT_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self.quits = 0
+        self.failed_quits = 0
+        self.killed = 0
+        self._lock = threading.Lock()
+        self._tracked = {}  # id(driver) -> {"kind", "roots", "pids": {pid: start_time}}
+
+    # ---------- registro ----------
+    def register(self, driver, kind="driver"):
+        """Registra un driver recién creado y los procesos que ya lanzó"""
+        if driver is None:
+            return
+        roots = driver_root_pids(driver)
+        with self._lock:
+            self._tracked[id(driver)] = {"kind": kind, "roots": roots, "pids": {}}
+        self._refresh(id(driver))
+
+    def _refresh(self, key):
+        """Agrega los descendientes nuevos (renderers que Chrome lanzó después)"""
+        with self._lock:
+            entry = self._tracked.get(key)
+            roots = list(entry["roots"]) if entry else []
+        pids = process_tree_pids(roots) or []
+        started = {pid: process_start_time(pid) for pid in pids}
+        with self._lock:
+            entry = self._tracked.get(key)
+            if entry is None:
+                return
+            for pid, start in started.items():
+                if start is not None:
+                    entry["pids"].setdefault(pid, start)
+
+    @staticmethod
+    def _alive(pids):
+        """Subconjunto de {pid: start_time} que sigue siendo el mismo proceso vivo"""
+        return {pid: start for pid, start in pids.items() if process_start_time(pid) == start}
+
+    def _kill_stragglers(self, pids):
+        """SIGTERM a los sobrevivientes, espera y SIGKILL a los que resisten; devuelve cuántos mató"""
+        alive = self._alive(pids)
+        if not alive:
+            return 0
+        for pid in alive:
+            kill_process(pid)
+        deadline = time.monotonic() + _KILL_WAIT_SECONDS
+        while time.monotonic() < deadline and self._alive(alive):
+            time.sleep(_POLL_SECONDS)
+        for pid in self._alive(alive):
+            kill_process(pid, force=True)
+        with self._lock:
+            self.killed += len(alive)
+        return len(alive)
+
+    # ---------- cierre ----------
+    def quit(self, driver):
+        """
+        Cierra un driver sin dejar procesos huérfanos
+
+        Returns:
+            cantidad de procesos que hubo que matar (0 si quit() cerró todo)
+        """
+        if driver is None:
+            return 0
+        key = id(driver)
+        with self._lock:
+            known = key in self._tracked
+        if not known:
+            self.register(driver, "sin registrar")
+        self._refresh(key)
+
+        quit_ok = True
+        try:
+            driver.quit()
+        except Exception as e:
+            quit_ok = False
+            print(f"[BROWSER] driver.quit() falló: {e}")
+
+        with self._lock:
+            entry = self._tracked.pop(key, None)
+            self.quits += 1
+            if not quit_ok:
+                self.failed_quits += 1
+        pids = entry["pids"] if entry else {}
+
+        deadline = time.monotonic() + (self.grace_seconds if quit_ok else 0)
+        while time.monotonic() < deadline and self._alive(pids):
+            time.sleep(_POLL_SECONDS)
+
+        killed = self._kill_stragglers(pids)
+        if killed:
+            print(f"[BROWSER] {killed} proceso(s) de {entry['kind']} seguían vivos después del quit: terminados")
+        return killed
+
+    def reap(self):
+        """
+        Mata los restos de drivers cuyo proceso raíz ya no existe (crash o quit nunca llamado)
+        y actualiza el árbol de los que siguen vivos
+
+        Returns:
+            cantidad de procesos terminados
+        """
+        with self._lock:
+            keys = list(self._tracked)
+        killed = 0
+        for key in keys:
+            with self._lock:
+                entry = self._tracked.get(key)
+                if entry is None:
+                    continue
+                roots_alive = any(process_start_time(pid) == entry["pids"].get(pid) for pid in entry["roots"])
+            if roots_alive:
+                self._refresh(key)
+                continue
+            with self._lock:
+                entry = self._tracked.pop(key, None)
+            if entry:
+                reaped = self._kill_stragglers(entry["pids"])
+                if reaped:
+                    print(f"[BROWSER] {reaped} proceso(s) huérfanos de {entry['kind']} terminados")
+                killed += reaped
+        return killed
+
+    def shutdown(self):
+        """Mata todos los procesos registrados (al salir del proceso)"""
+        with self._lock:
+            entries, self._tracked = list(self._tracked.values()), {}
+        return sum(self._kill_stragglers(entry["pids"]) for entry in entries)
+
+    # ---------- estado ----------
+    def live_processes(self):
+        """(procesos vivos registrados, RSS total en bytes o None si no se puede medir)"""
+        with self._lock:
+            pids = {}
+            for entry in self._tracked.values():
+                pids.update(entry["pids"])
+        alive = self._alive(pids)
+        return len(alive), process_tree_rss(list(alive)) if alive else 0
+
+    def get_stats(self):
+        count, rss = self.live_processes()
+        with self._lock:
+            return {
+                "drivers": len(self._tracked),
+                "live_processes": count,
+                "live_rss_bytes": rss,
+                "quits": self.quits,
+                "failed_quits": self.failed_quits,
+                "killed": self.killed,
+            }
+
+    def print_summary(self):
+        stats = self.get_stats()
+        print(f"\n🧹 PROCESOS DE NAVEGADOR: {stats['drivers']} driver(s) | {stats['live_processes']} procesos vivos "
+              f"| RSS: {format_rss(stats['live_rss_bytes'])} | quits fallidos: {stats['failed_quits']} "
+              f"| procesos terminados: {stats['killed']}")
+
+
+_supervisor = BrowserProcessSupervisor()
+
+
+def get_browser_supervisor():
+    """Supervisor global de procesos de navegador"""
+    return _supervisor
+
+
+def register_driver(driver, kind="driver"):
+    """Registra un driver recién creado en el supervisor global"""
+    _supervisor.register(driver, kind)
+    return driver
+
+
+def quit_driver(driver):
+    """driver.quit() que no deja procesos huérfanos (nunca lanza excepción)"""
+    try:
+        return _supervisor.quit(driver)
+    except Exception as e:
+        print(f"[BROWSER] Error cerrando driver: {e}")
+        return 0
+
+
+if __name__ == "__main__":
+    """Test: un quit que falla deja un árbol vivo y el supervisor lo termina"""
+    import subprocess
+    import sys
+
+    print("\n" + "="*70)
+    print(" TEST: Supervisor de procesos de navegador")
+    print("="*70 + "\n")
+
+    child_code = "import time; time.sleep(60)"
+    parent_code = (f"import subprocess, sys, time; "
+                   f"[subprocess.Popen([sys.executable, '-c', {child_code!r}]) for _ in range(2)]; time.sleep(60)")
+
+    class FakeService:
+        def __init__(self, process):
+            self.process = process
+
+    class BrokenDriver:
+        """driver.quit() lanza excepción y no cierra nada (como un chromedriver colgado)"""
+        def __init__(self):
+            self.service = FakeService(subprocess.Popen([sys.executable, "-c", parent_code]))
+
+        def quit(self):
+            raise ConnectionRefusedError("chromedriver no responde")
+
+    supervisor = BrowserProcessSupervisor(grace_seconds=0.5)
+    driver = BrokenDriver()
+    time.sleep(1.0)
+    supervisor.register(driver, "test")
+    count, rss = supervisor.live_processes()
+    print(f"{'✓' if count == 3 else '✗'} Procesos registrados: {count} ({format_rss(rss)})")
+
+    killed = supervisor.quit(driver)
+    driver.service.process.wait(timeout=5)  # recoger el zombie del padre
+    time.sleep(0.5)
+    print(f"{'✓' if killed == 3 else '✗'} Quit fallido: {killed} procesos terminados")
+    print(f"{'✓' if supervisor.live_processes()[0] == 0 else '✗'} Sin procesos vivos después del quit")
+
+    # Raíz que muere sola (crash): sus hijos quedan huérfanos y reap los termina
+    driver = BrokenDriver()
+    time.sleep(1.0)
+    supervisor.register(driver, "test")
+    driver.service.process.kill()
+    driver.service.process.wait(timeout=5)
+    reaped = supervisor.reap()
+    print(f"{'✓' if reaped == 2 else '✗'} Reap de huérfanos tras crash: {reaped}")
+    supervisor.print_summary()
+
+    print("\n" + "="*70)
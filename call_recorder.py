@@ -0,0 +1,223 @@
+"""
+Registro de llamadas HTTP salientes en un buffer circular
+- Cada request de http_transport deja un registro: método, plantilla de endpoint, status,
+  intento, latencia, bytes y si fue throttling
+- Memoria acotada (CALL_RECORDER_SIZE registros); registrar es un append con lock
+- Al final de cada ciclo se calculan p50/p95/p99 por endpoint con los registros del ciclo
+- El buffer se puede volcar a JSON lines cuando se necesite (SIGUSR1, /calls del endpoint de métricas)
+"""
+import os
+import re
+import json
+import time
+import signal
+import threading
+from collections import deque
+from datetime import datetime
+
+from cycle_metrics import current_cycle
+from hedged_fetch import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CALL_RECORDER_SIZE = int(os.getenv("CALL_RECORDER_SIZE", "5000"))
+CALLS_DUMP_FILE = os.getenv("CALLS_DUMP_FILE", os.path.join(BASE_DIR, "calls_dump.jsonl"))
+
+# Códigos de throttling de Graph: 4 (app), 17 (usuario), 32 (página), 613 (llamadas por segundo)
+_THROTTLE_RE = re.compile(rb'"code"\s*:\s*(4|17|32|613)\b')
+_THROTTLE_BODY_LIMIT = 4096
+
+
+class CallRecord:
+    """Una llamada saliente (los bytes de respuestas streaming se completan al consumirlas)"""
+    __slots__ = ("timestamp", "cycle_id", "method", "endpoint", "status", "attempt",
+                 "latency_s", "sent_bytes", "wire_bytes", "throttled")
+
+    def __init__(self, method, endpoint, status, attempt, latency_s, throttled=False):
+        cycle = current_cycle()
+        self.timestamp = time.time()
+        self.cycle_id = cycle.id if cycle is not None else None
+        self.method = method
+        self.endpoint = endpoint
+        self.status = status
+        self.attempt = attempt
+        self.latency_s = latency_s
+        self.sent_bytes = None
+        self.wire_bytes = None
+        self.throttled = throttled
+
+    def to_dict(self):
+        return {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(timespec="milliseconds"),
+            "cycle_id": self.cycle_id,
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "attempt": self.attempt,
+            "latency_ms": round(self.latency_s * 1000, 1),
+            "sent_bytes": self.sent_bytes,
+            "wire_bytes": self.wire_bytes,
+            "throttled": self.throttled,
+        }
+
+
+def is_throttle_response(response):
+    """429, o error de Graph con código de throttling (solo mira cuerpos chicos ya leídos)"""
+    if response.status_code == 429:
+        return True
+    if response.status_code not in (400, 403) or not getattr(response, "_content_consumed", False):
+        return False
+    content = response.content or b""
+    return len(content) <= _THROTTLE_BODY_LIMIT and _THROTTLE_RE.search(content) is not None
+
+
+class CallRecorder:
+    """Buffer circular de CallRecord (thread-safe)"""
+
+    def __init__(self, size=CALL_RECORDER_SIZE):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=size)
+        self.total = 0
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+            self.total += 1
+        return record
+
+    def records(self, cycle_id=None):
+        """Copia del buffer (solo las de un ciclo si se indica cycle_id)"""
+        with self._lock:
+            records = list(self._records)
+        if cycle_id is not None:
+            records = [record for record in records if record.cycle_id == cycle_id]
+        return records
+
+    def endpoint_percentiles(self, cycle_id=None):
+        """endpoint -> {count, errors, throttled, p50_ms, p95_ms, p99_ms}"""
+        latencies, summary = {}, {}
+        for record in self.records(cycle_id):
+            latencies.setdefault(record.endpoint, []).append(record.latency_s)
+            entry = summary.setdefault(record.endpoint, {"count": 0, "errors": 0, "throttled": 0})
+            entry["count"] += 1
+            if record.status == "error" or (isinstance(record.status, int) and record.status >= 400):
+                entry["errors"] += 1
+            if record.throttled:
+                entry["throttled"] += 1
+        for endpoint, samples in latencies.items():
+            for q in (50, 95, 99):
+                summary[endpoint][f"p{q}_ms"] = round(percentile(samples, q) * 1000, 1)
+        return summary
+
+    def dump(self, path=None):
+        """Vuelca el buffer completo a JSON lines; devuelve el path (None si falló)"""
+        path = path or CALLS_DUMP_FILE
+        records = self.records()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record.to_dict()) + "\n")
+        except OSError as e:
+            print(f"[CALLS] No se pudo volcar el buffer a {path}: {e}")
+            return None
+        print(f"[CALLS] {len(records)} llamadas volcadas a {path}")
+        return path
+
+
+_recorder = CallRecorder()
+_dump_requested = False  # lo levanta el handler de SIGUSR1; el volcado lo hace el loop del scheduler
+
+
+def get_call_recorder():
+    """Buffer global de llamadas"""
+    return _recorder
+
+
+def record_http_call(method, endpoint, status, attempt, latency_s, throttled=False):
+    """Registra una llamada; devuelve el CallRecord para completar los bytes después"""
+    return _recorder.add(CallRecord(method, endpoint, status, attempt, latency_s, throttled))
+
+
+def print_call_percentiles(title="LATENCIA POR ENDPOINT"):
+    """Imprime p50/p95/p99 por endpoint de las llamadas del ciclo en curso"""
+    cycle = current_cycle()
+    summary = _recorder.endpoint_percentiles(cycle.id if cycle is not None else None)
+    if not summary:
+        return
+    print(f"\n📞 {title}:")
+    print(f"   {'Endpoint':<42}{'Reqs':>6}{'Err':>5}{'Thr':>5}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for endpoint, entry in sorted(summary.items(), key=lambda item: item[1]["p95_ms"], reverse=True):
+        print(f"   {endpoint[:41]:<42}{entry['count']:>6}{entry['errors']:>5}{entry['throttled']:>5}"
+              f"{entry['p50_ms']:>7.0f}ms{entry['p95_ms']:>7.0f}ms{entry['p99_ms']:>7.0f}ms")
+
+
+def _request_dump(signum, frame):
+    """
+    Handler de SIGUSR1: solo deja el pedido
+    (volcar acá tomaría el lock del buffer, que el hilo principal puede tener tomado en add())
+    """
+    global _dump_requested
+    _dump_requested = True
+
+
+def install_dump_signal():
+    """`kill -USR1 <pid>` pide volcar el buffer; lo hace process_pending_dump en el loop del scheduler (solo POSIX)"""
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    signal.signal(signal.SIGUSR1, _request_dump)
+    return True
+
+
+def process_pending_dump():
+    """Vuelca el buffer si llegó SIGUSR1 desde la última llamada; devuelve el path (None si no hubo pedido)"""
+    global _dump_requested
+    if not _dump_requested:
+        return None
+    _dump_requested = False
+    return _recorder.dump()
+
+
+if __name__ == "__main__":
+    """Test del buffer: memoria acotada, percentiles por ciclo y costo por registro"""
+    import tempfile
+    import cycle_metrics as cm
+    from cycle_metrics import cycle_metrics
+
+    print("\n" + "="*70)
+    print(" TEST: Registro de llamadas HTTP")
+    print("="*70 + "\n")
+
+    cm.METRICS_FILE = os.path.join(tempfile.mkdtemp(), "cycle_metrics.jsonl")
+    recorder = CallRecorder(size=100)
+    for i in range(250):
+        recorder.add(CallRecord("GET", "graph:/{id}", 200, 1, 0.01))
+    print(f"{'✓' if len(recorder.records()) == 100 and recorder.total == 250 else '✗'} Buffer acotado a 100 de {recorder.total}")
+
+    with cycle_metrics("test") as metrics:
+        for i in range(1, 101):
+            record_http_call("GET", "graph:/{id}/insights", 200, 1, i / 1000)
+        record_http_call("POST", "graph:/{id}", 400, 2, 0.2, throttled=True)
+        summary = _recorder.endpoint_percentiles(metrics.id)
+        print_call_percentiles()
+    insights = summary["graph:/{id}/insights"]
+    print(f"{'✓' if (insights['p50_ms'], insights['p95_ms'], insights['p99_ms']) == (50.0, 95.0, 99.0) else '✗'} Percentiles: {insights}")
+    print(f"{'✓' if summary['graph:/{id}']['throttled'] == 1 else '✗'} Throttling marcado")
+
+    class FakeResponse:
+        status_code = 400
+        _content_consumed = True
+        content = b'{"error":{"message":"User request limit reached","code":17}}'
+
+    print(f"{'✓' if is_throttle_response(FakeResponse()) else '✗'} Detecta code 17 en el cuerpo")
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        record_http_call("GET", "graph:/{id}", 200, 1, 0.1)
+    cost_us = (time.perf_counter() - start) / 10_000 * 1e6
+    print(f"{'✓' if cost_us < 20 else '✗'} Costo por registro: {cost_us:.2f} µs")
+
+    path = _recorder.dump(os.path.join(tempfile.mkdtemp(), "calls.jsonl"))
+    with open(path) as f:
+        lines = f.readlines()
+    print(f"{'✓' if len(lines) == CALL_RECORDER_SIZE else '✗'} Volcado: {len(lines)} registros")
+
+    print("\n" + "="*70)
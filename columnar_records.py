@@ -0,0 +1,252 @@
+"""
+Acumulador columnar de resultados por adset
+Reemplaza las listas de dicts de los loops de revisión/escalado/activación:
+- Un buffer NumPy por campo (crece 1.5x al llenarse)
+- Strings repetidos (cuenta, status, acción) internados como códigos int32 + tabla de categorías
+- IDs numéricos de Graph como int64
+- Valores poco frecuentes (respuestas de la API) en un dict fila -> valor
+- Conversión a DataFrame sin copiar las columnas numéricas
+"""
+import sys
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+FLOAT = "float"
+BOOL = "bool"
+ID = "id"          # id numérico de Graph ("23850000000000000") guardado como int64
+STR = "str"        # string de pocos valores distintos, internado como código
+OBJECT = "object"  # referencia sin transformar: strings únicos por fila (nombres, razones)
+SPARSE = "sparse"  # valor presente en pocas filas (dicts de respuesta de escalado/activación)
+
+_INITIAL_CAPACITY = 1024
+
+
+class ColumnarRecords:
+    """
+    Acumulador de filas con esquema fijo almacenadas por columna
+
+    Uso:
+        results = ColumnarRecords({"adset_id": ID, "action": STR, "spend": FLOAT, "scaled": BOOL})
+        row = results.append(adset_id="123", spend=10.5)
+        results.set(row, "scaled", True)
+        df = results.to_dataframe()
+    """
+
+    def __init__(self, schema):
+        """
+        Args:
+            schema: dict campo -> tipo (FLOAT, BOOL, ID, STR, OBJECT, SPARSE); el orden define las columnas
+        """
+        self.schema = dict(schema)
+        self._size = 0
+        self._capacity = _INITIAL_CAPACITY
+        self._buffers = {}
+        self._categories = {}   # campo STR -> lista de strings (código = índice)
+        self._codes = {}        # campo STR -> dict string -> código
+
+        for field, kind in self.schema.items():
+            if kind == FLOAT:
+                self._buffers[field] = np.full(self._capacity, np.nan, dtype=np.float64)
+            elif kind == BOOL:
+                self._buffers[field] = np.zeros(self._capacity, dtype=np.bool_)
+            elif kind == ID:
+                self._buffers[field] = np.zeros(self._capacity, dtype=np.int64)
+            elif kind == STR:
+                self._buffers[field] = np.full(self._capacity, -1, dtype=np.int32)
+                self._categories[field] = []
+                self._codes[field] = {}
+            elif kind == OBJECT:
+                self._buffers[field] = np.full(self._capacity, None, dtype=object)
+            elif kind == SPARSE:
+                self._buffers[field] = {}
+            else:
+                raise ValueError(f"Tipo de columna no soportado para '{field}': {kind}")
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        """Aumenta 1.5x la capacidad de los buffers NumPy"""
+        new_capacity = self._capacity * 3 // 2
+        fills = {FLOAT: np.nan, BOOL: False, ID: 0, STR: -1, OBJECT: None}
+        for field, kind in self.schema.items():
+            if kind == SPARSE:
+                continue
+            old = self._buffers[field]
+            new = np.full(new_capacity, fills[kind], dtype=old.dtype)
+            new[:self._capacity] = old
+            self._buffers[field] = new
+        self._capacity = new_capacity
+
+    def _encode(self, field, value):
+        """Devuelve el código del string (internado) o -1 para None"""
+        if value is None:
+            return -1
+        value = str(value)
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = len(self._categories[field])
+            self._categories[field].append(sys.intern(value))
+            codes[value] = code
+        return code
+
+    def _store(self, row, field, value):
+        kind = self.schema[field]
+        if kind == FLOAT:
+            try:
+                self._buffers[field][row] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                self._buffers[field][row] = np.nan
+        elif kind == BOOL:
+            self._buffers[field][row] = bool(value)
+        elif kind == ID:
+            self._buffers[field][row] = int(value)
+        elif kind == STR:
+            self._buffers[field][row] = self._encode(field, value)
+        elif kind == SPARSE:
+            if value is None:
+                self._buffers[field].pop(row, None)
+            else:
+                self._buffers[field][row] = value
+        else:
+            self._buffers[field][row] = value
+
+    def append(self, **values):
+        """
+        Agrega una fila; los campos omitidos quedan vacíos (NaN, False, None)
+
+        Returns:
+            índice de la fila (para actualizarla después con `set`)
+        """
+        unknown = set(values) - self.schema.keys()
+        if unknown:
+            raise KeyError(f"Campos fuera del esquema: {sorted(unknown)}")
+
+        if self._size == self._capacity:
+            self._grow()
+
+        row = self._size
+        for field, value in values.items():
+            self._store(row, field, value)
+        self._size += 1
+        return row
+
+    def set(self, row, field, value):
+        """Actualiza un campo de una fila ya agregada"""
+        if not 0 <= row < self._size:
+            raise IndexError(f"Fila fuera de rango: {row}")
+        self._store(row, field, value)
+
+    def get(self, row, field):
+        """Lee un campo de una fila (strings decodificados, NaN -> None)"""
+        kind = self.schema[field]
+        if kind == SPARSE:
+            return self._buffers[field].get(row)
+        value = self._buffers[field][row]
+        if kind == STR:
+            return self._categories[field][value] if value >= 0 else None
+        if kind == FLOAT:
+            return None if np.isnan(value) else float(value)
+        if kind == BOOL:
+            return bool(value)
+        if kind == ID:
+            return str(value)
+        return value
+
+    def column(self, field):
+        """Vista de la columna sin copia (códigos int32 para STR; SPARSE se materializa)"""
+        if self.schema[field] == SPARSE:
+            column = np.full(self._size, None, dtype=object)
+            for row, value in self._buffers[field].items():
+                column[row] = value
+            return column
+        return self._buffers[field][:self._size]
+
+    def count(self, field):
+        """Cantidad de filas con el campo booleano en True"""
+        return int(np.count_nonzero(self.column(field)))
+
+    def to_dataframe(self):
+        """
+        Construye el DataFrame sin copiar las columnas numéricas
+        Los strings se exponen como Categorical (códigos + categorías)
+        """
+        columns = {}
+        for field, kind in self.schema.items():
+            if kind == STR:
+                columns[field] = pd.Categorical.from_codes(self.column(field), categories=self._categories[field])
+            else:
+                columns[field] = self.column(field)
+        return pd.DataFrame(columns, copy=False)
+
+    def nbytes(self):
+        """Memoria de los buffers de las filas agregadas (sin contar los objetos referenciados)"""
+        return sum(
+            sys.getsizeof(self._buffers[field]) if kind == SPARSE else self._buffers[field][:self._size].nbytes
+            for field, kind in self.schema.items()
+        )
+
+
+if __name__ == "__main__":
+    """Test del acumulador columnar: CSV idéntico a lista de dicts y memoria por fila"""
+    import tracemalloc
+
+    print("\n" + "="*70)
+    print(" TEST: Acumulador columnar")
+    print("="*70 + "\n")
+
+    schema = {
+        "account_id": STR, "adset_id": ID, "name": OBJECT, "status": STR,
+        "spend": FLOAT, "revenue": FLOAT, "roi": FLOAT, "epl": FLOAT, "epc": FLOAT,
+        "action": STR, "reason": OBJECT, "scaled": BOOL, "scaling_result": SPARSE,
+    }
+    n = 50_000
+    accounts = [f"act_{i}" for i in range(4)]
+    names = [f"BM5_1 | Campaña {i % 300} | Adset {i}" for i in range(n)]
+    ids = [str(23850000000000000 + i) for i in range(n)]
+    # Los strings únicos por fila se referencian igual en ambas representaciones: se crean fuera de la medición
+    reasons = [f"Spend ${(i * 7.31) % 500:.2f} y ROI 10.00%" for i in range(n)]
+
+    def rows():
+        for i in range(n):
+            spend = (i * 7.31) % 500
+            yield {
+                "account_id": accounts[i % 4], "adset_id": ids[i], "name": names[i], "status": "ACTIVE",
+                "spend": spend, "revenue": spend * 1.1, "roi": 10.0,
+                "epl": None if i % 3 else 1.5, "epc": 0.25,
+                "action": "KEEP" if i % 2 else "PAUSE",
+                "reason": reasons[i],
+                "scaled": i % 7 == 0, "scaling_result": {"success": True} if i % 1000 == 0 else None,
+            }
+
+    tracemalloc.start()
+    as_dicts = list(rows())
+    dicts_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    ColumnarRecords(schema)  # importar numpy fuera de la medición
+    tracemalloc.start()
+    records = ColumnarRecords(schema)
+    for row in rows():
+        records.append(**row)
+    columnar_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"Lista de dicts: {dicts_bytes / n:.0f} bytes/fila")
+    print(f"Columnar:       {columnar_bytes / n:.0f} bytes/fila")
+    print(f"{'✓' if dicts_bytes / columnar_bytes >= 5 else '✗'} Reducción: {dicts_bytes / columnar_bytes:.1f}x")
+
+    df = records.to_dataframe()
+    zero_copy = np.shares_memory(df["spend"].to_numpy(), records.column("spend"))
+    print(f"{'✓' if zero_copy else '✗'} DataFrame sin copia de columnas numéricas")
+
+    expected_csv = pd.DataFrame(as_dicts).to_csv(index=False)
+    same_csv = df.to_csv(index=False) == expected_csv
+    print(f"{'✓' if same_csv else '✗'} CSV idéntico al de la lista de dicts")
+    print(f"{'✓' if records.count('scaled') == sum(r['scaled'] for r in as_dicts) else '✗'} count('scaled')")
+
+    print("\n" + "="*70)
@@ -0,0 +1,263 @@
+"""
+Métricas por ciclo (revisión, escalamiento): duración de cada fase, llamadas salientes y filas
+- `span("fase")` mide un bloque; `timed_iter` mide solo el tiempo dentro de un generador paginado
+- Cada request de http_transport suma una llamada al endpoint de la plantilla
+- Al cerrar el ciclo se escribe un registro JSON lines en cycle_metrics.jsonl
+- Fuera de un ciclo todo es no-op (los scripts que no abren ciclo no pagan nada)
+"""
+import os
+import json
+import time
+import threading
+import functools
+import itertools
+import contextvars
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_FILE = os.getenv("CYCLE_METRICS_FILE", os.path.join(BASE_DIR, "cycle_metrics.jsonl"))
+
+_current_cycle = contextvars.ContextVar("cycle_metrics", default=None)
+_span_cost_s = None  # costo medido de un span (para estimar el overhead de la instrumentación)
+_listeners = []
+_cycle_ids = itertools.count(1)
+
+
+class CycleMetrics:
+    """Acumulador de un ciclo (thread-safe: los hilos de prefetch y hedging heredan el contexto)"""
+
+    def __init__(self, name):
+        self.id = next(_cycle_ids)
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.timestamp = datetime.now().isoformat(timespec="seconds")
+        self.phases = defaultdict(float)
+        self.calls = {}
+        self.rows = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.spans = 0
+        self.ok = True
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+            self.spans += 1
+
+    def add_call(self, endpoint, seconds, status):
+        with self._lock:
+            entry = self.calls.get(endpoint)
+            if entry is None:
+                entry = self.calls[endpoint] = {"count": 0, "errors": 0, "seconds": 0.0, "by_status": defaultdict(int)}
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["by_status"][str(status)] += 1
+            if status == "error" or (isinstance(status, int) and status >= 400):
+                entry["errors"] += 1
+
+    def add_rows(self, name, n):
+        with self._lock:
+            self.rows[name] += n
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def to_record(self):
+        """Registro JSON del ciclo"""
+        total = time.perf_counter() - self.started_at
+        overhead = self.spans * (_span_cost_s or 0.0)
+        with self._lock:
+            return {
+                "timestamp": self.timestamp,
+                "cycle": self.name,
+                "ok": self.ok,
+                "total_s": round(total, 3),
+                "phases": {phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+                "calls": {
+                    endpoint: {
+                        "count": entry["count"], "errors": entry["errors"],
+                        "seconds": round(entry["seconds"], 3), "by_status": dict(entry["by_status"]),
+                    }
+                    for endpoint, entry in self.calls.items()
+                },
+                "rows": dict(self.rows),
+                "counters": dict(self.counters),
+                "overhead_pct": round(overhead / total * 100, 4) if total else 0.0,
+            }
+
+
+def current_cycle():
+    """Métricas del ciclo en curso (None fuera de un ciclo)"""
+    return _current_cycle.get()
+
+
+def add_cycle_listener(fn):
+    """Registra una función que recibe el registro de cada ciclo cerrado (p.ej. el endpoint de métricas)"""
+    _listeners.append(fn)
+
+
+def _calibrate():
+    """Mide una vez el costo de un span vacío"""
+    global _span_cost_s
+    probe = CycleMetrics("calibración")
+    token = _current_cycle.set(probe)
+    try:
+        start = time.perf_counter()
+        for _ in range(1000):
+            with span("probe"):
+                pass
+        _span_cost_s = (time.perf_counter() - start) / 1000
+    finally:
+        _current_cycle.reset(token)
+
+
+def write_record(record):
+    """Agrega el registro al archivo JSON lines"""
+    try:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"[METRICS] No se pudo escribir {METRICS_FILE}: {e}")
+
+
+def _print_record(record):
+    phases = " | ".join(f"{phase} {seconds:.1f}s" for phase, seconds in
+                        sorted(record["phases"].items(), key=lambda item: item[1], reverse=True))
+    calls = sum(entry["count"] for entry in record["calls"].values())
+    print(f"\n⏱️  {record['cycle']}: {record['total_s']:.1f}s | {phases} | llamadas: {calls} "
+          f"| overhead: {record['overhead_pct']:.3f}%")
+
+
+@contextmanager
+def cycle_metrics(name):
+    """
+    Abre las métricas de un ciclo; si ya hay uno abierto (el wrapper con jitter lo abrió antes)
+    se reutiliza. Al cerrar escribe el registro y notifica a los listeners
+    """
+    active = _current_cycle.get()
+    if active is not None:
+        yield active
+        return
+
+    if _span_cost_s is None:
+        _calibrate()
+
+    metrics = CycleMetrics(name)
+    token = _current_cycle.set(metrics)
+    try:
+        yield metrics
+    except BaseException:
+        metrics.ok = False
+        raise
+    finally:
+        _current_cycle.reset(token)
+        record = metrics.to_record()
+        write_record(record)
+        _print_record(record)
+        for listener in _listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                print(f"[METRICS] Error en listener: {e}")
+
+
+def with_cycle_metrics(name=None):
+    """Decorador: corre la función dentro de `cycle_metrics(name)`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with cycle_metrics(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(phase):
+    """Suma la duración del bloque a la fase del ciclo en curso"""
+    metrics = _current_cycle.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(phase, time.perf_counter() - start)
+
+
+def timed_iter(iterable, phase):
+    """Itera midiendo solo el tiempo de obtener cada elemento (no el del cuerpo del loop)"""
+    iterator = iter(iterable)
+    while True:
+        with span(phase):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def record_call(endpoint, seconds, status):
+    """Registra una llamada saliente (status HTTP o 'error')"""
+    metrics = _current_cycle.get()
+    if metrics is not None:
+        metrics.add_call(endpoint, seconds, status)
+
+
+def add_rows(name, n=1):
+    """Suma filas procesadas/exportadas al ciclo en curso"""
+    metrics = _current_cycle.get()
+    if metrics is not None:
+        metrics.add_rows(name, n)
+
+
+def incr(name, n=1):
+    """Incrementa un contador del ciclo en curso (p.ej. mutaciones aplicadas)"""
+    metrics = _current_cycle.get()
+    if metrics is not None:
+        metrics.incr(name, n)
+
+
+if __name__ == "__main__":
+    """Test de spans, llamadas y overhead"""
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Métricas por ciclo")
+    print("="*70 + "\n")
+
+    METRICS_FILE = os.path.join(tempfile.mkdtemp(), "cycle_metrics.jsonl")
+
+    def pages():
+        for _ in range(3):
+            time.sleep(0.02)
+            yield [1, 2]
+
+    with cycle_metrics("test") as metrics:
+        with span("token"):
+            time.sleep(0.01)
+        for page in timed_iter(pages(), "listado"):
+            time.sleep(0.01)  # cuerpo del loop: no cuenta en "listado"
+            add_rows("adsets", len(page))
+        record_call("graph:/{id}/insights", 0.2, 200)
+        record_call("graph:/{id}/insights", 0.1, 400)
+        incr("mutaciones")
+        with cycle_metrics("anidado") as inner:
+            print(f"{'✓' if inner is metrics else '✗'} Ciclo anidado reutiliza el existente")
+        for _ in range(10_000):
+            with span("decisiones"):
+                pass
+
+    with open(METRICS_FILE) as f:
+        record = json.loads(f.readline())
+    print(f"{'✓' if 0.06 <= record['phases']['listado'] < 0.09 else '✗'} Listado mide solo la paginación: {record['phases']['listado']}s")
+    print(f"{'✓' if record['rows']['adsets'] == 6 else '✗'} Filas: {record['rows']}")
+    insights = record["calls"]["graph:/{id}/insights"]
+    print(f"{'✓' if insights['count'] == 2 and insights['errors'] == 1 else '✗'} Llamadas: {insights}")
+    print(f"{'✓' if _span_cost_s < 20e-6 else '✗'} Costo por span: {_span_cost_s * 1e6:.2f} µs")
+
+    print("\n" + "="*70)
@@ -0,0 +1,271 @@
+"""
+Profiling bajo demanda de los ciclos del scheduler (cProfile)
+- Se arma para las próximas N ejecuciones de un ciclo sin reiniciar el proceso:
+    * PROFILE_CYCLES=N al arrancar
+    * archivo profile_next_cycles junto al script (contenido opcional: N, default 1)
+    * kill -USR2 <pid> (suma 1 ciclo por señal)
+- Cada ciclo perfilado escribe profiles/<ciclo>_<timestamp>.prof e imprime las funciones más caras
+- cProfile solo ve el hilo del ciclo: el tiempo de los hilos de prefetch/hedging aparece
+  como espera en quien los consume
+Uso:
+    python cycle_profiler.py armar [N]
+    python cycle_profiler.py listar
+    python cycle_profiler.py comparar antes.prof despues.prof [--top 20]
+"""
+import os
+import io
+import re
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import argparse
+import functools
+import threading
+import unicodedata
+from collections import deque
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_FLAG_FILE = os.path.join(BASE_DIR, "profile_next_cycles")
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "15"))
+
+_lock = threading.Lock()
+_armed = int(os.getenv("PROFILE_CYCLES", "0") or 0)
+_active = False  # un solo profiler a la vez (en 3.12+ cProfile es global al proceso)
+_signal_arms = deque()  # una entrada por SIGUSR2; append/popleft no toman locks de Python
+
+
+def arm(n=1):
+    """Perfila las próximas n ejecuciones de ciclo"""
+    global _armed
+    with _lock:
+        _armed += n
+    print(f"[PROFILE] Armado para {n} ciclo(s) más")
+
+
+def _consume_flag_file():
+    """Lee y borra el archivo bandera; devuelve N (0 si no existe)"""
+    if not os.path.exists(PROFILE_FLAG_FILE):
+        return 0
+    try:
+        with open(PROFILE_FLAG_FILE, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        os.remove(PROFILE_FLAG_FILE)
+    except OSError:
+        return 0
+    return int(content) if content.isdigit() else 1
+
+
+def _take():
+    """True si el ciclo que arranca debe perfilarse (descuenta uno de los armados)"""
+    global _armed, _active
+    pending = _consume_flag_file()
+    with _lock:
+        _armed += pending
+        if _armed <= 0 or _active:
+            return False
+        _armed -= 1
+        _active = True
+        return True
+
+
+def _profile_path(name):
+    ascii_name = unicodedata.normalize("NFKD", name.lower()).encode("ascii", "ignore").decode()
+    safe = re.sub(r"[^a-z0-9]+", "_", ascii_name).strip("_") or "ciclo"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{safe}_{timestamp}.prof")
+
+
+def print_top(stats, top=PROFILE_TOP, sort="cumulative"):
+    """Imprime las funciones más caras de un pstats.Stats"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(top)
+    for line in stream.getvalue().splitlines():
+        if line.strip() and not line.startswith(("   Ordered by", "   List reduced")):
+            print(f"   {line}")
+
+
+def with_cycle_profile(name=None):
+    """Decorador: si hay ciclos armados, corre la función bajo cProfile y guarda el .prof"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global _active
+            if not _take():
+                return fn(*args, **kwargs)
+
+            cycle_name = name or fn.__name__
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:  # otro profiler activo (p.ej. un debugger)
+                print(f"[PROFILE] No se pudo perfilar {cycle_name}: {e}")
+                with _lock:
+                    _active = False
+                return fn(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                with _lock:
+                    _active = False
+                path = _profile_path(cycle_name)
+                try:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    profiler.dump_stats(path)
+                    print(f"\n🔬 PROFILE {cycle_name}: {time.perf_counter() - start:.1f}s -> {path}")
+                except OSError as e:
+                    print(f"[PROFILE] No se pudo guardar {path}: {e}")
+                print_top(pstats.Stats(profiler))
+        return wrapper
+    return decorator
+
+
+def install_profile_signal():
+    """`kill -USR2 <pid>` perfila el próximo ciclo; lo arma process_pending_arms en el loop del scheduler (solo POSIX)"""
+    if not hasattr(signal, "SIGUSR2"):
+        return False
+    # El handler no puede llamar a arm(): _lock no es reentrante y el hilo principal puede tenerlo tomado
+    signal.signal(signal.SIGUSR2, lambda signum, frame: _signal_arms.append(1))
+    return True
+
+
+def process_pending_arms():
+    """Arma un ciclo por cada SIGUSR2 recibido desde la última llamada; devuelve cuántos"""
+    n = 0
+    while True:
+        try:
+            _signal_arms.popleft()
+        except IndexError:
+            break
+        n += 1
+    if n:
+        arm(n)
+    return n
+
+
+# ================== COMPARACIÓN ==================
+def _function_label(func):
+    filename, line, function = func
+    return f"{os.path.basename(filename)}:{line}({function})"
+
+
+def _cumulative_times(path):
+    """función -> (tiempo acumulado, tiempo propio, llamadas)"""
+    stats = pstats.Stats(path)
+    return {
+        _function_label(func): (cumulative, total, calls)
+        for func, (_, calls, total, cumulative, _) in stats.stats.items()
+    }
+
+
+def compare_profiles(before_path, after_path, top=20):
+    """
+    Diferencias de tiempo acumulado por función entre dos perfiles
+
+    Returns:
+        lista de (función, antes_s, después_s, delta_s) ordenada por |delta|
+    """
+    before = _cumulative_times(before_path)
+    after = _cumulative_times(after_path)
+    rows = []
+    for function in set(before) | set(after):
+        before_s = before.get(function, (0.0, 0.0, 0))[0]
+        after_s = after.get(function, (0.0, 0.0, 0))[0]
+        rows.append((function, before_s, after_s, after_s - before_s))
+    rows.sort(key=lambda row: abs(row[3]), reverse=True)
+    return rows[:top]
+
+
+def print_comparison(before_path, after_path, top=20):
+    before_total = max((v[0] for v in _cumulative_times(before_path).values()), default=0.0)
+    after_total = max((v[0] for v in _cumulative_times(after_path).values()), default=0.0)
+    print(f"\n  Antes:   {before_path} ({before_total:.2f}s)")
+    print(f"  Después: {after_path} ({after_total:.2f}s)\n")
+    print(f"  {'Función':<60}{'Antes':>10}{'Después':>10}{'Delta':>10}")
+    for function, before_s, after_s, delta in compare_profiles(before_path, after_path, top):
+        print(f"  {function[-59:]:<60}{before_s:>9.3f}s{after_s:>9.3f}s{delta:>+9.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiling de ciclos del scheduler")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    armar = subparsers.add_parser("armar", help="Perfilar los próximos N ciclos del scheduler en ejecución")
+    armar.add_argument("n", type=int, nargs="?", default=1)
+
+    subparsers.add_parser("listar", help="Perfiles guardados")
+
+    comparar = subparsers.add_parser("comparar", help="Diferencia de funciones entre dos perfiles")
+    comparar.add_argument("antes")
+    comparar.add_argument("despues")
+    comparar.add_argument("--top", type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == "armar":
+        with open(PROFILE_FLAG_FILE, "w", encoding="utf-8") as f:
+            f.write(str(args.n))
+        print(f"[PROFILE] Se perfilarán los próximos {args.n} ciclo(s) ({PROFILE_FLAG_FILE})")
+    elif args.command == "listar":
+        if not os.path.isdir(PROFILE_DIR):
+            print("[PROFILE] No hay perfiles guardados")
+            return
+        for filename in sorted(os.listdir(PROFILE_DIR)):
+            if filename.endswith(".prof"):
+                path = os.path.join(PROFILE_DIR, filename)
+                print(f"  {filename:<50}{os.path.getsize(path) / 1024:>8.1f} KB")
+    elif args.command == "comparar":
+        print_comparison(args.antes, args.despues, args.top)
+
+
+def _self_test():
+    """Test: ciclo armado por archivo bandera, perfil guardado y comparación"""
+    global PROFILE_DIR, PROFILE_FLAG_FILE
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Profiling de ciclos")
+    print("="*70 + "\n")
+
+    tmp = tempfile.mkdtemp()
+    PROFILE_DIR = tmp
+    PROFILE_FLAG_FILE = os.path.join(tmp, "profile_next_cycles")
+
+    def work(n):
+        return sum(i * i for i in range(n))
+
+    @with_cycle_profile("revisión")
+    def cycle(n):
+        return work(n)
+
+    cycle(1000)
+    print(f"{'✓' if not os.listdir(tmp) else '✗'} Sin armar no se perfila")
+
+    with open(PROFILE_FLAG_FILE, "w") as f:
+        f.write("2")
+    cycle(10_000)
+    time.sleep(1.1)  # timestamps distintos
+    cycle(300_000)
+    cycle(1000)
+    profiles = sorted(os.path.join(tmp, name) for name in os.listdir(tmp) if name.endswith(".prof"))
+    print(f"{'✓' if len(profiles) == 2 else '✗'} Dos ciclos perfilados: {[os.path.basename(p) for p in profiles]}")
+
+    rows = compare_profiles(profiles[0], profiles[1], top=5)
+    print(f"{'✓' if rows and rows[0][3] > 0 else '✗'} Comparación: mayor delta en {rows[0][0]}")
+    print_comparison(profiles[0], profiles[1], top=5)
+
+    print("\n" + "="*70)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main()
+    else:
+        _self_test()
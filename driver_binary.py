@@ -0,0 +1,223 @@
+"""
+Resolución del binario de chromedriver
+- ChromeDriverManager().install() se llama una sola vez por versión de Chrome instalada;
+  el path queda en memoria y en disco (chromedriver_cache.json)
+- La verificación es barata: stat del ejecutable de Chrome (detecta actualizaciones) y
+  del chromedriver cacheado, sin consultar versiones ni red
+- Registra la latencia de arranque de cada driver para las estadísticas de sesión
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+from lazy_imports import lazy_import
+
+ChromeDriverManager = lazy_import("webdriver_manager.chrome", "ChromeDriverManager")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(BASE_DIR, "chromedriver_cache.json")
+
+_CHROME_COMMANDS = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"]
+_CHROME_PATHS = [
+    os.path.join(os.environ.get("PROGRAMFILES", ""), "Google", "Chrome", "Application", "chrome.exe"),
+    os.path.join(os.environ.get("PROGRAMFILES(X86)", ""), "Google", "Chrome", "Application", "chrome.exe"),
+    os.path.join(os.environ.get("LOCALAPPDATA", ""), "Google", "Chrome", "Application", "chrome.exe"),
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+_lock = threading.Lock()
+_resolved = None  # (chrome_key, driver_path) del proceso
+
+
+def _find_chrome():
+    """Path del ejecutable de Chrome instalado (None si no se encuentra)"""
+    for command in _CHROME_COMMANDS:
+        path = shutil.which(command)
+        if path:
+            return os.path.realpath(path)
+    for path in _CHROME_PATHS:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def chrome_key():
+    """
+    Identifica la instalación de Chrome sin ejecutarla: path + mtime + tamaño
+    Una actualización de Chrome reemplaza el ejecutable y cambia la clave
+    """
+    path = _find_chrome()
+    if path is None:
+        return "desconocido"
+    st = os.stat(path)
+    return f"{path}|{st.st_mtime_ns}|{st.st_size}"
+
+
+def _is_valid_driver(path):
+    """El chromedriver cacheado sigue existiendo y es ejecutable"""
+    return bool(path) and os.path.isfile(path) and os.path.getsize(path) > 0 and os.access(path, os.X_OK)
+
+
+def _load_cache():
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(key, driver_path):
+    try:
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"chrome_key": key, "driver_path": driver_path}, f, indent=2)
+    except OSError as e:
+        print(f"[DRIVER] No se pudo guardar la caché de chromedriver: {e}")
+
+
+def resolve_chromedriver(preferred=None):
+    """
+    Devuelve el path de chromedriver para la versión de Chrome instalada
+
+    Args:
+        preferred: path a usar si existe (p.ej. /usr/bin/chromedriver en Colab); sin instalar nada
+
+    Orden: memoria del proceso -> chromedriver_cache.json -> ChromeDriverManager().install()
+    """
+    global _resolved
+
+    if preferred and _is_valid_driver(preferred):
+        return preferred
+
+    key = chrome_key()
+    with _lock:
+        if _resolved is not None and _resolved[0] == key and _is_valid_driver(_resolved[1]):
+            return _resolved[1]
+
+        cache = _load_cache()
+        if cache.get("chrome_key") == key and _is_valid_driver(cache.get("driver_path")):
+            _resolved = (key, cache["driver_path"])
+            return _resolved[1]
+
+        start = time.monotonic()
+        driver_path = ChromeDriverManager().install()
+        print(f"[DRIVER] chromedriver resuelto en {time.monotonic() - start:.1f}s: {driver_path}")
+        _save_cache(key, driver_path)
+        _resolved = (key, driver_path)
+        return driver_path
+
+
+def invalidate_chromedriver():
+    """Descarta el path cacheado (p.ej. si el driver no arrancó por incompatibilidad de versión)"""
+    global _resolved
+    with _lock:
+        _resolved = None
+        try:
+            os.remove(CACHE_FILE)
+        except OSError:
+            pass
+
+
+# ================== LATENCIA DE ARRANQUE ==================
+class DriverStartupStats:
+    """Latencias de arranque de drivers por tipo (undetected, selenium, auth...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_kind = {}
+
+    def record(self, kind, seconds, ok=True):
+        with self._lock:
+            entry = self._by_kind.setdefault(kind, {"starts": 0, "failures": 0, "total_s": 0.0, "last_s": None, "max_s": 0.0})
+            if not ok:
+                entry["failures"] += 1
+                return
+            entry["starts"] += 1
+            entry["total_s"] += seconds
+            entry["last_s"] = seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+
+    def snapshot(self):
+        """kind -> {starts, failures, avg_s, last_s, max_s}"""
+        with self._lock:
+            return {
+                kind: {
+                    "starts": entry["starts"],
+                    "failures": entry["failures"],
+                    "avg_s": round(entry["total_s"] / entry["starts"], 2) if entry["starts"] else None,
+                    "last_s": round(entry["last_s"], 2) if entry["last_s"] is not None else None,
+                    "max_s": round(entry["max_s"], 2),
+                }
+                for kind, entry in self._by_kind.items()
+            }
+
+
+_startup_stats = DriverStartupStats()
+
+
+@contextmanager
+def measure_driver_startup(kind):
+    """Mide el arranque de un driver: `with measure_driver_startup("selenium"): driver = webdriver.Chrome(...)`"""
+    start = time.monotonic()
+    try:
+        yield
+    except Exception:
+        _startup_stats.record(kind, time.monotonic() - start, ok=False)
+        raise
+    seconds = time.monotonic() - start
+    _startup_stats.record(kind, seconds)
+    print(f"[DRIVER] Arranque {kind}: {seconds:.1f}s")
+
+
+def get_driver_startup_stats():
+    """Estadísticas de arranque de drivers del proceso"""
+    return _startup_stats.snapshot()
+
+
+if __name__ == "__main__":
+    """Test de la caché de chromedriver (sin red: se simula el install)"""
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Resolución de chromedriver")
+    print("="*70 + "\n")
+
+    tmp = tempfile.mkdtemp()
+    fake_driver = os.path.join(tmp, "chromedriver")
+    with open(fake_driver, "w") as f:
+        f.write("#!/bin/sh\n")
+    os.chmod(fake_driver, 0o755)
+
+    CACHE_FILE = os.path.join(tmp, "chromedriver_cache.json")
+    installs = []
+
+    class FakeManager:
+        def install(self):
+            installs.append(1)
+            return fake_driver
+
+    ChromeDriverManager = FakeManager
+
+    first = resolve_chromedriver()
+    second = resolve_chromedriver()
+    print(f"{'✓' if first == second == fake_driver and len(installs) == 1 else '✗'} Install una sola vez por proceso")
+
+    _resolved = None
+    resolve_chromedriver()
+    print(f"{'✓' if len(installs) == 1 else '✗'} Reutiliza la caché en disco en un proceso nuevo")
+
+    _save_cache("otra-version", fake_driver)
+    _resolved = None
+    resolve_chromedriver()
+    print(f"{'✓' if len(installs) == 2 else '✗'} Reinstala si cambió la versión de Chrome")
+
+    print(f"{'✓' if resolve_chromedriver(preferred=fake_driver) == fake_driver else '✗'} Path preferido sin instalar")
+
+    with measure_driver_startup("test"):
+        time.sleep(0.05)
+    stats = get_driver_startup_stats()["test"]
+    print(f"{'✓' if stats['starts'] == 1 and stats['last_s'] >= 0.05 else '✗'} Latencia de arranque: {stats}")
+
+    print("\n" + "="*70)
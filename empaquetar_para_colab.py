@@ -16,6 +16,26 @@ ARCHIVOS_NECESARIOS = [
     'leadpier_auth_stealth.py',
     'leadpier_browser_session.py',
     'leadpier_colab_fix.py',  # FIX para Google Colab
+    'lazy_imports.py',
+    'meta_insights.py',
+    'insights_partition_cache.py',
+    'json_decoding.py',
+    'http_transport.py',
+    'columnar_records.py',
+    'resilience.py',
+    'hedged_fetch.py',
+    'driver_binary.py',
+    'browser_processes.py',
+    'cycle_metrics.py',
+    'metrics_server.py',
+    'call_recorder.py',
+    'cycle_profiler.py',
+    'logging_setup.py',
+    'memory_watchdog.py',
+    'browser_supervisor.py',
+    'job_runner.py',
+    'leadpier_daemon.py',
+    'warm_snapshot.py',
     'enviorement.env',
     'requirements.txt',
 ]
@@ -0,0 +1,222 @@
+"""
+Fetch con cobertura (hedging): el primer resultado válido gana
+- Se lanza el camino más barato primero; el siguiente arranca solo si el anterior no respondió
+  dentro de su p95 de latencia histórica (o apenas falla)
+- El primer resultado válido se devuelve y los demás caminos se cancelan (cooperativamente)
+- Se registra qué camino ganó y con qué latencia
+"""
+import os
+import math
+import time
+import queue
+import threading
+import contextvars
+from collections import deque, Counter
+
+from resilience import current_deadline
+
+# Delay de cobertura sin historial suficiente y límites del p95
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "60"))
+HEDGE_MIN_SAMPLES = 5
+HEDGE_HISTORY_SIZE = 50
+
+_cancel_event = contextvars.ContextVar("hedge_cancel", default=None)
+
+
+def hedge_cancelled():
+    """True si el camino en curso ya perdió (otro camino ganó); los reintentos deben cortarse"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def percentile(samples, q):
+    """Percentil por rango más cercano (q entre 0 y 100)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class HedgedFetcher:
+    """
+    Ejecuta caminos alternativos con cobertura escalonada
+
+    Uso:
+        fetcher = HedgedFetcher("leadpier", [("post", fetch_post), ("navegador", fetch_browser)],
+                                is_valid=lambda df: not df.empty)
+        df = fetcher.fetch()
+    """
+
+    def __init__(self, name, paths, is_valid=None):
+        """
+        Args:
+            name: nombre para logs
+            paths: lista ordenada de (nombre, función sin argumentos)
+            is_valid: función resultado -> bool (default: resultado no None)
+        """
+        self.name = name
+        self.paths = list(paths)
+        self.is_valid = is_valid or (lambda result: result is not None)
+        self.wins = Counter()
+        self.last_winner = None
+        self.last_latency = None
+        self._latencies = {path_name: deque(maxlen=HEDGE_HISTORY_SIZE) for path_name, _ in self.paths}
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, path_name):
+        """Espera antes de cubrir al camino: p95 de sus latencias exitosas (acotado)"""
+        with self._lock:
+            samples = list(self._latencies[path_name])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, percentile(samples, 95)))
+
+    def _run_path(self, path_name, fn, results):
+        """Corre un camino en su hilo y deja (nombre, resultado, latencia, válido) en la cola"""
+        start = time.monotonic()
+        try:
+            result = fn()
+            valid = bool(self.is_valid(result))
+        except Exception as e:
+            print(f"[HEDGE] {self.name}/{path_name} error: {e}")
+            result, valid = None, False
+        latency = time.monotonic() - start
+
+        # Las latencias de los perdedores que terminan igual también alimentan el p95: un camino
+        # cancelado que corta antes devuelve un resultado inválido, así que no deja muestras falsas
+        if valid:
+            with self._lock:
+                self._latencies[path_name].append(latency)
+        results.put((path_name, result, latency, valid))
+
+    def _launch(self, path, cancel, results):
+        path_name, fn = path
+        context = contextvars.copy_context()  # el hilo hereda el deadline del ciclo
+        context.run(_cancel_event.set, cancel)
+        threading.Thread(
+            target=context.run, args=(self._run_path, path_name, fn, results),
+            name=f"hedge-{self.name}-{path_name}", daemon=True
+        ).start()
+        return path_name
+
+    def fetch(self, exclude=()):
+        """
+        Devuelve el primer resultado válido; si ninguno lo es, el último resultado recibido
+        Los caminos que siguen corriendo quedan cancelados y su resultado se descarta
+
+        Args:
+            exclude: nombres de caminos a no lanzar en esta llamada
+        """
+        paths = [path for path in self.paths if path[0] not in exclude]
+        cancel = threading.Event()
+        results = queue.Queue()
+        start = time.monotonic()
+
+        launched = [self._launch(paths[0], cancel, results)]
+        launched_at = time.monotonic()
+        pending = 1
+        last_result = None
+
+        try:
+            while pending:
+                if len(launched) < len(paths):
+                    wait = max(0.0, self.hedge_delay(launched[-1]) - (time.monotonic() - launched_at))
+                else:
+                    deadline = current_deadline()
+                    wait = deadline.remaining() if deadline is not None else None
+
+                try:
+                    path_name, result, latency, valid = results.get(timeout=wait)
+                except queue.Empty:
+                    if len(launched) == len(paths):
+                        print(f"[HEDGE] {self.name}: deadline agotado esperando {', '.join(launched)}")
+                        break
+                    print(f"[HEDGE] {self.name}: {launched[-1]} sin respuesta en {wait:.1f}s, "
+                          f"lanzando {paths[len(launched)][0]}")
+                    launched.append(self._launch(paths[len(launched)], cancel, results))
+                    launched_at = time.monotonic()
+                    pending += 1
+                    continue
+
+                pending -= 1
+                if valid:
+                    total = time.monotonic() - start
+                    self.wins[path_name] += 1
+                    self.last_winner, self.last_latency = path_name, total
+                    print(f"[HEDGE] {self.name}: ganó {path_name} en {total:.1f}s "
+                          f"(caminos lanzados: {', '.join(launched)})")
+                    return result
+
+                last_result = result
+                # Un camino que falla no consume su delay: se cubre de inmediato
+                if len(launched) < len(paths):
+                    launched.append(self._launch(paths[len(launched)], cancel, results))
+                    launched_at = time.monotonic()
+                    pending += 1
+        finally:
+            cancel.set()
+
+        self.last_winner, self.last_latency = None, time.monotonic() - start
+        print(f"[HEDGE] {self.name}: ningún camino devolvió datos válidos ({self.last_latency:.1f}s)")
+        return last_result
+
+    def print_summary(self):
+        """Imprime victorias y p95 por camino"""
+        print(f"\n🏁 HEDGING {self.name}:")
+        for path_name, _ in self.paths:
+            with self._lock:
+                samples = list(self._latencies[path_name])
+            p95 = percentile(samples, 95)
+            p95_text = f"{p95:.1f}s" if p95 is not None else "-"
+            print(f"   {path_name:<12} victorias: {self.wins[path_name]:>4} | p95: {p95_text:>7} "
+                  f"| muestras: {len(samples)}")
+
+
+if __name__ == "__main__":
+    """Test de cobertura: camino lento cubierto, falla rápida cubierta de inmediato y cancelación"""
+    print("\n" + "="*70)
+    print(" TEST: Fetch con cobertura")
+    print("="*70 + "\n")
+
+    HEDGE_DEFAULT_DELAY = 0.2
+    cancelled = []
+
+    def slow():
+        time.sleep(1.0)
+        cancelled.append(hedge_cancelled())
+        return "lento"
+
+    def fast():
+        time.sleep(0.05)
+        return "rápido"
+
+    def broken():
+        return None
+
+    fetcher = HedgedFetcher("test", [("lento", slow), ("rapido", fast)])
+    start = time.monotonic()
+    result = fetcher.fetch()
+    elapsed = time.monotonic() - start
+    print(f"{'✓' if result == 'rápido' and elapsed < 0.5 else '✗'} Camino lento cubierto: {result} en {elapsed:.2f}s")
+    time.sleep(1.0)
+    print(f"{'✓' if cancelled == [True] else '✗'} El perdedor ve la cancelación")
+    print(f"{'✓' if len(fetcher._latencies['lento']) == 1 else '✗'} El perdedor que termina deja su latencia para el p95")
+
+    fetcher = HedgedFetcher("test", [("roto", broken), ("rapido", fast)])
+    start = time.monotonic()
+    result = fetcher.fetch()
+    elapsed = time.monotonic() - start
+    print(f"{'✓' if result == 'rápido' and elapsed < 0.15 else '✗'} Falla cubierta sin esperar el delay ({elapsed:.2f}s)")
+
+    fetcher = HedgedFetcher("test", [("roto", broken)])
+    print(f"{'✓' if fetcher.fetch() is None else '✗'} Sin caminos válidos devuelve el último resultado")
+
+    for latency in (1, 2, 3, 4, 5, 6, 7, 8, 9, 30):
+        fetcher._latencies["roto"].append(latency)
+    print(f"{'✓' if fetcher.hedge_delay('roto') == 30 else '✗'} Delay = p95 de latencias ({fetcher.hedge_delay('roto')}s)")
+    fetcher.print_summary()
+
+    print("\n" + "="*70)
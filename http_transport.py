@@ -0,0 +1,254 @@
+"""
+Capa HTTP compartida para Graph y LeadPier
+- Una sola requests.Session (keep-alive) con compresión negociada: gzip/deflate, y br si brotli está instalado
+- Contabiliza bytes enviados, bytes en el cable (comprimidos) y bytes descomprimidos por plantilla de endpoint
+- Aplica el deadline del ciclo y el circuit breaker de cada endpoint (ver resilience.py)
+- Cada llamada queda en el buffer de call_recorder.py (status, intento, latencia, bytes, throttling)
+"""
+import re
+import time
+import threading
+import contextvars
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+
+from lazy_imports import is_available
+from resilience import current_deadline, get_circuit_breaker
+from cycle_metrics import record_call
+from call_recorder import record_http_call, is_throttle_response
+
+# urllib3 solo descomprime br si hay un decoder de brotli instalado
+BROTLI_AVAILABLE = is_available("brotli") or is_available("brotlicffi")
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate"
+
+_VERSION_RE = re.compile(r"^v\d+(\.\d+)?$")
+_ID_RE = re.compile(r"^(act_)?\d+(_\d+)?$")
+
+
+def endpoint_template(url):
+    """
+    Normaliza una URL a su plantilla de endpoint (sin versión, ids ni query)
+
+    Ejemplos:
+        https://graph.facebook.com/v23.0/act_123/insights?...  -> graph:/{id}/insights
+        https://graph.facebook.com/v23.0/120212345              -> graph:/{id}
+        https://webapi.leadpier.com/v1/api/stats/user/sources   -> leadpier:/v1/api/stats/user/sources
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    segments = [s for s in parts.path.split("/") if s]
+
+    if host.endswith("facebook.com"):
+        prefix = "graph"
+        segments = [s for s in segments if not _VERSION_RE.match(s)]
+    elif "leadpier" in host:
+        prefix = "leadpier"
+    else:
+        prefix = host
+
+    segments = ["{id}" if _ID_RE.match(s) else s for s in segments]
+    return f"{prefix}:/" + "/".join(segments)
+
+
+class TransferStats:
+    """Contadores de bytes por plantilla de endpoint (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_endpoint = {}
+
+    def record(self, endpoint, sent_bytes, wire_bytes, body_bytes):
+        with self._lock:
+            entry = self._by_endpoint.setdefault(endpoint, {
+                "requests": 0, "sent_bytes": 0, "wire_bytes": 0, "body_bytes": 0
+            })
+            entry["requests"] += 1
+            entry["sent_bytes"] += sent_bytes
+            entry["wire_bytes"] += wire_bytes
+            entry["body_bytes"] += body_bytes
+
+    def snapshot(self):
+        """Copia de los contadores: endpoint -> {requests, sent_bytes, wire_bytes, body_bytes}"""
+        with self._lock:
+            return {endpoint: dict(entry) for endpoint, entry in self._by_endpoint.items()}
+
+    def reset(self):
+        with self._lock:
+            self._by_endpoint.clear()
+
+    def print_summary(self, title="TRANSFERENCIA HTTP"):
+        """Imprime la tabla por endpoint ordenada por bytes en el cable"""
+        stats = self.snapshot()
+        if not stats:
+            return
+
+        total_wire = sum(entry["wire_bytes"] for entry in stats.values())
+        total_body = sum(entry["body_bytes"] for entry in stats.values())
+
+        print(f"\n📡 {title} (Accept-Encoding: {ACCEPT_ENCODING}):")
+        print(f"   {'Endpoint':<42}{'Reqs':>6}{'Cable':>11}{'Descomp.':>11}{'Ratio':>7}{'% cable':>9}")
+        for endpoint, entry in sorted(stats.items(), key=lambda item: item[1]["wire_bytes"], reverse=True):
+            ratio = entry["body_bytes"] / entry["wire_bytes"] if entry["wire_bytes"] else 0.0
+            share = entry["wire_bytes"] / total_wire * 100 if total_wire else 0.0
+            print(f"   {endpoint[:41]:<42}{entry['requests']:>6}{_format_bytes(entry['wire_bytes']):>11}"
+                  f"{_format_bytes(entry['body_bytes']):>11}{ratio:>6.1f}x{share:>8.1f}%")
+        print(f"   {'TOTAL':<42}{sum(e['requests'] for e in stats.values()):>6}"
+              f"{_format_bytes(total_wire):>11}{_format_bytes(total_body):>11}")
+
+
+def _format_bytes(n):
+    """Formatea bytes en KB/MB"""
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.2f} MB"
+    return f"{n / 1024:.1f} KB"
+
+
+# Instancias globales
+_session = None
+_session_lock = threading.Lock()
+_transfer_stats = TransferStats()
+# Contadores del ciclo en curso: con jobs concurrentes cada ciclo tiene los suyos
+# (los hilos de prefetch/hedging copian el contexto y suman al mismo ciclo)
+_cycle_transfer_stats = contextvars.ContextVar("transfer_stats", default=None)
+
+
+def get_http_session():
+    """Obtiene la sesión HTTP global (sin persistir cookies entre requests, igual que requests.get)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _session = session
+    return _session
+
+
+def get_transfer_stats():
+    """Obtiene los contadores de transferencia del ciclo en curso (o los globales fuera de un ciclo)"""
+    return _cycle_transfer_stats.get() or _transfer_stats
+
+
+def record_response(response, body_bytes=None):
+    """
+    Registra los bytes de una respuesta ya consumida
+
+    Args:
+        body_bytes: bytes descomprimidos (para respuestas streaming; default: len(response.content))
+    """
+    if body_bytes is None:
+        body_bytes = len(response.content)
+
+    wire_bytes = None
+    raw = getattr(response, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        try:
+            wire_bytes = raw.tell()  # bytes leídos del socket, antes de descomprimir
+        except Exception:
+            wire_bytes = None
+    if not wire_bytes:
+        wire_bytes = int(response.headers.get("Content-Length") or body_bytes)
+
+    request_body = response.request.body if response.request is not None else None
+    sent_bytes = len(request_body) if request_body else 0
+
+    get_transfer_stats().record(endpoint_template(response.url), sent_bytes, wire_bytes, body_bytes)
+
+    call = getattr(response, "_call_record", None)
+    if call is not None:
+        call.sent_bytes, call.wire_bytes = sent_bytes, wire_bytes
+
+
+def http_request(method, url, attempt=1, **kwargs):
+    """
+    Request a través de la sesión compartida con contabilidad de bytes
+
+    Args:
+        attempt: número de intento (1 = primero) para el registro de llamadas
+
+    - El timeout se recorta al tiempo restante del ciclo (DeadlineExceeded si no alcanza)
+    - Si el endpoint tiene el circuito abierto falla rápido con CircuitOpenError
+    - Errores de conexión/timeout y respuestas 5xx/429 cuentan como fallas del endpoint
+    - Cada llamada se suma a las métricas del ciclo en curso (cycle_metrics.py)
+
+    Con stream=True y status 200 el cuerpo queda sin leer: quien lo consuma debe llamar
+    a record_response (json_decoding.decode_response_page ya lo hace)
+    """
+    deadline = current_deadline()
+    if deadline is not None:
+        kwargs["timeout"] = deadline.clamp_timeout(kwargs.get("timeout"))
+
+    endpoint = endpoint_template(url)
+    breaker = get_circuit_breaker(endpoint)
+    breaker.allow()
+    settled = False  # el breaker ya registró el resultado (si no, la prueba del half-open se libera)
+    start = time.perf_counter()
+    try:
+        try:
+            response = get_http_session().request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            settled = True
+            elapsed = time.perf_counter() - start
+            record_call(endpoint, elapsed, "error")
+            record_http_call(method.upper(), endpoint, "error", attempt, elapsed)
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        settled = True
+    finally:
+        if not settled:
+            breaker.release_probe()
+
+    elapsed = time.perf_counter() - start
+    record_call(endpoint, elapsed, response.status_code)
+    response._call_record = record_http_call(method.upper(), endpoint, response.status_code, attempt, elapsed)
+
+    if not kwargs.get("stream") or response.status_code != 200:
+        record_response(response)
+        response._call_record.throttled = is_throttle_response(response)
+    return response
+
+
+def reset_transfer_stats():
+    """
+    Abre contadores nuevos para el ciclo que arranca (al inicio de cada ciclo)
+    Quedan ligados al contexto actual, así dos jobs concurrentes no mezclan sus bytes
+    """
+    _cycle_transfer_stats.set(TransferStats())
+
+
+def print_transfer_summary(title="TRANSFERENCIA HTTP"):
+    """Imprime el resumen de bytes por endpoint del ciclo"""
+    get_transfer_stats().print_summary(title)
+
+
+if __name__ == "__main__":
+    """Test de plantillas de endpoint y contadores"""
+    print("\n" + "="*70)
+    print(" TEST: Capa HTTP compartida")
+    print("="*70 + "\n")
+
+    cases = {
+        "https://graph.facebook.com/v23.0/act_123/insights?fields=spend": "graph:/{id}/insights",
+        "https://graph.facebook.com/v23.0/act_123/adsets": "graph:/{id}/adsets",
+        "https://graph.facebook.com/v23.0/120212345/ads": "graph:/{id}/ads",
+        "https://graph.facebook.com/v23.0/120212345": "graph:/{id}",
+        "https://webapi.leadpier.com/v1/api/stats/user/sources": "leadpier:/v1/api/stats/user/sources",
+    }
+    for url, expected in cases.items():
+        template = endpoint_template(url)
+        print(f"{'✓' if template == expected else '✗'} {template}")
+
+    stats = TransferStats()
+    stats.record("graph:/{id}/insights", 0, 40_000, 300_000)
+    stats.record("graph:/{id}/insights", 0, 42_000, 310_000)
+    stats.record("graph:/{id}", 120, 300, 300)
+    stats.print_summary("TEST")
+
+    print("\n" + "="*70)
@@ -0,0 +1,252 @@
+"""
+Caché particionado por día de spend de Meta Insights
+Evita volver a pedir a la API los días que ya no cambian (ventana de atribución cerrada)
+"""
+import os
+import json
+import time
+import datetime as dt
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class InsightsPartitionCache:
+    """
+    Caché de spend por adset particionado por cuenta y día
+    - Un archivo JSON por cuenta por día: <cache_dir>/<account_id>/<YYYY-MM-DD>.json
+    - Días cerrados (fuera de la ventana mutable) son inmutables: se leen del disco
+    - Días recientes (mutables) o faltantes se piden a la API y se guardan
+    - Una consulta de varios días suma localmente las particiones
+    """
+
+    def __init__(self, cache_dir=None, mutable_days=None):
+        """
+        Args:
+            cache_dir: Directorio base del caché (default: insights_cache junto a este módulo)
+            mutable_days: Cantidad de días recientes (incluido hoy) que todavía pueden cambiar
+                          (default: INSIGHTS_MUTABLE_DAYS del entorno o 1 = solo hoy)
+        """
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "insights_cache")
+        if mutable_days is None:
+            mutable_days = int(os.getenv("INSIGHTS_MUTABLE_DAYS", "1"))
+        self.mutable_days = max(1, mutable_days)
+
+        # Estadísticas de la última consulta
+        self.last_cached_days = 0
+        self.last_fetched_days = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _partition_path(self, account_id: str, day: str) -> str:
+        """Obtiene la ruta del archivo de la partición cuenta/día"""
+        safe_account = "".join(c if c.isalnum() else "_" for c in account_id)
+        return os.path.join(self.cache_dir, safe_account, f"{day}.json")
+
+    def is_immutable(self, day: str, today: str) -> bool:
+        """Un día es inmutable si quedó fuera de los últimos `mutable_days` días"""
+        day_date = dt.date.fromisoformat(day)
+        today_date = dt.date.fromisoformat(today)
+        return (today_date - day_date).days >= self.mutable_days
+
+    def load_partition(self, account_id: str, day: str) -> Optional[Dict]:
+        """
+        Lee una partición del disco
+
+        Returns:
+            dict con 'spend' (adset_id -> spend) y 'final' (bool), o None si no existe
+        """
+        filepath = self._partition_path(account_id, day)
+        if not os.path.exists(filepath):
+            return None
+
+        try:
+            with open(filepath, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[INSIGHTS CACHE] Error al leer partición {account_id}/{day}: {e}")
+            return None
+
+    def save_partition(self, account_id: str, day: str, spend_by_adset: Dict[str, float], final: bool):
+        """
+        Guarda una partición de forma atómica
+
+        Args:
+            final: True si el día ya es inmutable (no se volverá a pedir a la API)
+        """
+        filepath = self._partition_path(account_id, day)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        partition = {
+            'account_id': account_id,
+            'day': day,
+            'final': final,
+            'fetched_at': time.time(),
+            'spend': spend_by_adset,
+        }
+
+        tmp_path = filepath + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(partition, f)
+            os.replace(tmp_path, filepath)
+        except Exception as e:
+            print(f"[INSIGHTS CACHE] Error al guardar partición {account_id}/{day}: {e}")
+
+    def get_range_spend(self, account_id: str, start_date: str, end_date: str,
+                        fetch_day: Callable[[str, str], Optional[Dict[str, float]]],
+                        today: Optional[str] = None) -> Dict[str, float]:
+        """
+        Obtiene el spend por adset sumado en el rango [start_date, end_date]
+
+        Args:
+            account_id: Cuenta publicitaria
+            start_date, end_date: Fechas YYYY-MM-DD (inclusive)
+            fetch_day: función (account_id, day) -> {adset_id: spend} o None si la petición falló
+            today: Fecha de hoy en UTC-4 (default: end_date)
+
+        Returns:
+            (dict adset_id -> spend total del rango, True si faltó algún día: el total no es confiable)
+        """
+        def fetch_days(account_id, missing_days):
+            # Una petición por día faltante
+            return {day: fetch_day(account_id, day) for day in missing_days}
+
+        windows = {"range": (start_date, end_date)}
+        per_window, incomplete = self.get_windows_spend(account_id, windows, fetch_days, today=today or end_date)
+        return {adset_id: spends["range"] for adset_id, spends in per_window.items()}, incomplete
+
+    def get_windows_spend(self, account_id: str, windows: Dict[str, Tuple[str, str]],
+                          fetch_days: Callable[[str, List[str]], Optional[Dict[str, Optional[Dict[str, float]]]]],
+                          today: str) -> Tuple[Dict[str, Dict[str, float]], bool]:
+        """
+        Obtiene el spend por adset de varias ventanas a la vez, pidiendo a la API
+        solo los días faltantes o mutables (en una sola llamada a `fetch_days`)
+
+        Args:
+            account_id: Cuenta publicitaria
+            windows: dict nombre -> (since, until) en YYYY-MM-DD (inclusive)
+            fetch_days: función (account_id, días_faltantes) -> {día: {adset_id: spend} o None},
+                        o None si la petición falló por completo
+            today: Fecha de hoy en UTC-4
+
+        Returns:
+            (dict adset_id -> {nombre_ventana: spend}, incompleto); si faltó algún día las sumas
+            quedan cortas (no es spend real) y quien las use no debe decidir con ellas
+        """
+        needed_days = sorted({day for since, until in windows.values() for day in self.days_in_range(since, until)})
+        daily: Dict[str, Dict[str, float]] = {}
+        missing_days = []
+
+        for day in needed_days:
+            partition = self.load_partition(account_id, day)
+            if partition is not None and self.is_immutable(day, today) and partition.get('final'):
+                daily[day] = partition.get('spend', {})
+            else:
+                missing_days.append(day)
+
+        cached_days = len(daily)
+        fetched_days = 0
+        failed_days = []
+
+        if missing_days:
+            fetched = fetch_days(account_id, missing_days) or {}
+            for day in missing_days:
+                spend_by_adset = fetched.get(day)
+                if spend_by_adset is None:
+                    # No cachear fallos: un día vacío por error quedaría fijo para siempre
+                    failed_days.append(day)
+                    continue
+                self.save_partition(account_id, day, spend_by_adset, final=self.is_immutable(day, today))
+                daily[day] = spend_by_adset
+                fetched_days += 1
+
+        self.last_cached_days = cached_days
+        self.last_fetched_days = fetched_days
+        print(f"[INSIGHTS CACHE] {account_id}: {cached_days} días desde caché, {fetched_days} desde la API")
+        if failed_days:
+            print(f"[INSIGHTS CACHE] WARNING: No se pudo obtener {account_id} para {', '.join(failed_days)}; "
+                  f"ventanas incompletas")
+
+        # Agregación local por ventana
+        result: Dict[str, Dict[str, float]] = {}
+        for name, (since, until) in windows.items():
+            for day in self.days_in_range(since, until):
+                for adset_id, spend in daily.get(day, {}).items():
+                    entry = result.setdefault(adset_id, {w: 0.0 for w in windows})
+                    entry[name] += spend
+        return result, bool(failed_days)
+
+    @staticmethod
+    def days_in_range(start_date: str, end_date: str) -> List[str]:
+        """Lista de días YYYY-MM-DD entre start_date y end_date (inclusive)"""
+        start = dt.date.fromisoformat(start_date)
+        end = dt.date.fromisoformat(end_date)
+        return [(start + dt.timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+    def cleanup(self, keep_days=35, today: Optional[str] = None):
+        """Elimina particiones más viejas que `keep_days` días"""
+        today_date = dt.date.fromisoformat(today) if today else dt.date.today()
+        removed = 0
+
+        for account_dir in os.listdir(self.cache_dir):
+            account_path = os.path.join(self.cache_dir, account_dir)
+            if not os.path.isdir(account_path):
+                continue
+            for filename in os.listdir(account_path):
+                if not filename.endswith(".json"):
+                    continue
+                try:
+                    day_date = dt.date.fromisoformat(filename[:-5])
+                except ValueError:
+                    continue
+                if (today_date - day_date).days > keep_days:
+                    os.remove(os.path.join(account_path, filename))
+                    removed += 1
+
+        print(f"[INSIGHTS CACHE] Limpieza: {removed} particiones eliminadas")
+
+
+# Instancia global
+_global_insights_cache = None
+
+def get_insights_partition_cache():
+    """Obtiene la instancia global del caché particionado"""
+    global _global_insights_cache
+    if _global_insights_cache is None:
+        _global_insights_cache = InsightsPartitionCache()
+    return _global_insights_cache
+
+
+if __name__ == "__main__":
+    """Test del caché particionado"""
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Caché particionado de Insights")
+    print("="*70 + "\n")
+
+    cache = InsightsPartitionCache(cache_dir=tempfile.mkdtemp(), mutable_days=1)
+    api_calls = []
+
+    def fake_fetch_day(account_id, day):
+        api_calls.append(day)
+        return {"adset_1": 10.0, "adset_2": 1.5}
+
+    print("Test 1: Primera consulta de 8 días (todo desde la API)...")
+    totals, incomplete = cache.get_range_spend("act_1", "2025-01-01", "2025-01-08", fake_fetch_day)
+    print(f"{'✓' if not incomplete else '✗'} Totales: {totals} | llamadas API: {len(api_calls)}")
+
+    print("\nTest 2: Misma consulta (solo hoy es mutable)...")
+    api_calls.clear()
+    totals, _ = cache.get_range_spend("act_1", "2025-01-01", "2025-01-08", fake_fetch_day)
+    print(f"{'✓' if api_calls == ['2025-01-08'] else '✗'} Llamadas API: {api_calls}")
+
+    print("\nTest 3: Día siguiente (ayer pasa a inmutable y se pide una última vez)...")
+    api_calls.clear()
+    cache.get_range_spend("act_1", "2025-01-02", "2025-01-09", fake_fetch_day)
+    print(f"{'✓' if api_calls == ['2025-01-08', '2025-01-09'] else '✗'} Llamadas API: {api_calls}")
+
+    print("\nTest 4: Falla el día mutable (el resto sale del caché)...")
+    totals, incomplete = cache.get_range_spend("act_1", "2025-01-03", "2025-01-10", lambda account_id, day: None)
+    print(f"{'✓' if incomplete else '✗'} Ventana marcada incompleta (suma parcial: {totals})")
+
+    print("\n" + "="*70)
@@ -0,0 +1,276 @@
+"""
+Ejecución de jobs de `schedule` sin bloquear el loop principal
+- Cada job tiene su propio hilo: schedule.run_pending() solo encola el disparo y vuelve
+- Protección de solapamiento por job: "skip" descarta el disparo si la corrida anterior sigue,
+  "coalesce" deja como máximo una corrida pendiente para cuando termine
+- `group`: jobs del mismo grupo no corren a la vez (revisión y escalamiento comparten la
+  sesión de LeadPier); la espera cuenta como demora en cola
+- Timeout por job: la corrida se ejecuta dentro de un deadline de ciclo (resilience.py),
+  así requests y reintentos se recortan solos; si igual se pasa, se reporta
+- Registra demora en cola (disparo -> inicio) y duración de cada corrida
+"""
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import nullcontext
+
+from resilience import cycle_deadline
+from hedged_fetch import percentile
+
+JOB_HISTORY_SIZE = 100
+
+OVERLAP_SKIP = "skip"
+OVERLAP_COALESCE = "coalesce"
+
+
+class Job:
+    """Un job con su hilo, su disparo pendiente y sus estadísticas"""
+
+    def __init__(self, name, fn, timeout=None, overlap=OVERLAP_SKIP, group_lock=None):
+        if overlap not in (OVERLAP_SKIP, OVERLAP_COALESCE):
+            raise ValueError(f"overlap debe ser '{OVERLAP_SKIP}' o '{OVERLAP_COALESCE}': {overlap}")
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self.overlap = overlap
+        self.group_lock = group_lock
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.queue_delays = deque(maxlen=JOB_HISTORY_SIZE)
+        self.runtimes = deque(maxlen=JOB_HISTORY_SIZE)
+
+        self._cond = threading.Condition()
+        self._pending_at = None   # monotonic del disparo pendiente (None si no hay)
+        self._started_at = None   # monotonic del inicio de la corrida en curso
+        self._busy = False        # tomó un disparo (esperando el grupo o corriendo)
+        self._overrun_reported = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker, name=f"job-{name}", daemon=True)
+        self._thread.start()
+
+    # ---------- disparo (hilo del scheduler) ----------
+    def trigger(self):
+        """Encola una corrida; nunca bloquea"""
+        now = time.monotonic()
+        with self._cond:
+            self._check_overrun(now)
+            if self._busy or self._pending_at is not None:
+                if self.overlap == OVERLAP_SKIP:
+                    self.skipped += 1
+                    print(f"[JOB] {self.name}: la corrida anterior sigue en curso, se omite este disparo")
+                    return
+                if self._pending_at is not None:
+                    self.coalesced += 1  # ya hay una pendiente: se fusiona con ella
+                    return
+            self._pending_at = now
+            self._cond.notify()
+
+    def _check_overrun(self, now):
+        """Reporta una sola vez la corrida que excede su timeout (el hilo no se puede matar)"""
+        if (self.timeout and self._started_at is not None and not self._overrun_reported
+                and now - self._started_at > self.timeout):
+            self._overrun_reported = True
+            self.timeouts += 1
+            print(f"[JOB] {self.name}: lleva {now - self._started_at:.0f}s, excede su timeout de {self.timeout:.0f}s")
+
+    # ---------- ejecución (hilo del job) ----------
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending_at is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                triggered_at, self._pending_at = self._pending_at, None
+                self._busy = True
+
+            with self.group_lock or nullcontext():
+                started_at = time.monotonic()
+                with self._cond:
+                    self._started_at = started_at
+                    self._overrun_reported = False
+                # Contexto limpio por corrida: deadline, métricas y contadores de transferencia propios
+                ok = contextvars.Context().run(self._run_once)
+                runtime = time.monotonic() - started_at
+
+            with self._cond:
+                self._busy = False
+                self._started_at = None
+                self.runs += 1
+                if not ok:
+                    self.failures += 1
+                if self.timeout and runtime > self.timeout and not self._overrun_reported:
+                    self.timeouts += 1
+                self.queue_delays.append(started_at - triggered_at)
+                self.runtimes.append(runtime)
+
+    def _run_once(self):
+        deadline = cycle_deadline(self.timeout, self.name) if self.timeout else nullcontext()
+        try:
+            with deadline:
+                self.fn()
+            return True
+        except Exception as e:
+            print(f"[JOB] {self.name} falló: {type(e).__name__}: {e}")
+            return False
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def is_running(self):
+        with self._cond:
+            return self._busy
+
+    def get_stats(self):
+        with self._cond:
+            delays, runtimes = list(self.queue_delays), list(self.runtimes)
+            running_for = time.monotonic() - self._started_at if self._started_at is not None else None
+            return {
+                "runs": self.runs, "failures": self.failures, "skipped": self.skipped,
+                "coalesced": self.coalesced, "timeouts": self.timeouts, "running_for": running_for,
+                "queue_delay_last": delays[-1] if delays else None,
+                "queue_delay_p95": percentile(delays, 95),
+                "runtime_last": runtimes[-1] if runtimes else None,
+                "runtime_p50": percentile(runtimes, 50),
+                "runtime_p95": percentile(runtimes, 95),
+            }
+
+
+class JobRunner:
+    """
+    Registro de jobs con hilo propio
+
+    Uso:
+        jobs = JobRunner()
+        schedule.every(10).minutes.do(jobs.add("revisión", revisar_con_jitter, timeout=540, group="ciclos"))
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._groups = {}
+
+    def add(self, name, fn, timeout=None, overlap=OVERLAP_SKIP, group=None):
+        """
+        Registra un job y devuelve la función de disparo para schedule
+
+        Args:
+            timeout: segundos; la corrida se ejecuta dentro de un deadline de ciclo con ese presupuesto
+            overlap: "skip" o "coalesce" si llega un disparo con la corrida anterior en curso
+            group: nombre de grupo de exclusión mutua (None: corre en paralelo con todo)
+        """
+        group_lock = self._groups.setdefault(group, threading.Lock()) if group else None
+        job = Job(name, fn, timeout=timeout, overlap=overlap, group_lock=group_lock)
+        self.jobs[name] = job
+        return job.trigger
+
+    def trigger(self, name):
+        """Dispara un job ya registrado (p.ej. la primera corrida al arrancar)"""
+        self.jobs[name].trigger()
+
+    def wait_idle(self, timeout=None):
+        """Espera a que ningún job tenga corridas en curso ni pendientes (tests y apagado)"""
+        end = time.monotonic() + timeout if timeout else None
+        while any(job.is_running() or job._pending_at is not None for job in self.jobs.values()):
+            if end is not None and time.monotonic() > end:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        for job in self.jobs.values():
+            job.stop()
+
+    def get_stats(self):
+        return {name: job.get_stats() for name, job in self.jobs.items()}
+
+    def gauge(self, key):
+        """Función para MetricsRegistry.register_gauge: [({"job": nombre}, valor)] de una estadística"""
+        return lambda: [({"job": name}, stats[key]) for name, stats in self.get_stats().items()]
+
+    def print_summary(self):
+        """Imprime corridas, omitidos, demora en cola y duración por job"""
+        if not self.jobs:
+            return
+        print("\n🗂️  JOBS:")
+        print(f"   {'Job':<16}{'Corridas':>9}{'Fallas':>8}{'Omit.':>7}{'Fusion.':>8}{'Timeout':>8}"
+              f"{'Cola p95':>10}{'Dur. p50':>10}{'Dur. p95':>10}")
+        for name, stats in self.get_stats().items():
+            print(f"   {name:<16}{stats['runs']:>9}{stats['failures']:>8}{stats['skipped']:>7}"
+                  f"{stats['coalesced']:>8}{stats['timeouts']:>8}{_format_seconds(stats['queue_delay_p95']):>10}"
+                  f"{_format_seconds(stats['runtime_p50']):>10}{_format_seconds(stats['runtime_p95']):>10}")
+
+
+def _format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.1f}s"
+
+
+if __name__ == "__main__":
+    """Test: disparos no bloquean, skip/coalesce, grupos y timeout"""
+    print("\n" + "="*70)
+    print(" TEST: Jobs en hilos propios")
+    print("="*70 + "\n")
+
+    from resilience import deadline_expired
+
+    runner = JobRunner()
+    runs = []
+
+    def slow():
+        time.sleep(0.5)
+        runs.append("lento")
+
+    def fast():
+        runs.append("rápido")
+
+    def cooperative():
+        while not deadline_expired():
+            time.sleep(0.05)
+        runs.append("cortado")
+
+    trigger_slow = runner.add("lento", slow, overlap=OVERLAP_SKIP)
+    trigger_fast = runner.add("rápido", fast)
+
+    start = time.monotonic()
+    trigger_slow()
+    trigger_fast()
+    elapsed = time.monotonic() - start
+    time.sleep(0.1)
+    print(f"{'✓' if elapsed < 0.01 and runs == ['rápido'] else '✗'} Disparar no bloquea y un job lento no frena a otro")
+
+    trigger_slow()
+    runner.wait_idle(timeout=5)
+    stats = runner.jobs["lento"].get_stats()
+    print(f"{'✓' if stats['skipped'] == 1 and stats['runs'] == 1 else '✗'} skip: {stats['skipped']} disparo omitido")
+
+    trigger_coalesce = runner.add("fusionado", slow, overlap=OVERLAP_COALESCE)
+    trigger_coalesce()
+    time.sleep(0.1)  # la primera ya arrancó: las siguientes se fusionan en una sola pendiente
+    for _ in range(3):
+        trigger_coalesce()
+    runner.wait_idle(timeout=5)
+    stats = runner.jobs["fusionado"].get_stats()
+    print(f"{'✓' if stats['runs'] == 2 and stats['coalesced'] == 2 else '✗'} coalesce: 4 disparos -> {stats['runs']} corridas")
+    print(f"{'✓' if stats['queue_delay_last'] >= 0.4 else '✗'} Demora en cola de la corrida fusionada: {stats['queue_delay_last']:.2f}s")
+
+    trigger_a = runner.add("ciclo_a", slow, group="ciclos")
+    trigger_b = runner.add("ciclo_b", slow, group="ciclos")
+    start = time.monotonic()
+    trigger_a()
+    trigger_b()
+    runner.wait_idle(timeout=5)
+    print(f"{'✓' if time.monotonic() - start >= 1.0 else '✗'} Mismo grupo no corre en paralelo ({time.monotonic() - start:.2f}s)")
+
+    runner.add("con_timeout", cooperative, timeout=3)()
+    runner.wait_idle(timeout=10)
+    stats = runner.jobs["con_timeout"].get_stats()
+    print(f"{'✓' if runs[-1] == 'cortado' and stats['runtime_last'] < 3.5 else '✗'} El timeout llega al job como deadline ({stats['runtime_last']:.1f}s)")
+
+    runner.print_summary()
+    print("\n" + "="*70)
@@ -0,0 +1,175 @@
+"""
+Decodificación de respuestas JSON de Graph y LeadPier
+- Usa orjson si está instalado (fallback: json de la stdlib)
+- Modo streaming (ijson) para páginas grandes: solo proyecta los campos necesarios
+  de cada registro sin materializar la página completa
+"""
+import json
+
+from http_transport import record_response
+
+try:
+    import orjson
+    JSON_BACKEND = "orjson"
+except ImportError:
+    orjson = None
+    JSON_BACKEND = "json"
+
+try:
+    import ijson
+    STREAMING_AVAILABLE = True
+except ImportError:
+    ijson = None
+    STREAMING_AVAILABLE = False
+
+# Tamaño de lectura del parser streaming (buffers chicos = pico de memoria chico)
+STREAM_BUF_SIZE = 16 * 1024
+
+# Eventos de ijson que representan valores escalares
+_SCALAR_EVENTS = ("string", "number", "boolean", "null")
+
+
+def loads(data):
+    """Decodifica bytes/str JSON con el backend más rápido disponible"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_response(response):
+    """
+    Reemplazo de `response.json()` que usa el backend rápido
+
+    Raises:
+        ValueError si el cuerpo no es JSON válido (igual que response.json())
+    """
+    return loads(response.content)
+
+
+def _project(record, fields):
+    """Deja solo los campos pedidos de un registro"""
+    return {field: record[field] for field in fields if field in record}
+
+
+def decode_page(payload, fields, records_key="data"):
+    """
+    Decodifica una página de registros quedándose solo con `fields` de cada uno
+
+    Args:
+        payload: bytes de la respuesta o un archivo/stream (p.ej. response.raw)
+        fields: campos a conservar de cada registro (p.ej. ("adset_id", "spend"))
+        records_key: clave de la lista de registros en la raíz (default: "data")
+
+    Returns:
+        dict con la misma forma que la respuesta de Graph:
+        {records_key: [registros proyectados], "paging": {"next": ...}} (paging solo si existe)
+        Si `records_key` no es una lista se avisa y se devuelve sin registros: quien espere
+        otra forma debe decodificar completo con `loads`
+    """
+    if not STREAMING_AVAILABLE:
+        # Sin ijson: decodificación completa y proyección
+        if hasattr(payload, "read"):
+            payload = payload.read()
+        page = loads(payload)
+        if not isinstance(page, dict):
+            return page
+        if page.get(records_key) is not None and not isinstance(page[records_key], list):
+            _warn_shape(records_key, type(page[records_key]).__name__)
+        result = {records_key: [_project(r, fields) for r in page.get(records_key) or [] if isinstance(r, dict)]}
+        if page.get("paging", {}).get("next"):
+            result["paging"] = {"next": page["paging"]["next"]}
+        return result
+
+    return _stream_page(payload, frozenset(fields), records_key)
+
+
+def _warn_shape(records_key, found):
+    print(f"[JSON] '{records_key}' llegó como {found} en vez de lista: la página se ignora")
+
+
+def _stream_page(payload, fields, records_key):
+    """Parser por eventos: arma solo los registros proyectados y paging.next"""
+    item_prefix = f"{records_key}.item"
+    field_prefixes = {f"{item_prefix}.{field}": field for field in fields}
+
+    records = []
+    next_url = None
+    current = None
+
+    for prefix, event, value in ijson.parse(payload, buf_size=STREAM_BUF_SIZE, use_float=True):
+        if prefix == records_key and event == "start_map":
+            _warn_shape(records_key, "dict")
+        elif prefix == item_prefix:
+            if event == "start_map":
+                current = {}
+            elif event == "end_map":
+                records.append(current)
+                current = None
+        elif current is not None and event in _SCALAR_EVENTS:
+            field = field_prefixes.get(prefix)
+            if field is not None:
+                current[field] = value
+        elif prefix == "paging.next" and event == "string":
+            next_url = value
+
+    result = {records_key: records}
+    if next_url:
+        result["paging"] = {"next": next_url}
+    return result
+
+
+class _CountingReader:
+    """Envuelve un stream y cuenta los bytes descomprimidos leídos"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def decode_response_page(response, fields, records_key="data"):
+    """
+    Decodifica una respuesta pedida con `stream=True` directo del socket, sin
+    cargar el cuerpo completo en memoria (si ijson está disponible)
+    """
+    try:
+        if STREAMING_AVAILABLE:
+            response.raw.decode_content = True  # descomprimir gzip/deflate/br al leer
+            reader = _CountingReader(response.raw)
+            page = decode_page(reader, fields, records_key)
+            record_response(response, body_bytes=reader.bytes_read)
+            return page
+        page = decode_page(response.content, fields, records_key)
+        record_response(response)
+        return page
+    finally:
+        response.close()
+
+
+if __name__ == "__main__":
+    """Test del decodificador"""
+    print("\n" + "="*70)
+    print(f" TEST: Decodificador JSON (backend: {JSON_BACKEND}, streaming: {STREAMING_AVAILABLE})")
+    print("="*70 + "\n")
+
+    raw = json.dumps({
+        "data": [
+            {"adset_id": "1", "adset_name": "A", "spend": "12.5", "actions": [{"x": 1}]},
+            {"adset_id": "2", "spend": "3", "extra": {"nested": True}},
+        ],
+        "paging": {"cursors": {"after": "x"}, "next": "https://next"},
+    }).encode()
+
+    page = decode_page(raw, ("adset_id", "spend"))
+    expected = {
+        "data": [{"adset_id": "1", "spend": "12.5"}, {"adset_id": "2", "spend": "3"}],
+        "paging": {"next": "https://next"},
+    }
+    print(f"{'✓' if page == expected else '✗'} Página proyectada: {page}")
+    print(f"{'✓' if loads(raw) == json.loads(raw) else '✗'} loads() equivalente a json.loads")
+
+    print("\n" + "="*70)
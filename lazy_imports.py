@@ -0,0 +1,68 @@
+"""
+Imports diferidos para dependencias pesadas
+Selenium, undetected-chromedriver, selenium-wire y pandas solo se cargan en el primer uso
+"""
+import importlib
+import importlib.util
+import threading
+
+
+class LazyModule:
+    """
+    Proxy que importa un módulo (o un atributo de un módulo) recién en el primer uso
+    - Acceso a atributos:  By.CSS_SELECTOR, pd.DataFrame(...)
+    - Llamadas directas:   Options(), ChromeDriverManager().install()
+    """
+
+    def __init__(self, module_name, attribute=None):
+        """
+        Args:
+            module_name: Nombre del módulo a importar (p.ej. "selenium.webdriver.common.by")
+            attribute: Atributo del módulo a exponer (p.ej. "By"); None expone el módulo completo
+        """
+        object.__setattr__(self, "_module_name", module_name)
+        object.__setattr__(self, "_attribute", attribute)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        """Importa el módulo la primera vez y devuelve el objeto real"""
+        target = self._target
+        if target is None:
+            with self._lock:
+                target = self._target
+                if target is None:
+                    target = importlib.import_module(self._module_name)
+                    if self._attribute:
+                        target = getattr(target, self._attribute)
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._module_name}.{self._attribute}" if self._attribute else self._module_name
+        state = "cargado" if self._target is not None else "diferido"
+        return f"<LazyModule {name} ({state})>"
+
+
+def lazy_import(module_name, attribute=None):
+    """Devuelve un proxy que importa `module_name` (o `module_name.attribute`) en el primer uso"""
+    return LazyModule(module_name, attribute)
+
+
+def is_available(module_name):
+    """Verifica si un módulo está instalado sin importarlo"""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def is_loaded(proxy):
+    """True si el proxy ya importó su módulo"""
+    return isinstance(proxy, LazyModule) and proxy._target is not None
@@ -6,26 +6,23 @@ import os
 import time
 import json
 import requests
+from dotenv import load_dotenv
+from lazy_imports import lazy_import
+from driver_binary import resolve_chromedriver, measure_driver_startup
+from browser_supervisor import register_driver, quit_driver
 
-# Intentar importar selenium-wire
-try:
-    from seleniumwire import webdriver as wire_webdriver
-    SELENIUM_WIRE_AVAILABLE = True
-    print("[DEBUG] selenium-wire importado exitosamente")
-except ImportError as e:
-    wire_webdriver = None
-    SELENIUM_WIRE_AVAILABLE = False
-    print(f"[DEBUG] selenium-wire no disponible: {e}")
+# Stack de navegador diferido: solo se carga si hace falta un login automático
+webdriver = lazy_import("selenium.webdriver")
+By = lazy_import("selenium.webdriver.common.by", "By")
+WebDriverWait = lazy_import("selenium.webdriver.support.ui", "WebDriverWait")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+selenium_exceptions = lazy_import("selenium.common.exceptions")
+Service = lazy_import("selenium.webdriver.chrome.service", "Service")
+Options = lazy_import("selenium.webdriver.chrome.options", "Options")
 
-# Importar clases estándar de selenium (siempre necesarias)
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from dotenv import load_dotenv
+# selenium-wire se resuelve en el primer login (ver _load_selenium_wire)
+wire_webdriver = None
+SELENIUM_WIRE_AVAILABLE = None  # None = todavía no se intentó importar
 
 # Cargar variables de entorno desde la ubicación correcta
 env_path = os.path.join(os.path.dirname(__file__), "enviorement.env")
@@ -36,6 +33,11 @@ LEADPIER_EMAIL = os.getenv("LEADPIER_EMAIL")
 LEADPIER_PASSWORD = os.getenv("LEADPIER_PASSWORD")
 PROXY_URL = os.getenv("PROXY_URL")
 
+# Tope de cada espera por condición durante el login (reemplaza los sleeps fijos)
+LOGIN_WAIT_TIMEOUT = float(os.getenv("LOGIN_WAIT_TIMEOUT", "20"))
+# Cada validación del token es una request autenticada a la API: se reintenta espaciada, no cada 250ms
+TOKEN_VALIDATION_POLL_SECONDS = float(os.getenv("TOKEN_VALIDATION_POLL_SECONDS", "4"))
+
 
 def get_proxies():
     """Retorna el diccionario de proxies para usar en requests"""
@@ -44,6 +46,101 @@ def get_proxies():
     return None
 
 
+def _load_selenium_wire():
+    """Intenta importar selenium-wire una sola vez (en el primer login automático)"""
+    global wire_webdriver, SELENIUM_WIRE_AVAILABLE
+    
+    if SELENIUM_WIRE_AVAILABLE is None:
+        try:
+            from seleniumwire import webdriver as _wire_webdriver
+            wire_webdriver = _wire_webdriver
+            SELENIUM_WIRE_AVAILABLE = True
+            print("[DEBUG] selenium-wire importado exitosamente")
+        except ImportError as e:
+            wire_webdriver = None
+            SELENIUM_WIRE_AVAILABLE = False
+            print(f"[DEBUG] selenium-wire no disponible: {e}")
+    
+    return SELENIUM_WIRE_AVAILABLE
+
+
+# ================== ESPERAS DEL LOGIN ==================
+_LOCALSTORAGE_TOKEN_JS = """
+try {
+    const auth = localStorage.getItem('authentication');
+    return auth ? (JSON.parse(auth).token || null) : null;
+} catch (e) {
+    return null;
+}
+"""
+
+
+class LoginTimer:
+    """
+    Spans de tiempo por paso del login automático (para ver dónde se va la latencia del refresh)
+    Cada `mark(paso)` cierra el paso en curso: registra el tiempo desde la marca anterior
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._last_mark = self.started_at
+        self.steps = []
+
+    def mark(self, step):
+        now = time.monotonic()
+        self.steps.append((step, now - self._last_mark))
+        self._last_mark = now
+
+    def print_summary(self):
+        total = time.monotonic() - self.started_at
+        print(f"[AUTH TIMING] Login automático: {total:.1f}s")
+        for step, seconds in self.steps:
+            print(f"[AUTH TIMING]   {step:<28}{seconds:>6.1f}s")
+
+
+def _page_loaded(driver):
+    """Condición: documento completamente cargado"""
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def _localstorage_token(driver):
+    """Condición: token de la app disponible en localStorage.authentication"""
+    return driver.execute_script(_LOCALSTORAGE_TOKEN_JS)
+
+
+def _left_login_page(driver):
+    """Condición: la app redirigió fuera de /login"""
+    return '/login' not in driver.current_url
+
+
+def _api_request_captured(driver):
+    """Condición: selenium-wire capturó una request autenticada a la API (sin selenium-wire: no aplica)"""
+    if not hasattr(driver, 'requests'):
+        return True
+    for request in driver.requests:
+        if 'webapi.leadpier.com' in request.url and request.headers.get('authorization'):
+            return True
+    return False
+
+
+def _wait_for(driver, condition, description, timeout=None, poll=0.25):
+    """
+    Espera una condición con tope de tiempo
+
+    Args:
+        poll: segundos entre evaluaciones (las condiciones locales son baratas; las que piden a la API no)
+
+    Returns:
+        valor de la condición, o None si se agotó el tope
+    """
+    timeout = timeout or LOGIN_WAIT_TIMEOUT
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
+    except selenium_exceptions.TimeoutException:
+        print(f"[AUTH] Timeout ({timeout:g}s) esperando {description}")
+        return None
+
+
 def validate_bearer_token():
     """
     Valida si el bearer token actual funciona haciendo una petición POST a webapi.leadpier.com
@@ -104,6 +201,8 @@ def auto_login_leadpier(email, password, headless=True):
         str: Bearer token si el login es exitoso, None si falla
     """
     driver = None
+    timer = LoginTimer()
+    _load_selenium_wire()
     try:
         print("[AUTH] Iniciando proceso de login automatico...")
         
@@ -139,24 +238,27 @@ def auto_login_leadpier(email, password, headless=True):
         
         # Inicializar driver
         print("[AUTH] Iniciando navegador...")
-        if SELENIUM_WIRE_AVAILABLE and wire_webdriver:
-            driver = wire_webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=chrome_options,
-                seleniumwire_options=seleniumwire_options
-            )
-        else:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=chrome_options
-            )
+        with measure_driver_startup("auth"):
+            if SELENIUM_WIRE_AVAILABLE and wire_webdriver:
+                driver = wire_webdriver.Chrome(
+                    service=Service(resolve_chromedriver()),
+                    options=chrome_options,
+                    seleniumwire_options=seleniumwire_options
+                )
+            else:
+                driver = webdriver.Chrome(
+                    service=Service(resolve_chromedriver()),
+                    options=chrome_options
+                )
+        register_driver(driver, "auth")
+        timer.mark("iniciar navegador")
         
         # Navegar a la página de login
         print("[AUTH] Navegando a https://dash.leadpier.com/login...")
         driver.get("https://dash.leadpier.com/login")
         
         # Esperar a que cargue la página
-        wait = WebDriverWait(driver, 30)
+        wait = WebDriverWait(driver, LOGIN_WAIT_TIMEOUT, poll_frequency=0.25)
         
         # Esperar y llenar el campo de email
         print("[AUTH] Ingresando credenciales...")
@@ -170,6 +272,7 @@ def auto_login_leadpier(email, password, headless=True):
         password_field = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
         password_field.clear()
         password_field.send_keys(password)
+        timer.mark("formulario de login")
         
         # Hacer clic en el botón de login (intentar diferentes selectores)
         print("[AUTH] Buscando boton de Login...")
@@ -209,7 +312,7 @@ def auto_login_leadpier(email, password, headless=True):
             try:
                 # Método 2: Scroll y click
                 driver.execute_script("arguments[0].scrollIntoView(true);", login_button)
-                time.sleep(0.5)
+                wait.until(EC.element_to_be_clickable(login_button))
                 login_button.click()
                 print("[AUTH] Click exitoso (con scroll)")
             except:
@@ -222,21 +325,14 @@ def auto_login_leadpier(email, password, headless=True):
                     print(f"[AUTH] ERROR: No se pudo hacer click en el boton: {e}")
                     return None
         
-        # Esperar a que el login se complete
-        print("[AUTH] Esperando respuesta del servidor...")
-        time.sleep(3)
+        timer.mark("submit")
         
-        # Verificar si el login fue exitoso (debe redirigir fuera de /login)
+        # Esperar a que el login se complete (debe redirigir fuera de /login)
+        print("[AUTH] Esperando respuesta del servidor...")
+        if _wait_for(driver, _left_login_page, "la redirección fuera de /login"):
+            print(f"[AUTH] Login completado exitosamente")
         current_url = driver.current_url
-        
-        # Esperar a que la URL cambie (indicando login exitoso)
-        max_wait = 15
-        for i in range(max_wait):
-            current_url = driver.current_url
-            if '/login' not in current_url:
-                print(f"[AUTH] Login completado exitosamente")
-                break
-            time.sleep(1)
+        timer.mark("redirección post-login")
         
         if '/login' in current_url:
             print("[AUTH] ERROR: El login no se completó (aún en página de login)")
@@ -265,10 +361,10 @@ def auto_login_leadpier(email, password, headless=True):
             print("[AUTH] Verifica las credenciales en enviorement.env")
             return None
         
-        # Dar tiempo para que se cargue la página inicial después del login
-        # IMPORTANTE: Dar más tiempo para que el token se active en el servidor
-        print("[AUTH] Esperando a que el token se active en el servidor...")
-        time.sleep(5)
+        # La app guarda el token en localStorage al terminar el login
+        print("[AUTH] Esperando el token en localStorage...")
+        _wait_for(driver, _localstorage_token, "el token en localStorage")
+        timer.mark("token en localStorage")
         
         # Navegar a la página de estadísticas que dispare requests API para capturar el token
         print("[AUTH] Navegando a pagina de estadisticas para capturar requests API...")
@@ -276,9 +372,10 @@ def auto_login_leadpier(email, password, headless=True):
             # Navegar a la página correcta de estadísticas de marketer
             driver.get("https://dash.leadpier.com/marketer-statistics/sources")
             
-            # Esperar a que la página cargue completamente
+            # Esperar a que la página cargue y dispare requests autenticadas a la API
             print("[AUTH] Esperando que carguen los datos...")
-            time.sleep(8)
+            _wait_for(driver, _page_loaded, "la carga de estadísticas")
+            _wait_for(driver, _api_request_captured, "requests a la API")
             
             # Verificar que la página cargó correctamente
             current_url = driver.current_url
@@ -289,14 +386,10 @@ def auto_login_leadpier(email, password, headless=True):
             # Hacer scroll para activar lazy loading y disparar más requests
             try:
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-                time.sleep(2)
                 driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
             except:
                 pass
-            
-            # Esperar adicional para que se disparen todos los requests
-            time.sleep(2)
+            timer.mark("página de estadísticas")
             
             # NUEVO: Intentar hacer que el navegador ejecute una petición API y capturar el token usado
             try:
@@ -425,7 +518,22 @@ def auto_login_leadpier(email, password, headless=True):
             });
             """
             
-            browser_validation = driver.execute_script(validate_from_browser)
+            # Primero las condiciones locales (sin requests); después se valida contra la API y, si el
+            # token todavía no está activo en el servidor, se reintenta cada TOKEN_VALIDATION_POLL_SECONDS
+            if _left_login_page(driver):
+                _wait_for(driver, _localstorage_token, "el token en localStorage")
+            last_validation = {}
+            
+            def token_accepted(d):
+                last_validation.clear()
+                last_validation.update(d.execute_script(validate_from_browser) or {})
+                if last_validation.get('success') or not last_validation.get('token'):
+                    return dict(last_validation)
+                return False
+            
+            browser_validation = _wait_for(driver, token_accepted, "que la API acepte el token",
+                                           poll=TOKEN_VALIDATION_POLL_SECONDS) or dict(last_validation)
+            timer.mark("validación en navegador")
             
             if browser_validation and browser_validation.get('success'):
                 bearer_token = browser_validation.get('token')
@@ -668,10 +776,6 @@ def auto_login_leadpier(email, password, headless=True):
                 print(f"[AUTH WARNING] El token no tiene formato JWT válido (tiene {token_parts} puntos, debería tener 2)")
                 print(f"[AUTH DEBUG] Token completo: {bearer_token}")
             
-            # Esperar un poco más antes de validar para dar tiempo a que el token se active
-            print("[AUTH] Esperando 3 segundos adicionales antes de validar...")
-            time.sleep(3)
-            
             # Validar temporalmente el token
             temp_validate_url = "https://webapi.leadpier.com/v1/api/stats/user/sources"
             temp_payload = {"limit": 1, "offset": 0, "periodFrom": "today", "periodTo": "today", "source": "BM5_1"}
@@ -775,7 +879,7 @@ def auto_login_leadpier(email, password, headless=True):
                 if 'leadpier.com' not in current_url:
                     print("[AUTH] Navegando a leadpier.com para obtener cookies...")
                     driver.get("https://dash.leadpier.com/marketer-statistics/sources")
-                    time.sleep(5)
+                    _wait_for(driver, _page_loaded, "la carga de estadísticas")
                 
                 # Extraer todas las cookies del navegador
                 cookies = driver.get_cookies()
@@ -785,7 +889,7 @@ def auto_login_leadpier(email, password, headless=True):
                 if len(cookies) == 0:
                     print("[AUTH] No hay cookies, intentando navegar a página principal...")
                     driver.get("https://dash.leadpier.com/")
-                    time.sleep(3)
+                    _wait_for(driver, _page_loaded, "la carga de la página principal")
                     cookies = driver.get_cookies()
                     print(f"[AUTH DEBUG] Cookies después de navegar a /: {len(cookies)}")
                 
@@ -942,7 +1046,8 @@ def auto_login_leadpier(email, password, headless=True):
     finally:
         if driver:
             print("[AUTH] Cerrando navegador...")
-            driver.quit()
+            quit_driver(driver)
+        timer.print_summary()
 
 
 def update_env_bearer_token(new_token):
@@ -12,7 +12,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_binary import resolve_chromedriver, measure_driver_startup
+from browser_supervisor import register_driver, quit_driver
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -57,10 +58,12 @@ def create_stealth_driver(headless=False):
     })
     
     # Inicializar driver
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
+    with measure_driver_startup("stealth"):
+        driver = webdriver.Chrome(
+            service=Service(resolve_chromedriver()),
+            options=chrome_options
+        )
+    register_driver(driver, "stealth")
     
     # JavaScript para ocultar webdriver y otras propiedades de automatización
     stealth_js = """
@@ -337,7 +340,7 @@ def stealth_login_leadpier(email, password, headless=False):
         if driver:
             print("[STEALTH AUTH] Cerrando navegador...")
             time.sleep(2)  # Dar un poco más de tiempo antes de cerrar
-            driver.quit()
+            quit_driver(driver)
 
 
 def validate_bearer_token():
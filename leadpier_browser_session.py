@@ -8,7 +8,8 @@ import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_binary import resolve_chromedriver, measure_driver_startup
+from browser_supervisor import register_driver, quit_driver
 from dotenv import load_dotenv
 import pandas as pd
 
@@ -36,10 +37,12 @@ def get_leadpier_data_from_browser():
         chrome_options.add_experimental_option('useAutomationExtension', False)
         chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
         
-        driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=chrome_options
-        )
+        with measure_driver_startup("browser"):
+            driver = webdriver.Chrome(
+                service=Service(resolve_chromedriver()),
+                options=chrome_options
+            )
+        register_driver(driver, "browser")
         
         # Ir a login
         print("[BROWSER] Navegando a login...")
@@ -122,7 +125,7 @@ def get_leadpier_data_from_browser():
     finally:
         if driver:
             print("[BROWSER] Cerrando navegador...")
-            driver.quit()
+            quit_driver(driver)
 
 
 def process_leadpier_data(data):
@@ -33,6 +33,10 @@ class CacheManager:
         
         # Cargar índice de caché
         self.index = self._load_index()
+        
+        # Contadores de aciertos (para el hit ratio del endpoint de métricas)
+        self.hits = 0
+        self.misses = 0
     
     def _load_index(self) -> Dict:
         """Carga el índice de caché desde disco"""
@@ -70,6 +74,7 @@ class CacheManager:
             Datos cacheados o None si no existe o expiró
         """
         if not self.is_valid(key):
+            self.misses += 1
             return None
         
         try:
@@ -79,9 +84,11 @@ class CacheManager:
             
             age = time.time() - cache_entry['timestamp']
             print(f"[CACHE] Hit para '{key}' (edad: {int(age)}s)")
+            self.hits += 1
             return cache_entry['data']
         except Exception as e:
             print(f"[CACHE] Error al leer '{key}': {e}")
+            self.misses += 1
             return None
     
     def set(self, key: str, data: Any, ttl: Optional[int] = None):
@@ -187,6 +194,11 @@ class CacheManager:
         
         print(f"[CACHE] Limpieza: {len(expired)} entradas expiradas")
     
+    def hit_ratio(self) -> Optional[float]:
+        """Fracción de lecturas servidas desde caché (None si todavía no hubo lecturas)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+    
     def get_stats(self) -> Dict:
         """Obtiene estadísticas del caché"""
         total = len(self.index)
@@ -205,7 +217,10 @@ class CacheManager:
             'valid_entries': valid,
             'expired_entries': expired,
             'total_size_bytes': total_size,
-            'total_size_mb': round(total_size / (1024 * 1024), 2)
+            'total_size_mb': round(total_size / (1024 * 1024), 2),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio()
         }
     
     def print_stats(self):
@@ -218,6 +233,7 @@ class CacheManager:
         print(f"Entradas válidas: {stats['valid_entries']}")
         print(f"Entradas expiradas: {stats['expired_entries']}")
         print(f"Tamaño total: {stats['total_size_mb']} MB")
+        print(f"Aciertos/fallos: {stats['hits']}/{stats['misses']}")
         print("="*50 + "\n")
 
 
@@ -261,6 +277,11 @@ class LeadPierCache:
 # Instancia global
 _global_cache = None
 
+
+def peek_leadpier_cache():
+    """Instancia global si ya existe, sin crearla (para métricas)"""
+    return _global_cache
+
 def get_leadpier_cache(ttl=300):
     """Obtiene la instancia global del caché"""
     global _global_cache
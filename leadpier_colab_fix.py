@@ -50,7 +50,8 @@ def patch_leadpier_auth_for_colab():
         from selenium.webdriver.support.ui import WebDriverWait
         from selenium.webdriver.support import expected_conditions as EC
         from selenium.webdriver.chrome.service import Service
-        from webdriver_manager.chrome import ChromeDriverManager
+        from driver_binary import resolve_chromedriver, measure_driver_startup
+        from browser_supervisor import register_driver, quit_driver
         import os
         import time
         
@@ -66,11 +67,13 @@ def patch_leadpier_auth_for_colab():
             # Usar opciones de Colab
             options = get_colab_chrome_options()
             
-            # Service para chromedriver
-            service = Service('/usr/bin/chromedriver')
+            # Service para chromedriver (el de apt en Colab; si no está, se resuelve una vez)
+            service = Service(resolve_chromedriver(preferred='/usr/bin/chromedriver'))
             
             print("[AUTH COLAB] Iniciando navegador...")
-            driver = webdriver.Chrome(service=service, options=options)
+            with measure_driver_startup("auth"):
+                driver = webdriver.Chrome(service=service, options=options)
+            register_driver(driver, "auth")
             driver.set_page_load_timeout(30)
             
             print("[AUTH COLAB] Navegando a login...")
@@ -113,7 +116,7 @@ def patch_leadpier_auth_for_colab():
                 }
             """)
             
-            driver.quit()
+            quit_driver(driver)
             
             if token:
                 print(f"[AUTH COLAB] ✅ Token obtenido exitosamente")
@@ -125,7 +128,7 @@ def patch_leadpier_auth_for_colab():
         except Exception as e:
             print(f"[AUTH COLAB] ❌ Error: {e}")
             try:
-                driver.quit()
+                quit_driver(driver)
             except:
                 pass
             return None
@@ -146,11 +149,12 @@ def patch_undetected_session_for_colab():
             """Versión adaptada para Colab - usa Selenium estándar"""
             from selenium import webdriver
             from selenium.webdriver.chrome.service import Service
+            from driver_binary import resolve_chromedriver
             
             print("[UNDETECTED COLAB] Usando Selenium estándar (Colab)")
             
             options = get_colab_chrome_options()
-            service = Service('/usr/bin/chromedriver')
+            service = Service(resolve_chromedriver(preferred='/usr/bin/chromedriver'))
             
             driver = webdriver.Chrome(service=service, options=options)
             
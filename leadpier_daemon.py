@@ -0,0 +1,239 @@
+"""
+Daemon único que aloja los tres procesos como jobs con ventanas horarias
+- Revisión/escalamiento (leadpiertest1.py), prender pausados (ReviewAndOn) y extractor de posts (Post Id)
+  corren en el mismo proceso: comparten pool HTTP, token de LeadPier, navegador y cachés
+- Cada job declara su ventana en UTC-4 ("07-18", "19-07" cruza la medianoche); fuera de ella
+  sus disparos se ignoran y el daemon sigue vivo hasta la próxima apertura en vez de salir
+- Al abrirse una ventana el job corre de inmediato (como el arranque de cada script)
+- Los jobs que escriben reportes comparten el grupo "ciclos": nunca corren a la vez
+- No se cambia el cwd (es de todo el proceso y los hilos de keep-alive, prefetch y hedging no
+  respetan el grupo): cada script resuelve sus CSV y su .env contra su propio directorio
+Uso:
+    python leadpier_daemon.py
+Ventanas por entorno: SCHEDULER_WINDOW, PRENDER_WINDOW, EXTRACTOR_WINDOW
+"""
+import os
+import sys
+import time
+import datetime as dt
+import importlib.util
+
+import schedule
+
+from job_runner import OVERLAP_COALESCE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRENDER_DIR = os.path.join(BASE_DIR, "ReviewAndOn")
+EXTRACTOR_DIR = os.path.join(BASE_DIR, "Post Id")
+
+SCHEDULER_WINDOW = os.getenv("SCHEDULER_WINDOW", "07-18")   # leadpiertest1.py se detenía a las 18:00
+PRENDER_WINDOW = os.getenv("PRENDER_WINDOW", "19-07")       # prender_adsets_pausados.py: 7PM a 7AM
+EXTRACTOR_WINDOW = os.getenv("EXTRACTOR_WINDOW", "07-18")
+PRENDER_INTERVAL_MINUTES = int(os.getenv("PRENDER_INTERVAL_MINUTES", "60"))
+EXTRACTOR_INTERVAL_MINUTES = int(os.getenv("EXTRACTOR_INTERVAL_MINUTES", "360"))
+KEEP_ALIVE_INTERVAL_MINUTES = 2
+
+UTC_OFFSET_HOURS = -4
+
+
+def now_utc_minus_4():
+    return dt.datetime.utcnow() + dt.timedelta(hours=UTC_OFFSET_HOURS)
+
+
+class Window:
+    """Franja horaria diaria [inicio, fin) en UTC-4; si inicio > fin cruza la medianoche"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        try:
+            start, end = (self._parse(part) for part in spec.split("-"))
+        except ValueError:
+            raise ValueError(f"Ventana inválida '{spec}' (formato HH-HH o HH:MM-HH:MM)")
+        self.start, self.end = start, end
+
+    @staticmethod
+    def _parse(part):
+        hours, _, minutes = part.strip().partition(":")
+        value = int(hours) * 60 + int(minutes or 0)
+        if not 0 <= value <= 24 * 60:
+            raise ValueError(part)
+        return value
+
+    def contains(self, now):
+        minute = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def next_open(self, now):
+        """Próximo instante (UTC-4) en que abre la ventana"""
+        opening = now.replace(hour=0, minute=0, second=0, microsecond=0) + dt.timedelta(minutes=self.start)
+        return opening if opening > now else opening + dt.timedelta(days=1)
+
+    def __str__(self):
+        return f"{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d}"
+
+
+class DaemonJob:
+    """Declaración de un job: qué corre, cada cuánto, en qué ventana y con qué opciones del JobRunner"""
+
+    def __init__(self, name, fn, every_minutes, window=None, run_on_open=True, **runner_options):
+        self.name = name
+        self.fn = fn
+        self.every_minutes = every_minutes
+        self.window = Window(window) if window else None
+        self.run_on_open = run_on_open
+        self.runner_options = runner_options
+        self.trigger = None
+        self.is_open = None  # None hasta el primer tick
+
+    def in_window(self, now):
+        return self.window is None or self.window.contains(now)
+
+    def scheduled_trigger(self):
+        """Disparo de schedule: fuera de la ventana no hace nada"""
+        if self.in_window(now_utc_minus_4()):
+            self.trigger()
+
+
+def _load_script(name, directory, filename):
+    """Importa un script de una carpeta que no es paquete ("Post Id" tiene espacio)"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_jobs():
+    """Tabla declarativa de jobs (importa los tres scripts una sola vez)"""
+    import leadpiertest1 as scheduler
+    from cycle_metrics import cycle_metrics
+
+    prender = _load_script("prender_adsets_pausados", PRENDER_DIR, "prender_adsets_pausados.py")
+    extractor = _load_script("post_extractor_consolidado", EXTRACTOR_DIR, "post_extractor_consolidado.py")
+
+    def prender_pausados():
+        with cycle_metrics("prender pausados"):
+            prender.prender_adsets_elegibles()
+
+    def extraer_posts():
+        with cycle_metrics("extractor de posts"):
+            extractor.export_results(extractor.extract_positive_roi_posts(incremental=True))
+
+    jobs = [
+        DaemonJob("revisión", scheduler.revisar_con_jitter, scheduler.REVISAR_INTERVAL_MINUTES,
+                  SCHEDULER_WINDOW, timeout=scheduler.REVISAR_DEADLINE_SECONDS, group="ciclos"),
+        DaemonJob("escalamiento", scheduler.escalamiento_con_jitter, scheduler.ESCALAMIENTO_INTERVAL_MINUTES,
+                  SCHEDULER_WINDOW, timeout=scheduler.ESCALAMIENTO_DEADLINE_SECONDS, overlap=OVERLAP_COALESCE,
+                  group="ciclos"),
+        DaemonJob("prender", prender_pausados, PRENDER_INTERVAL_MINUTES, PRENDER_WINDOW,
+                  timeout=prender.CYCLE_DEADLINE_SECONDS, group="ciclos"),
+        DaemonJob("extractor", extraer_posts, EXTRACTOR_INTERVAL_MINUTES, EXTRACTOR_WINDOW,
+                  timeout=extractor.CYCLE_DEADLINE_SECONDS, group="ciclos"),
+        # Sin ventana: fuera de horario cierra el navegador inactivo y limpia procesos huérfanos
+        DaemonJob("keep-alive", scheduler.keep_alive_leadpier, KEEP_ALIVE_INTERVAL_MINUTES,
+                  run_on_open=False, timeout=scheduler.KEEP_ALIVE_TIMEOUT_SECONDS),
+    ]
+    return scheduler, jobs
+
+
+def register_jobs(runner, jobs):
+    """Registra cada job en el JobRunner y en schedule"""
+    for job in jobs:
+        job.trigger = runner.add(job.name, job.fn, **job.runner_options)
+        schedule.every(job.every_minutes).minutes.do(job.scheduled_trigger)
+
+
+def tick(jobs, now=None):
+    """
+    Detecta aperturas y cierres de ventana; dispara los jobs cuya ventana acaba de abrir
+
+    Returns:
+        nombres de los jobs disparados por apertura
+    """
+    now = now or now_utc_minus_4()
+    opened = []
+    for job in jobs:
+        is_open = job.in_window(now)
+        if is_open == job.is_open:
+            continue
+        if is_open:
+            if job.window is not None:
+                print(f"[DAEMON] {job.name}: ventana {job.window} abierta ({now.strftime('%H:%M')} UTC-4)")
+            if job.run_on_open:
+                job.trigger()
+                opened.append(job.name)
+        elif job.window is not None:
+            print(f"[DAEMON] {job.name}: ventana cerrada, próxima apertura "
+                  f"{job.window.next_open(now).strftime('%d/%m %H:%M')} UTC-4")
+        job.is_open = is_open
+    return opened
+
+
+def print_schedule(jobs):
+    print("[INFO] Jobs del daemon (UTC-4):")
+    for job in jobs:
+        window = str(job.window) if job.window else "siempre"
+        print(f"   {job.name:<14} cada {job.every_minutes:>4} min | ventana {window}")
+
+
+def main():
+    scheduler, jobs = build_jobs()
+    scheduler.setup_runtime()
+    register_jobs(scheduler._jobs, jobs)
+    print_schedule(jobs)
+
+    try:
+        while True:
+            tick(jobs)
+            scheduler.process_signal_requests()
+            schedule.run_pending()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n[STOP] Interrumpido por el usuario")
+    finally:
+        scheduler._jobs.print_summary()
+        scheduler.cleanup_on_exit()
+
+
+def _self_test():
+    """Test: ventanas que cruzan la medianoche y disparos por apertura"""
+    print("\n" + "="*70)
+    print(" TEST: Ventanas del daemon")
+    print("="*70 + "\n")
+
+    at = lambda hour, minute=0: dt.datetime(2024, 1, 1, hour, minute)
+    night = Window("19-07")
+    day = Window("07:30-18")
+    print(f"{'✓' if night.contains(at(23)) and night.contains(at(3)) and not night.contains(at(12)) else '✗'} "
+          f"Ventana nocturna {night} cruza la medianoche")
+    print(f"{'✓' if not day.contains(at(7, 15)) and day.contains(at(7, 30)) and not day.contains(at(18)) else '✗'} "
+          f"Ventana diurna {day} con minutos, fin excluido")
+    print(f"{'✓' if night.next_open(at(12)) == at(19) and day.next_open(at(20)) == at(7, 30) + dt.timedelta(days=1) else '✗'} "
+          f"Próxima apertura")
+
+    fired = []
+    jobs = [DaemonJob("dia", None, 10, "07-18"), DaemonJob("noche", None, 60, "19-07"),
+            DaemonJob("siempre", None, 2, run_on_open=False)]
+    for job in jobs:
+        job.trigger = lambda name=job.name: fired.append(name)
+
+    first = tick(jobs, at(10))
+    same = tick(jobs, at(11))
+    evening = tick(jobs, at(19, 5))
+    print(f"{'✓' if first == ['dia'] and same == [] and evening == ['noche'] else '✗'} "
+          f"Disparos por apertura: {first} / {same} / {evening}")
+
+    jobs[0].scheduled_trigger()  # fuera de la ventana (según la hora real puede estar dentro)
+    print(f"· Disparo programado de 'dia' a las {now_utc_minus_4().strftime('%H:%M')} UTC-4: "
+          f"{'ejecutado' if fired[-1:] == ['dia'] and len(fired) == 3 else 'ignorado'}")
+
+    print("\n" + "="*70)
+
+
+if __name__ == "__main__":
+    if "--test" in sys.argv:
+        _self_test()
+    else:
+        main()
@@ -9,23 +9,27 @@ import pickle
 import atexit
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-import pandas as pd
+from dotenv import load_dotenv
+from lazy_imports import lazy_import, is_available
+from driver_binary import resolve_chromedriver, measure_driver_startup, get_driver_startup_stats
+from browser_processes import driver_rss, format_rss
+from browser_supervisor import register_driver, quit_driver
 
-try:
-    import undetected_chromedriver as uc
-    UNDETECTED_AVAILABLE = True
-except ImportError:
-    UNDETECTED_AVAILABLE = False
+# Dependencias pesadas diferidas: el navegador solo se carga cuando se crea un driver
+pd = lazy_import("pandas")
+
+UNDETECTED_AVAILABLE = is_available("undetected_chromedriver")
+if UNDETECTED_AVAILABLE:
+    uc = lazy_import("undetected_chromedriver")
+else:
     print("[WARNING] undetected-chromedriver no disponible. Instalar con: pip install undetected-chromedriver")
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from dotenv import load_dotenv
+webdriver = lazy_import("selenium.webdriver")
+By = lazy_import("selenium.webdriver.common.by", "By")
+WebDriverWait = lazy_import("selenium.webdriver.support.ui", "WebDriverWait")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+Service = lazy_import("selenium.webdriver.chrome.service", "Service")
+Options = lazy_import("selenium.webdriver.chrome.options", "Options")
 
 # Cargar variables de entorno
 env_path = os.path.join(os.path.dirname(__file__), "enviorement.env")
@@ -34,6 +38,9 @@ load_dotenv(dotenv_path=env_path)
 LEADPIER_EMAIL = os.getenv("LEADPIER_EMAIL")
 LEADPIER_PASSWORD = os.getenv("LEADPIER_PASSWORD")
 
+# Segundos sin uso tras los cuales se cierra el navegador (0 = nunca)
+BROWSER_IDLE_SECONDS = int(os.getenv("BROWSER_IDLE_SECONDS", "600"))
+
 # Importar monitor de detección
 try:
     from detection_monitor import get_detection_monitor
@@ -55,22 +62,28 @@ class LeadPierUndetectedSession:
     
     _instance = None  # Singleton para reutilizar sesión
     
-    def __init__(self, headless=True, cache_ttl=300):
+    def __init__(self, headless=True, cache_ttl=300, idle_timeout=BROWSER_IDLE_SECONDS):
         """
         Args:
             headless: Si True, ejecuta en modo headless
             cache_ttl: Tiempo de vida del caché en segundos (default: 5 minutos)
+            idle_timeout: Segundos sin uso antes de cerrar el navegador (ver evict_if_idle)
         """
         self.headless = headless
         self.driver = None
         self.session_active = False
         self.last_activity = None
+        self.idle_timeout = idle_timeout
+        self.evictions = 0
+        self.rss_freed_bytes = 0
         
         # Archivos de persistencia
         self.base_dir = os.path.dirname(__file__)
         self.cookies_file = os.path.join(self.base_dir, "leadpier_cookies.pkl")
         self.cache_file = os.path.join(self.base_dir, "leadpier_cache.json")
         self.cache_ttl = cache_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
         
         # Registrar cleanup al salir
         atexit.register(self.cleanup)
@@ -89,18 +102,6 @@ class LeadPierUndetectedSession:
         
         print("[UNDETECTED] Creando driver indetectable...")
         
-        # Fix para Windows Error 183 (archivo ya existe)
-        import shutil
-        uc_cache_dir = os.path.join(os.environ.get('APPDATA', ''), 'undetected_chromedriver')
-        uc_exe_path = os.path.join(uc_cache_dir, 'undetected_chromedriver.exe')
-        
-        if os.path.exists(uc_exe_path):
-            try:
-                os.remove(uc_exe_path)
-                print("[UNDETECTED] Limpieza preventiva de caché...")
-            except:
-                pass
-        
         options = uc.ChromeOptions()
         
         # Modo headless con configuración avanzada
@@ -126,8 +127,18 @@ class LeadPierUndetectedSession:
         options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
         
         try:
-            # Crear driver con undetected-chromedriver
-            driver = uc.Chrome(options=options, version_main=120, use_subprocess=True)
+            # Crear driver con undetected-chromedriver (reutiliza su ejecutable parcheado)
+            try:
+                driver = uc.Chrome(options=options, version_main=120, use_subprocess=True)
+            except FileExistsError:
+                # Windows Error 183 (archivo ya existe): solo entonces se borra la copia y se reintenta
+                uc_exe_path = os.path.join(os.environ.get('APPDATA', ''), 'undetected_chromedriver', 'undetected_chromedriver.exe')
+                print("[UNDETECTED] Error 183: limpiando ejecutable cacheado y reintentando...")
+                try:
+                    os.remove(uc_exe_path)
+                except OSError:
+                    pass
+                driver = uc.Chrome(options=options, version_main=120, use_subprocess=True)
             print("[UNDETECTED] Driver creado exitosamente")
             
             # Aplicar stealth adicional
@@ -322,7 +333,7 @@ class LeadPierUndetectedSession:
         chrome_options.add_argument("--window-size=1920,1080")
         
         driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
+            service=Service(resolve_chromedriver()),
             options=chrome_options
         )
         
@@ -334,11 +345,18 @@ class LeadPierUndetectedSession:
             print("[UNDETECTED] Reutilizando sesión activa")
             return self.driver
         
+        # Un driver que dejó de responder se cierra antes de crear otro (si no, su Chrome queda huérfano)
+        if self.driver:
+            quit_driver(self.driver)
+            self.driver = None
+        
         try:
-            self.driver = self._create_undetected_driver()
+            with measure_driver_startup("undetected"):
+                self.driver = register_driver(self._create_undetected_driver(), "undetected")
         except Exception as e:
             print(f"[UNDETECTED] Fallando a selenium estándar: {e}")
-            self.driver = self._create_fallback_driver()
+            with measure_driver_startup("selenium"):
+                self.driver = register_driver(self._create_fallback_driver(), "selenium")
         
         self.session_active = True
         self.last_activity = datetime.now()
@@ -404,6 +422,7 @@ class LeadPierUndetectedSession:
     def get_cached_data(self):
         """Obtiene datos del caché si son válidos"""
         if not os.path.exists(self.cache_file):
+            self.cache_misses += 1
             return None
         
         try:
@@ -416,12 +435,15 @@ class LeadPierUndetectedSession:
             
             if age < self.cache_ttl:
                 print(f"[CACHE] Usando datos cacheados (edad: {int(age)}s)")
+                self.cache_hits += 1
                 return cache['data']
             else:
                 print(f"[CACHE] Caché expirado (edad: {int(age)}s, TTL: {self.cache_ttl}s)")
+                self.cache_misses += 1
                 return None
         except Exception as e:
             print(f"[CACHE] Error al leer caché: {e}")
+            self.cache_misses += 1
             return None
     
     def save_to_cache(self, data):
@@ -671,9 +693,8 @@ class LeadPierUndetectedSession:
             return
         
         try:
-            # Pequeña actividad para mantener sesión
+            # Pequeña actividad para mantener sesión (no cuenta como uso para el cierre por inactividad)
             self.driver.execute_script("return document.readyState")
-            self.last_activity = datetime.now()
         except Exception as e:
             print(f"[KEEP-ALIVE] Error: {e}")
             self.session_active = False
@@ -683,9 +704,7 @@ class LeadPierUndetectedSession:
         if self.driver:
             try:
                 print("[SESSION] Cerrando navegador...")
-                self.driver.quit()
-            except:
-                pass
+                quit_driver(self.driver)  # mata lo que quede vivo si quit() falla
             finally:
                 self.driver = None
                 self.session_active = False
@@ -693,6 +712,47 @@ class LeadPierUndetectedSession:
     def cleanup(self):
         """Limpieza al salir"""
         self.close()
+    
+    def idle_seconds(self):
+        """Segundos desde la última obtención de datos (None si no hay navegador abierto)"""
+        if not self.driver or not self.last_activity:
+            return None
+        return (datetime.now() - self.last_activity).total_seconds()
+    
+    def evict_if_idle(self):
+        """
+        Cierra el navegador si lleva más de `idle_timeout` segundos sin uso
+        La próxima obtención de datos lo vuelve a crear (cookies y caché persisten en disco)
+        
+        Returns:
+            bytes de RSS liberados (0 si no se cerró; None si no se pudo medir)
+        """
+        idle = self.idle_seconds()
+        if idle is None or not self.idle_timeout or idle < self.idle_timeout:
+            return 0
+        
+        rss = driver_rss(self.driver)
+        print(f"[SESSION] Navegador inactivo {int(idle)}s (límite {self.idle_timeout}s): cerrando")
+        self.close()
+        self.evictions += 1
+        if rss:
+            self.rss_freed_bytes += rss
+        print(f"[SESSION] Memoria liberada: {format_rss(rss)}")
+        return rss
+    
+    def get_stats(self):
+        """Estado de la sesión, memoria del navegador y latencias de arranque del driver"""
+        return {
+            'driver_active': self.driver is not None,
+            'last_activity': self.last_activity.isoformat() if self.last_activity else None,
+            'idle_seconds': self.idle_seconds(),
+            'driver_rss_bytes': driver_rss(self.driver),
+            'evictions': self.evictions,
+            'rss_freed_bytes': self.rss_freed_bytes,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'driver_startups': get_driver_startup_stats(),
+        }
 
 
 # Instancia global singleton
@@ -3,16 +3,42 @@ import time
 import json
 import datetime as dt
 import requests
-import pandas as pd
 import schedule
 import random
 import atexit
+import threading
+from collections import Counter
 from dotenv import load_dotenv
+from lazy_imports import lazy_import
 from leadpier_auth import ensure_leadpier_token
 from leadpier_undetected_session import get_leadpier_session, process_leadpier_data
+from browser_processes import format_rss, process_rss
+from browser_supervisor import get_browser_supervisor
+from meta_insights import fetch_adsets_windows, iter_records
+from columnar_records import ColumnarRecords, FLOAT, BOOL, ID, STR, OBJECT, SPARSE
+from json_decoding import decode_response, decode_response_page
+from http_transport import http_request, reset_transfer_stats, print_transfer_summary
+from call_recorder import print_call_percentiles, install_dump_signal, process_pending_dump
+from cycle_profiler import with_cycle_profile, install_profile_signal, process_pending_arms
+from logging_setup import setup_logging, get_logger
+from memory_watchdog import install_memory_watchdog
+from job_runner import JobRunner, OVERLAP_COALESCE
+from warm_snapshot import WarmSnapshot, WARM_SNAPSHOT
+from hedged_fetch import HedgedFetcher, hedge_cancelled
+from cycle_metrics import cycle_metrics, with_cycle_metrics, span, timed_iter, add_rows, incr
+from metrics_server import start_metrics_server, get_registry
+from leadpier_cache_manager import peek_leadpier_cache
+from resilience import (CircuitOpenError, DeadlineExceeded, budgeted_sleep, deadline_expired,
+                        cycle_deadline, with_cycle_deadline, print_circuit_summary)
+
+pd = lazy_import("pandas")  # Se carga en el primer ciclo, no al arrancar
+log = get_logger("scheduler")  # Detalle por adset en DEBUG (LOG_LEVEL), resumen por cuenta en INFO
 
 # ================== CONFIG ==================
-load_dotenv(dotenv_path="enviorement.env")
+# Rutas relativas al script (no al cwd): el daemon aloja varios scripts en un mismo proceso
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_FILE = os.path.join(BASE_DIR, "enviorement.env")
+load_dotenv(dotenv_path=ENV_FILE)
 
 GRAPH_API_VERSION = "v23.0"
 FB_ACCESS_TOKEN   = os.getenv("FB_ACCESS_TOKEN")
@@ -38,6 +64,15 @@ SCALING_CONDITIONS = [
     {"spend_min": 500.0, "roi_min": 50.0},   # Condición 2: spend >= 500 y ROI >= 50  
     {"spend_min": 1000.0, "roi_min": 30.0},  # Condición 3: spend >= 1000 y ROI >= 30
 ]
+
+# Intervalos del scheduler y deadline por ciclo (un ciclo nunca pisa al siguiente; incluye el jitter)
+REVISAR_INTERVAL_MINUTES      = 10
+ESCALAMIENTO_INTERVAL_MINUTES = 60
+CYCLE_DEADLINE_FRACTION       = 0.9
+REVISAR_DEADLINE_SECONDS      = REVISAR_INTERVAL_MINUTES * 60 * CYCLE_DEADLINE_FRACTION       # 540s
+ESCALAMIENTO_DEADLINE_SECONDS = ESCALAMIENTO_INTERVAL_MINUTES * 60 * CYCLE_DEADLINE_FRACTION  # 3240s
+# Modo HTTP-first: el navegador undetected solo entra si el token no se pudo validar/renovar
+LEADPIER_HTTP_FIRST = os.getenv("LEADPIER_HTTP_FIRST", "1") == "1"
 SCALING_MULTIPLIER = 1.25  # Multiplicador para aumentar presupuesto (50% más)
 
 # ================== HELPERS ==================
@@ -81,10 +116,16 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
         initial_timeout: timeout inicial en segundos
         **kwargs: otros argumentos para requests (headers, data, params, etc.)
     
+    Los timeouts y esperas se recortan al deadline del ciclo en curso.
+    Si otro camino del hedging ya ganó, no se reintenta.
+    
     Returns:
         Response object o None si falla después de todos los reintentos
     """
     for attempt in range(max_retries):
+        if hedge_cancelled():
+            return None
+        
         # Incrementar timeout en cada reintento
         timeout = initial_timeout * (attempt + 1)
         
@@ -92,9 +133,9 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             print(f"[Leadpier] Intento {attempt + 1}/{max_retries} (timeout: {timeout}s)...")
             
             if method.upper() == 'GET':
-                response = requests.get(url, timeout=timeout, **kwargs)
+                response = http_request('GET', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             elif method.upper() == 'POST':
-                response = requests.post(url, timeout=timeout, **kwargs)
+                response = http_request('POST', url, attempt=attempt + 1, timeout=timeout, **kwargs)
             else:
                 raise ValueError(f"Método no soportado: {method}")
             
@@ -107,10 +148,16 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
             if attempt < max_retries - 1:
                 wait_time = 5 * (attempt + 1)  # Esperar 5s, 10s, 15s...
                 print(f"[Leadpier] Esperando {wait_time}s antes del siguiente intento...")
-                time.sleep(wait_time)
+                if not budgeted_sleep(wait_time):
+                    return None
             else:
                 print("[Leadpier] ERROR: Todos los reintentos fallaron por timeout/conexión")
                 return None
+        
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            # Sin reintentos: el endpoint está caído o el ciclo se quedó sin tiempo
+            print(f"[Leadpier] {e}")
+            return None
                 
         except Exception as e:
             print(f"[Leadpier] Error inesperado: {type(e).__name__}: {e}")
@@ -118,34 +165,46 @@ def leadpier_request_with_retry(method, url, max_retries=3, initial_timeout=30,
     
     return None
 
-def fb_get(url, params, retries=3, timeout=30):
-    """GET con manejo de rate limiting (error code 17)"""
+def fb_get(url, params, retries=3, timeout=30, fields=None):
+    """
+    GET con manejo de rate limiting (error code 17)
+    Si se pasan `fields`, la página se decodifica en modo streaming quedándose solo con esos campos
+    """
     proxies = get_proxies()
     for i in range(retries):
         try:
-            r = requests.get(url, params=params, timeout=timeout, proxies=proxies)
+            r = http_request('GET', url, attempt=i + 1, params=params, timeout=timeout, proxies=proxies, stream=bool(fields))
             if r.status_code == 200:
-                return r.json()
+                if fields:
+                    # Páginas grandes: solo los campos necesarios de cada registro
+                    return decode_response_page(r, fields)
+                return decode_response(r)
             
             # Manejar rate limiting específicamente
             if r.status_code == 400:
                 try:
-                    error_data = r.json()
+                    error_data = decode_response(r)
                     error_info = error_data.get("error", {})
                     if error_info.get("code") == 17:  # Rate limit error
+                        incr("throttle_17")
                         wait_time = (2 ** i) * 60  # Backoff exponencial: 60s, 120s, 240s
                         print(f"[RATE LIMIT] Límite de API alcanzado. Esperando {wait_time}s...")
-                        time.sleep(wait_time)
+                        if not budgeted_sleep(wait_time):
+                            return {}
                         continue  # Reintentar después del backoff
                 except:
                     pass
             
             print(f"[FB GET] {r.status_code}: {r.text[:200]}")
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[FB GET] {e}")
+            return {}
         except Exception as e:
             print(f"[FB GET] intento {i+1} error: {e}")
         
-        # Backoff exponencial estándar para otros errores
-        time.sleep(2 ** i)
+        # Backoff exponencial estándar para otros errores (sin esperar después del último intento)
+        if i < retries - 1 and not budgeted_sleep(2 ** i):
+            break
     return {}
 
 def fb_post(url, data, retries=3, timeout=30):
@@ -153,34 +212,43 @@ def fb_post(url, data, retries=3, timeout=30):
     proxies = get_proxies()
     for i in range(retries):
         try:
-            r = requests.post(url, data=data, timeout=timeout, proxies=proxies)
+            r = http_request('POST', url, attempt=i + 1, data=data, timeout=timeout, proxies=proxies)
             if r.status_code in (200, 201):
-                return r.json()
+                return decode_response(r)
             
             # Manejar rate limiting específicamente
             if r.status_code == 400:
                 try:
-                    error_data = r.json()
+                    error_data = decode_response(r)
                     error_info = error_data.get("error", {})
                     if error_info.get("code") == 17:  # Rate limit error
+                        incr("throttle_17")
                         wait_time = (2 ** i) * 60  # Backoff exponencial: 60s, 120s, 240s
                         print(f"[RATE LIMIT] Límite de API alcanzado. Esperando {wait_time}s...")
-                        time.sleep(wait_time)
+                        if not budgeted_sleep(wait_time):
+                            return {}
                         continue  # Reintentar después del backoff
                 except:
                     pass
             
             print(f"[FB POST] {r.status_code}: {r.text[:200]}")
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[FB POST] {e}")
+            return {}
         except Exception as e:
             print(f"[FB POST] intento {i+1} error: {e}")
         
-        # Backoff exponencial estándar para otros errores
-        time.sleep(2 ** i)
+        # Backoff exponencial estándar para otros errores (sin esperar después del último intento)
+        if i < retries - 1 and not budgeted_sleep(2 ** i):
+            break
     return {}
 
 # ================== LEADPIER ==================
 LP_BASE = "https://webapi.leadpier.com"
 
+# La sesión undetected se comparte entre el hedging y el keep-alive
+_browser_lock = threading.Lock()
+
 def fetch_leadpier_sources_df_fallback():
     """
     Método alternativo usando GET como en leadpierget.py
@@ -209,7 +277,8 @@ def fetch_leadpier_sources_df_fallback():
             print(f"[Leadpier Fallback] Status: {r.status_code}, {r.text[:200]}")
             return pd.DataFrame(columns=["adset_name", "revenue", "epl", "epc", "adset_name_norm"])
         
-        data = r.json()
+        # Decodificación completa: `data` puede llegar como lista de registros o como dict de columnas
+        data = decode_response(r)
         
         if not isinstance(data, dict) or "data" not in data:
             print(f"[Leadpier Fallback] Respuesta sin 'data': {str(data)[:200]}")
@@ -238,30 +307,39 @@ def fetch_leadpier_sources_df_fallback():
         print(f"[Leadpier Fallback] Error: {e}")
         return pd.DataFrame(columns=["adset_name", "revenue", "epl", "epc", "adset_name_norm"])
 
-def fetch_leadpier_sources_df():
+def fetch_leadpier_sources_df_browser():
     """
     Obtiene datos de LeadPier usando sistema undetected con caché
     - Primero intenta caché (si válida)
     - Luego usa sesión undetected persistente
-    - Fallback a navegador estándar si falla
     """
-    # Obtener sesión global (singleton con caché)
-    session = get_leadpier_session(headless=True)
-    
-    # Intentar obtener datos (usa caché automáticamente si válida)
-    print("[Leadpier] Obteniendo datos (con caché si disponible)...")
-    data = session.get_data()
-    
-    if data:
-        # Procesar y retornar datos
-        df = process_leadpier_data(data)
-        if not df.empty:
-            print(f"[OK] Datos de Leadpier obtenidos: {len(df)} registros")
-            return df
-    
-    # Si falla el método undetected, intentar fallback con token directo
-    print("[Leadpier] Método undetected falló, intentando con token directo...")
-    
+    if hedge_cancelled():
+        return pd.DataFrame()
+
+    # El navegador no es thread-safe: si el keep-alive lo está usando, este camino se descarta
+    if not _browser_lock.acquire(timeout=5):
+        print("[Leadpier] Navegador ocupado, se omite el camino undetected")
+        return pd.DataFrame()
+    try:
+        # Obtener sesión global (singleton con caché)
+        session = get_leadpier_session(headless=True)
+
+        # Intentar obtener datos (usa caché automáticamente si válida)
+        print("[Leadpier] Obteniendo datos (con caché si disponible)...")
+        data = session.get_data()
+    finally:
+        _browser_lock.release()
+
+    if not data:
+        return pd.DataFrame()
+
+    df = process_leadpier_data(data)
+    if not df.empty:
+        print(f"[OK] Datos de Leadpier obtenidos: {len(df)} registros")
+    return df
+
+def fetch_leadpier_sources_df_direct():
+    """POST directo a la API de LeadPier con el token bearer"""
     payload = {
         "limit": 200,
         "offset": 0,
@@ -276,9 +354,8 @@ def fetch_leadpier_sources_df():
     url = f"{LP_BASE}/v1/api/stats/user/sources"
     r = leadpier_request_with_retry('POST', url, headers=leadpier_headers(), data=json.dumps(payload), max_retries=3, initial_timeout=30)
 
-    if r is None or r.status_code != 200:
-        print("[Leadpier] ERROR: Todos los métodos fallaron")
-        print("[Leadpier] Continuando sin datos de revenue...")
+    if r is None:
+        print("[Leadpier] ERROR: No se pudo conectar con token directo")
         return pd.DataFrame()
     
     if r.status_code != 200:
@@ -286,7 +363,7 @@ def fetch_leadpier_sources_df():
         return pd.DataFrame()
 
     try:
-        data = r.json()
+        data = decode_response(r)
     except Exception as e:
         print("[Leadpier] JSON error:", e, r.text[:200])
         return pd.DataFrame()
@@ -361,68 +438,71 @@ def fetch_leadpier_sources_df():
     df["adset_name_norm"] = df["adset_name"].astype(str).str.strip().str.lower()
     return df
 
+# Caminos en orden de costo: el POST directo sale primero y los demás solo lo cubren
+# si no respondió dentro de su p95 de latencia (o si falló)
+_leadpier_fetcher = HedgedFetcher("leadpier", [
+    ("post", fetch_leadpier_sources_df_direct),
+    ("navegador", fetch_leadpier_sources_df_browser),
+    ("get", fetch_leadpier_sources_df_fallback),
+], is_valid=lambda df: df is not None and not df.empty)
+
+def fetch_leadpier_sources_df(token_valid=True):
+    """
+    Obtiene datos de LeadPier con cobertura entre POST directo, navegador undetected y GET
+    El primer camino con datos gana; los demás se cancelan
+    
+    En modo HTTP-first, con el token válido no se lanza el navegador (ni se mantiene abierto)
+    """
+    exclude = ("navegador",) if LEADPIER_HTTP_FIRST and token_valid else ()
+    df = _leadpier_fetcher.fetch(exclude=exclude)
+    if df is None or df.empty:
+        print("[Leadpier] ERROR: Todos los métodos fallaron")
+        print("[Leadpier] Continuando sin datos de revenue...")
+        return pd.DataFrame(columns=["adset_name", "revenue", "epl", "epc", "adset_name_norm"])
+    return df
+
 # ================== META ==================
-def fetch_account_adsets(account_id):
-    """Obtiene todos los adsets activos con sus budgets incluidos para evitar llamadas individuales"""
+ADSET_FIELDS = ("id", "name", "status", "daily_budget", "lifetime_budget")
+
+def iter_account_adsets(account_id):
+    """
+    Recorre los adsets activos de una cuenta página por página
+    Incluye los budgets para evitar llamadas individuales
+    """
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/adsets"
     params = {
         "access_token": FB_ACCESS_TOKEN,
-        "fields": "id,name,status,daily_budget,lifetime_budget",
+        "fields": ",".join(ADSET_FIELDS),
         "limit": 200
     }
-    rows = []
-    while True:
-        page = fb_get(url, params) or {}
-        rows.extend(page.get("data", []))
-        next_url = page.get("paging", {}).get("next")
-        if not next_url:
-            break
-        url, params = next_url, {}  # 'next' ya trae la query completa
-        time.sleep(0.5)  # Throttling entre páginas para evitar rate limiting
-    
-    # Filtrar solo adsets activos
-    active_rows = [row for row in rows if row.get("status") == "ACTIVE"]
-    return active_rows
+    # Throttling entre páginas para evitar rate limiting; la página siguiente se pide mientras se procesa la actual
+    for row in iter_records(fb_get, url, params, page_delay=0.5, fields=ADSET_FIELDS):
+        if row.get("status") == "ACTIVE":
+            yield row
 
-def fetch_adsets_report(account_id, start_date, end_date):
-    """Obtiene reporte completo de adsets para un rango de fechas usando Ads Reporting API"""
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/insights"
-    params = {
-        "access_token": FB_ACCESS_TOKEN,
-        "fields": "adset_id,adset_name,spend",
-        "time_range": json.dumps({"since": start_date, "until": end_date}),
-        "level": "adset",
-        "limit": 1000
-    }
-    
-    all_data = []
-    while True:
-        data = fb_get(url, params) or {}
-        if not data.get("data"):
-            break
-        
-        all_data.extend(data.get("data", []))
-        
-        # Verificar si hay más páginas
-        paging = data.get("paging", {})
-        next_url = paging.get("next")
-        if not next_url:
-            break
-        
-        # Actualizar URL y parámetros para la siguiente página
-        url = next_url
-        params = {}
-        time.sleep(0.5)  # Throttling entre páginas para evitar rate limiting
+def fetch_spend_windows(windows):
+    """
+    Obtiene el spend de varias ventanas para todas las cuentas (una consulta paginada por cuenta)
     
-    # Convertir a diccionario para búsqueda rápida
-    spend_data = {}
-    for item in all_data:
-        adset_id = item.get("adset_id")
-        spend = float(item.get("spend", 0) or 0)
-        if adset_id:
-            spend_data[adset_id] = spend
+    Args:
+        windows: dict nombre -> (since, until), p.ej. {"today": (hoy, hoy)}
     
-    return spend_data
+    Returns:
+        (dict adset_id -> {nombre_ventana: spend}, set de cuentas con reporte incompleto);
+        en esas cuentas un adset sin entrada no tiene spend conocido (no es spend 0)
+    """
+    spend_windows = {}
+    incomplete_accounts = set()
+    for account in AD_ACCOUNTS:
+        print(f"Obteniendo reporte de spend para cuenta {account}...")
+        account_map, complete = fetch_adsets_windows(fb_get, FB_ACCESS_TOKEN, account, windows, page_delay=0.5)
+        spend_windows.update(account_map)
+        if not complete:
+            incomplete_accounts.add(account)
+            print(f"[WARNING] Reporte de spend incompleto para {account} ({len(account_map)} adsets leídos); "
+                  f"los adsets sin dato no se deciden en este ciclo")
+        time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+    return spend_windows, incomplete_accounts
 
 def fetch_adset_spend_today(adset_id):
     """Obtiene el spend del adset para HOY en UTC-4"""
@@ -438,16 +518,16 @@ def fetch_adset_spend_today(adset_id):
     
     # Si no hay datos, devolver 0.0 (normal para adsets sin actividad)
     if not data.get("data"):
-        print(f"[DEBUG] Sin datos de spend para adset {adset_id} en fecha {t}")
+        log.debug("Sin datos de spend para adset %s en fecha %s", adset_id, t)
         return 0.0
     
     try:
         spend_value = float(data.get("data", [{}])[0].get("spend", 0) or 0)
         if spend_value > 0:
-            print(f"[INFO] Adset {adset_id}: spend ${spend_value:.2f}")
+            log.debug("Adset %s: spend $%.2f", adset_id, spend_value)
         return spend_value
     except Exception as e:
-        print(f"[ERROR] Error procesando spend para adset {adset_id}: {e}")
+        log.error("Error procesando spend para adset %s: %s", adset_id, e)
         return 0.0
 
 def determine_adset_action(spend, roi, adset_name):
@@ -517,7 +597,7 @@ def get_adset_budget_from_data(adset_data):
     }
 
 def get_adset_budget(adset_id):
-    """Obtiene el presupuesto diario actual del adset (solo usar si no se tiene en fetch_account_adsets)"""
+    """Obtiene el presupuesto diario actual del adset (solo usar si no se tiene en iter_account_adsets)"""
     url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{adset_id}"
     params = {
         "access_token": FB_ACCESS_TOKEN,
@@ -598,34 +678,114 @@ def pause_adset(adset_id):
     data = {"access_token": FB_ACCESS_TOKEN, "status": "PAUSED"}
     return fb_post(url, data)
 
+# ================== ARRANQUE EN CALIENTE ==================
+# Último ciclo bueno persistido: la primera corrida tras reiniciar reusa lo que siga vigente
+_warm_snapshot = WarmSnapshot()
+
+def validate_leadpier_token(warm=None):
+    """Valida (o renueva) el token de LeadPier; con un token del snapshot aún vigente no hace requests"""
+    global LEADPIER_BEARER
+    if warm is not None and warm.token_valid_for(LEADPIER_BEARER):
+        print("[WARM] Token del snapshot vigente - se omite la validación")
+        return True
+    if not ensure_leadpier_token():
+        return False
+    # Recargar el token actualizado
+    load_dotenv(dotenv_path=ENV_FILE, override=True)
+    LEADPIER_BEARER = os.getenv("LEADPIER_BEARER")
+    _warm_snapshot.record_token(LEADPIER_BEARER)
+    return True
+
+def leadpier_frame(token_valid, warm=None):
+    """Frame de LeadPier del snapshot si sigue vigente; si no, fetch con cobertura"""
+    if warm is not None and warm.leadpier is not None:
+        print(f"[WARM] Datos de LeadPier del snapshot ({len(warm.leadpier)} registros)")
+        return warm.leadpier
+    lp_df = fetch_leadpier_sources_df(token_valid)
+    _warm_snapshot.record_leadpier(lp_df)
+    return lp_df
+
+def spend_today(today, warm=None):
+    """
+    Spend de hoy para todas las cuentas (del snapshot si es de hoy y reciente)
+    
+    Returns:
+        (dict adset_id -> spend, set de cuentas con reporte incompleto)
+    """
+    restored = warm.spend_for(today) if warm is not None else None
+    if restored is not None:
+        print(f"[WARM] Spend del snapshot ({len(restored)} adsets)")
+        return dict(restored), set()
+    spend_windows, incomplete_accounts = fetch_spend_windows({"today": (today, today)})
+    all_spend_data = {adset_id: spends["today"] for adset_id, spends in spend_windows.items()}
+    if not incomplete_accounts:
+        _warm_snapshot.record_spend(today, all_spend_data)
+    return all_spend_data, incomplete_accounts
+
+def _recorded_account_adsets(account):
+    """iter_account_adsets que guarda la lista en el snapshot si se recorrió completa"""
+    rows = []
+    for row in iter_account_adsets(account):
+        rows.append(row)
+        yield row
+    _warm_snapshot.record_adsets(account, rows)
+
+def account_adsets(account, warm=None):
+    """
+    Adsets activos de una cuenta
+    
+    Returns:
+        (iterable, True si vienen del snapshot: status y budgets pueden estar desactualizados)
+    """
+    if warm is not None and account in warm.adsets:
+        return warm.adsets[account], True
+    return _recorded_account_adsets(account), False
+
+def commit_warm_snapshot():
+    """Confirma y persiste lo registrado por el ciclo (solo al terminarlo; uno cortado no deja nada)"""
+    if WARM_SNAPSHOT:
+        _warm_snapshot.commit_cycle()
+
 # ================== ESCALAMIENTO ==================
+# Columnas de los reportes CSV (acumulados por columna, ver columnar_records.py)
+SCALING_REPORT_SCHEMA = {
+    "account_id": STR, "adset_id": ID, "name": OBJECT,
+    "spend": FLOAT, "revenue": FLOAT, "roi": FLOAT,
+    "should_scale": BOOL, "condition_met": FLOAT, "reason": OBJECT,
+    "scaled": BOOL, "scaling_result": SPARSE,
+}
+
+ADSETS_REPORT_SCHEMA = {
+    "account_id": STR, "adset_id": ID, "name": OBJECT, "status": STR,
+    "spend": FLOAT, "revenue": FLOAT, "roi": FLOAT, "epl": FLOAT, "epc": FLOAT,
+    "action": STR, "reason": OBJECT,
+}
+
+@with_cycle_metrics("escalamiento")
+@with_cycle_profile("escalamiento")
+@with_cycle_deadline(ESCALAMIENTO_DEADLINE_SECONDS, "escalamiento")
 def escalamiento():
     """
     Función de escalado que se ejecuta cada hora.
     Revisa todos los adsets activos y escala aquellos que cumplan las condiciones.
     """
     print("\n=== ESCALAMIENTO", dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "UTC ===")
+    reset_transfer_stats()
+    warm = _warm_snapshot.start_cycle("escalamiento")  # restaurado solo en la primera corrida tras arrancar
     
     # Validar token de Leadpier antes de continuar
-    token_valid = ensure_leadpier_token()
+    with span("token"):
+        token_valid = validate_leadpier_token(warm)
     
-    if token_valid:
-        # Recargar el token actualizado
-        global LEADPIER_BEARER
-        load_dotenv(dotenv_path="enviorement.env", override=True)
-        LEADPIER_BEARER = os.getenv("LEADPIER_BEARER")
-    else:
+    if not token_valid:
         print("[WARNING] Token de Leadpier invalido. Continuando sin datos de Leadpier...")
         print("[WARNING] Solo se usaran datos de Facebook para tomar decisiones.")
     
     # 1) Obtener datos de Leadpier
     print("Obteniendo datos de Leadpier para escalamiento...")
-    lp_df = fetch_leadpier_sources_df()
-    
-    # Si falla, intentar método fallback
-    if lp_df.empty:
-        print("Método POST falló, intentando método fallback (GET)...")
-        lp_df = fetch_leadpier_sources_df_fallback()
+    with span("leadpier"):
+        lp_df = leadpier_frame(token_valid, warm)
+    add_rows("leadpier", len(lp_df))
     
     if lp_df.empty:
         print("[WARNING] Sin datos de Leadpier para escalamiento.")
@@ -635,26 +795,29 @@ def escalamiento():
 
     # 2) Obtener datos de spend para todas las cuentas de una vez
     print("Obteniendo datos de spend para escalamiento...")
-    all_spend_data = {}
     today = today_utc_minus_4_str()
-    
-    for account in AD_ACCOUNTS:
-        print(f"Obteniendo reporte de spend para cuenta {account}...")
-        spend_data = fetch_adsets_report(account, today, today)
-        all_spend_data.update(spend_data)
-        time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+    with span("insights"):
+        all_spend_data, incomplete_accounts = spend_today(today, warm)
+    add_rows("insights", len(all_spend_data))
     
     print(f"[OK] Datos de spend obtenidos para {len(all_spend_data)} adsets")
 
     # 3) Recorrer cuentas/adsets para escalamiento
-    scaling_results = []
+    scaling_results = ColumnarRecords(SCALING_REPORT_SCHEMA)
     
     for account in AD_ACCOUNTS:
-        print(f"Revisando escalamiento en cuenta {account}...")
-        adsets = fetch_account_adsets(account)
-        time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+        log.info("Revisando escalamiento en cuenta %s...", account)
+        with span("throttle"):
+            time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+
+        account_start = time.perf_counter()
+        counts = Counter()
+        adsets, from_snapshot = account_adsets(account, warm)
+        for a in timed_iter(adsets, "adsets"):
+            if deadline_expired():
+                log.warning("[DEADLINE] Sin tiempo para seguir escalando %s; se exporta lo procesado", account)
+                break
 
-        for a in adsets:
             adset_id = a["id"]
             name     = a.get("name", "")
             status   = a.get("status", "")
@@ -662,47 +825,57 @@ def escalamiento():
             # Solo procesar adsets activos
             if status != "ACTIVE":
                 continue
+            counts["activos"] += 1
 
-            name_norm = name.strip().lower()
-            row = lp_df[lp_df["adset_name_norm"] == name_norm]
+            if account in incomplete_accounts and adset_id not in all_spend_data:
+                # Reporte de spend incompleto: sin dato no se decide (spend 0 apagaría/escalaría mal)
+                counts["sin_spend"] += 1
+                log.debug("Sin spend conocido para %s (reporte incompleto): se omite", adset_id)
+                continue
 
-            revenue = float(row["revenue"].iloc[0]) if not row.empty else 0.0
-            
-            # Obtener spend del diccionario optimizado
-            spend = all_spend_data.get(adset_id, 0.0)
-            if spend > 0:
-                print(f"[INFO] Adset {adset_id}: spend ${spend:.2f}")
-            else:
-                print(f"[DEBUG] Sin datos de spend para adset {adset_id} en fecha {today}")
-            
-            roi     = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
+            with span("decisiones"):
+                name_norm = name.strip().lower()
+                row = lp_df[lp_df["adset_name_norm"] == name_norm]
 
-            # Determinar si debe escalarse
-            should_scale, condition_met, reason = determine_scaling_action(spend, roi, name)
-            
-            scaling_results.append({
-                "account_id": account,
-                "adset_id": adset_id,
-                "name": name,
-                "spend": spend,
-                "revenue": revenue,
-                "roi": roi,
-                "should_scale": should_scale,
-                "condition_met": condition_met,
-                "reason": reason,
-                "scaled": False,
-                "scaling_result": None
-            })
+                revenue = float(row["revenue"].iloc[0]) if not row.empty else 0.0
+                
+                # Obtener spend del diccionario optimizado
+                spend = all_spend_data.get(adset_id, 0.0)
+                if spend > 0:
+                    log.debug("Adset %s: spend $%.2f", adset_id, spend)
+                else:
+                    log.debug("Sin datos de spend para adset %s en fecha %s", adset_id, today)
+                
+                roi     = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
+
+                # Determinar si debe escalarse
+                should_scale, condition_met, reason = determine_scaling_action(spend, roi, name)
+                
+                row_index = scaling_results.append(
+                    account_id=account,
+                    adset_id=adset_id,
+                    name=name,
+                    spend=spend,
+                    revenue=revenue,
+                    roi=roi,
+                    should_scale=should_scale,
+                    condition_met=condition_met,
+                    reason=reason,
+                    scaled=False,
+                    scaling_result=None
+                )
 
             if should_scale:
-                # Obtener presupuesto actual desde los datos ya obtenidos (evita llamada adicional)
-                budget_info = get_adset_budget_from_data(a)
+                counts["elegibles"] += 1
+                # Obtener presupuesto actual desde los datos ya obtenidos (evita llamada adicional);
+                # si vienen del snapshot el budget puede haber cambiado: se lee en vivo antes de escalar
+                budget_info = get_adset_budget(adset_id) if from_snapshot else get_adset_budget_from_data(a)
                 current_budget = budget_info["daily_budget"] or budget_info["lifetime_budget"]
                 budget_type = budget_info["budget_type"]
                 
-                # Si no se obtuvo el budget en fetch_account_adsets, hacer llamada individual como fallback
+                # Si no se obtuvo el budget en iter_account_adsets, hacer llamada individual como fallback
                 if budget_type == "unknown":
-                    print(f"[WARNING] Budget no disponible en datos iniciales, haciendo llamada individual para {adset_id}...")
+                    log.warning("Budget no disponible en datos iniciales, haciendo llamada individual para %s...", adset_id)
                     budget_info = get_adset_budget(adset_id)
                     current_budget = budget_info["daily_budget"] or budget_info["lifetime_budget"]
                     budget_type = budget_info["budget_type"]
@@ -710,180 +883,274 @@ def escalamiento():
                 
                 if current_budget and budget_type != "unknown":
                     # Escalar presupuesto
-                    scaling_result = scale_adset_budget(adset_id, current_budget, budget_type)
-                    scaling_results[-1]["scaled"] = scaling_result["success"]
-                    scaling_results[-1]["scaling_result"] = scaling_result
+                    with span("mutaciones"):
+                        scaling_result = scale_adset_budget(adset_id, current_budget, budget_type)
+                    if scaling_result["success"]:
+                        incr("escalados")
+                    scaling_results.set(row_index, "scaled", scaling_result["success"])
+                    scaling_results.set(row_index, "scaling_result", scaling_result)
                     
                     if scaling_result["success"]:
+                        counts["escalados"] += 1
                         raw_budget = scaling_result.get('raw_new_budget', scaling_result['new_budget'])
-                        print(f"[ESCALADO] ESCALADO: {name[:50]}...")
-                        print(f"   [SPEND] Spend: ${spend:.2f} | [STATS] ROI: {roi:.2f}%")
-                        print(f"   [REASON] Razón: {reason}")
-                        print(f"   💵 Presupuesto: ${scaling_result['old_budget']:.2f} → ${scaling_result['new_budget']:.2f}")
-                        print(f"   🔢 Cálculo: ${scaling_result['old_budget']:.2f} × {scaling_result['multiplier']} = ${raw_budget:.2f} → ${scaling_result['new_budget']:.2f} (redondeado)")
-                        print()
+                        log.info("[ESCALADO] %s | Spend: $%.2f | ROI: %.2f%% | Presupuesto: $%.2f × %s = $%.2f → $%.2f | %s",
+                                 name[:50], spend, roi, scaling_result['old_budget'], scaling_result['multiplier'],
+                                 raw_budget, scaling_result['new_budget'], reason)
                         time.sleep(0.3)  # Throttling después de escalar para evitar rate limiting
                     else:
-                        print(f"[ERROR] ERROR ESCALANDO: {name[:50]}...")
-                        print(f"   [SPEND] Spend: ${spend:.2f} | [STATS] ROI: {roi:.2f}%")
-                        print(f"   [REASON] Razón: {reason}")
-                        print(f"   [ERROR] Error: {scaling_result.get('error', 'Error desconocido')}")
-                        print()
+                        counts["errores"] += 1
+                        log.error("ERROR ESCALANDO: %s | Spend: $%.2f | ROI: %.2f%% | %s | Error: %s",
+                                  name[:50], spend, roi, reason, scaling_result.get('error', 'Error desconocido'))
                 else:
-                    scaling_results[-1]["scaling_result"] = {"success": False, "error": "No se pudo obtener presupuesto"}
-                    print(f"[ERROR] ERROR: No se pudo obtener presupuesto para {name[:50]}...")
-                    print()
+                    counts["errores"] += 1
+                    scaling_results.set(row_index, "scaling_result", {"success": False, "error": "No se pudo obtener presupuesto"})
+                    log.error("No se pudo obtener presupuesto para %s", name[:50])
+            else:
+                log.debug("Sin escalar: %s | Spend: $%.2f | ROI: %.2f%% | %s", name[:50], spend, roi, reason)
+
+        log.info("Cuenta %s: %d activos | %d elegibles | %d escalados | %d errores | %d sin spend | %.1fs", account,
+                 counts["activos"], counts["elegibles"], counts["escalados"], counts["errores"], counts["sin_spend"],
+                 time.perf_counter() - account_start)
 
     # 3) Export de resultados de escalamiento
-    df = pd.DataFrame(scaling_results)
-    out = "scaling_report.csv"
-    df.to_csv(out, index=False)
+    with span("export"):
+        df = scaling_results.to_dataframe()
+        out = os.path.join(BASE_DIR, "scaling_report.csv")
+        df.to_csv(out, index=False)
+    add_rows("csv", len(df))
     
-    scaled_count = len([r for r in scaling_results if r["scaled"]])
-    eligible_count = len([r for r in scaling_results if r["should_scale"]])
+    scaled_count = scaling_results.count("scaled")
+    eligible_count = scaling_results.count("should_scale")
     
     print(f"[FILE] Reporte de escalamiento: {out}")
     print(f"[ESCALADO] Adsets escalados: {scaled_count}/{eligible_count} elegibles")
     print(f"[STATS] Total adsets revisados: {len(scaling_results)}")
+    commit_warm_snapshot()
+    print_transfer_summary()
+    print_call_percentiles()
+    print_circuit_summary()
+    _leadpier_fetcher.print_summary()
+    print_browser_summary()
+    _jobs.print_summary()
 
 # ================== MAIN ==================
+@with_cycle_metrics("revisión")
+@with_cycle_profile("revisión")
+@with_cycle_deadline(REVISAR_DEADLINE_SECONDS, "revisión")
 def revisar_y_actualizar():
     print("\n=== RUN", dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "UTC ===")
+    reset_transfer_stats()
+    warm = _warm_snapshot.start_cycle("revisión")  # restaurado solo en la primera corrida tras arrancar
 
     # Validar token de Leadpier antes de continuar
-    token_valid = ensure_leadpier_token()
+    with span("token"):
+        token_valid = validate_leadpier_token(warm)
     
-    if token_valid:
-        # Recargar el token actualizado
-        global LEADPIER_BEARER
-        load_dotenv(dotenv_path="enviorement.env", override=True)
-        LEADPIER_BEARER = os.getenv("LEADPIER_BEARER")
-    else:
+    if not token_valid:
         print("[WARNING] Token de Leadpier invalido. Continuando sin datos de Leadpier...")
         print("[WARNING] Solo se usaran datos de Facebook para tomar decisiones.")
 
     # 1) Leadpier - Intentar método principal primero
     print("Intentando obtener datos de Leadpier (método POST)...")
-    lp_df = fetch_leadpier_sources_df()
-    
-    # Si falla, intentar método fallback
-    if lp_df.empty:
-        print("Método POST falló, intentando método fallback (GET)...")
-        lp_df = fetch_leadpier_sources_df_fallback()
+    with span("leadpier"):
+        lp_df = leadpier_frame(token_valid, warm)
+    add_rows("leadpier", len(lp_df))
     
     if lp_df.empty:
-        print("[WARNING] Ambos métodos de Leadpier fallaron; no se toman acciones.")
+        print("[WARNING] Los métodos de Leadpier fallaron; no se toman acciones.")
         return
     else:
         print(f"[OK] Datos de Leadpier obtenidos: {len(lp_df)} registros")
 
     # 2) Obtener datos de spend para todas las cuentas de una vez
     print("Obteniendo datos de spend para todas las cuentas...")
-    all_spend_data = {}
     today = today_utc_minus_4_str()
-    
-    for account in AD_ACCOUNTS:
-        print(f"Obteniendo reporte de spend para cuenta {account}...")
-        spend_data = fetch_adsets_report(account, today, today)
-        all_spend_data.update(spend_data)
-        time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+    with span("insights"):
+        all_spend_data, incomplete_accounts = spend_today(today, warm)
+    add_rows("insights", len(all_spend_data))
     
     print(f"[OK] Datos de spend obtenidos para {len(all_spend_data)} adsets")
 
     # 3) Recorremos cuentas/adsets
-    results = []
+    results = ColumnarRecords(ADSETS_REPORT_SCHEMA)
     for account in AD_ACCOUNTS:
-        print(f"Cuenta {account}: adsets activos…")
-        adsets = fetch_account_adsets(account)
-        time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+        log.info("Cuenta %s: adsets activos…", account)
+        with span("throttle"):
+            time.sleep(1)  # Throttling entre cuentas para evitar rate limiting
+
+        account_start = time.perf_counter()
+        counts = Counter()
+        adsets, _ = account_adsets(account, warm)
+        for a in timed_iter(adsets, "adsets"):
+            if deadline_expired():
+                log.warning("[DEADLINE] Sin tiempo para seguir revisando %s; se exporta lo procesado", account)
+                break
+            counts["revisados"] += 1
 
-        for a in adsets:
             adset_id = a["id"]
             name     = a.get("name", "")
             status   = a.get("status", "")
 
-            name_norm = name.strip().lower()
-            row = lp_df[lp_df["adset_name_norm"] == name_norm]
+            if account in incomplete_accounts and adset_id not in all_spend_data:
+                # Reporte de spend incompleto: sin dato no se decide (spend 0 apagaría/escalaría mal)
+                counts["sin_spend"] += 1
+                log.debug("Sin spend conocido para %s (reporte incompleto): se omite", adset_id)
+                continue
 
-            revenue = float(row["revenue"].iloc[0]) if not row.empty else 0.0
-            epl     = row["epl"].iloc[0] if ("epl" in lp_df.columns and not row.empty) else None
-            epc     = row["epc"].iloc[0] if ("epc" in lp_df.columns and not row.empty) else None
+            with span("decisiones"):
+                name_norm = name.strip().lower()
+                row = lp_df[lp_df["adset_name_norm"] == name_norm]
 
-            # Obtener spend del diccionario optimizado
-            spend = all_spend_data.get(adset_id, 0.0)
-            if spend > 0:
-                print(f"[INFO] Adset {adset_id}: spend ${spend:.2f}")
-            else:
-                print(f"[DEBUG] Sin datos de spend para adset {adset_id} en fecha {today}")
-            
-            roi     = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
+                revenue = float(row["revenue"].iloc[0]) if not row.empty else 0.0
+                epl     = row["epl"].iloc[0] if ("epl" in lp_df.columns and not row.empty) else None
+                epc     = row["epc"].iloc[0] if ("epc" in lp_df.columns and not row.empty) else None
 
-            # Determinar acción según las reglas de negocio
-            action, reason = determine_adset_action(spend, roi, name)
-            
-            results.append({
-                "account_id": account,
-                "adset_id": adset_id,
-                "name": name,
-                "status": status,
-                "spend": spend,
-                "revenue": revenue,
-                "roi": roi,
-                "epl": epl,
-                "epc": epc,
-                "action": action,
-                "reason": reason,
-            })
+                # Obtener spend del diccionario optimizado
+                spend = all_spend_data.get(adset_id, 0.0)
+                if spend > 0:
+                    log.debug("Adset %s: spend $%.2f", adset_id, spend)
+                else:
+                    log.debug("Sin datos de spend para adset %s en fecha %s", adset_id, today)
+                
+                roi     = ((revenue - spend) / spend * 100.0) if spend > 0 else 0.0
+
+                # Determinar acción según las reglas de negocio
+                action, reason = determine_adset_action(spend, roi, name)
+                
+                results.append(
+                    account_id=account,
+                    adset_id=adset_id,
+                    name=name,
+                    status=status,
+                    spend=spend,
+                    revenue=revenue,
+                    roi=roi,
+                    epl=epl,
+                    epc=epc,
+                    action=action,
+                    reason=reason,
+                )
 
             # Aplicar acción si es necesario
             if action == "PAUSE" and status == "ACTIVE":
-                resp = pause_adset(adset_id)
+                with span("mutaciones"):
+                    resp = pause_adset(adset_id)
                 success = resp.get("success", False) if isinstance(resp, dict) else False
-                print(f"[PAUSADO] PAUSADO: {name[:50]}...")
-                print(f"   [SPEND] Spend: ${spend:.2f} | [STATS] ROI: {roi:.2f}%")
-                print(f"   [REASON] Razón: {reason}")
-                print(f"   [OK] Resultado: {'Éxito' if success else 'Error'}")
-                if not success:
-                    print(f"   [ERROR] Respuesta FB: {str(resp)[:100]}")
-                print()
+                if success:
+                    incr("pausados")
+                    counts["pausados"] += 1
+                    log.info("[PAUSADO] %s | Spend: $%.2f | ROI: %.2f%% | %s", name[:50], spend, roi, reason)
+                else:
+                    counts["errores"] += 1
+                    log.error("ERROR PAUSANDO: %s | Spend: $%.2f | ROI: %.2f%% | %s | Respuesta FB: %s",
+                              name[:50], spend, roi, reason, str(resp)[:100])
                 time.sleep(0.3)  # Throttling después de pausar para evitar rate limiting
             
             elif action == "KEEP":
-                print(f"[OK] MANTENER: {name[:50]}...")
-                print(f"   [SPEND] Spend: ${spend:.2f} | [STATS] ROI: {roi:.2f}%")
-                print(f"   [REASON] Razón: {reason}")
-                print()
+                counts["mantener"] += 1
+                log.debug("MANTENER: %s | Spend: $%.2f | ROI: %.2f%% | %s", name[:50], spend, roi, reason)
+
+        log.info("Cuenta %s: %d revisados | %d mantener | %d pausados | %d errores | %d sin spend | %.1fs", account,
+                 counts["revisados"], counts["mantener"], counts["pausados"], counts["errores"], counts["sin_spend"],
+                 time.perf_counter() - account_start)
 
     # 4) Export
-    df = pd.DataFrame(results)
-    out = "adsets_report.csv"
-    df.to_csv(out, index=False)
+    with span("export"):
+        df = results.to_dataframe()
+        out = os.path.join(BASE_DIR, "adsets_report.csv")
+        df.to_csv(out, index=False)
+    add_rows("csv", len(df))
     print(f"[FILE] Exportado: {out}  ({len(df)} filas)")
+    commit_warm_snapshot()
+    print_transfer_summary()
+    print_call_percentiles()
+    print_circuit_summary()
+    _leadpier_fetcher.print_summary()
+    print_browser_summary()
+    _jobs.print_summary()
 
 # ================== FUNCIONES CON JITTER ==================
 def revisar_con_jitter():
-    """Wrapper de revisar_y_actualizar con delay aleatorio"""
-    jitter = random.randint(0, 60)  # 0-60 segundos de jitter
-    if jitter > 0:
-        print(f"[JITTER] Esperando {jitter}s antes de ejecutar...")
-        time.sleep(jitter)
-    revisar_y_actualizar()
+    """Wrapper de revisar_y_actualizar con delay aleatorio (el jitter cuenta dentro del deadline)"""
+    with cycle_metrics("revisión"), cycle_deadline(REVISAR_DEADLINE_SECONDS, "revisión"):
+        jitter = random.randint(0, 60)  # 0-60 segundos de jitter
+        if jitter > 0:
+            print(f"[JITTER] Esperando {jitter}s antes de ejecutar...")
+            with span("jitter"):
+                time.sleep(jitter)
+        revisar_y_actualizar()
 
 def escalamiento_con_jitter():
-    """Wrapper de escalamiento con delay aleatorio"""
-    jitter = random.randint(0, 120)  # 0-120 segundos de jitter para escalamiento
-    if jitter > 0:
-        print(f"[JITTER] Esperando {jitter}s antes de escalar...")
-        time.sleep(jitter)
-    escalamiento()
+    """Wrapper de escalamiento con delay aleatorio (el jitter cuenta dentro del deadline)"""
+    with cycle_metrics("escalamiento"), cycle_deadline(ESCALAMIENTO_DEADLINE_SECONDS, "escalamiento"):
+        jitter = random.randint(0, 120)  # 0-120 segundos de jitter para escalamiento
+        if jitter > 0:
+            print(f"[JITTER] Esperando {jitter}s antes de escalar...")
+            with span("jitter"):
+                time.sleep(jitter)
+        escalamiento()
 
 def keep_alive_leadpier():
-    """Mantiene la sesión de LeadPier activa"""
+    """
+    Mantiene la sesión de LeadPier activa mientras se use; si lleva más de
+    BROWSER_IDLE_SECONDS sin obtener datos, cierra el navegador y reporta la memoria liberada.
+    También termina procesos de Chrome que quedaron huérfanos (drivers caídos sin quit)
+    """
+    get_browser_supervisor().reap()
+    
+    # Si un fetch por navegador sigue corriendo (p.ej. un camino perdedor del hedging) no hace falta
+    if not _browser_lock.acquire(blocking=False):
+        return
     try:
         session = get_leadpier_session(headless=True)
-        session.keep_alive()
+        if not session.evict_if_idle():
+            session.keep_alive()
     except Exception as e:
         print(f"[KEEP-ALIVE] Error: {e}")
+    finally:
+        _browser_lock.release()
+
+def print_browser_summary():
+    """Imprime estado y memoria del navegador undetected"""
+    stats = get_leadpier_session(headless=True).get_stats()
+    state = "abierto" if stats["driver_active"] else "cerrado"
+    print(f"\n🧭 NAVEGADOR: {state} | RSS: {format_rss(stats['driver_rss_bytes'])} "
+          f"| cierres por inactividad: {stats['evictions']} | liberado: {format_rss(stats['rss_freed_bytes'])}")
+    get_browser_supervisor().print_summary()
+
+def _cache_hit_ratios():
+    """Hit ratio de la caché de la sesión y del CacheManager global (si se instanció)"""
+    stats = get_leadpier_session(headless=True).get_stats()
+    lookups = stats["cache_hits"] + stats["cache_misses"]
+    ratios = [({"cache": "sesion"}, stats["cache_hits"] / lookups if lookups else None)]
+    manager_cache = peek_leadpier_cache()
+    if manager_cache is not None:
+        ratios.append(({"cache": "cache_manager"}, manager_cache.manager.hit_ratio()))
+    return ratios
+
+def start_metrics():
+    """Endpoint Prometheus opcional (METRICS_PORT); los gauges se calculan en cada scrape"""
+    if start_metrics_server() is None:
+        return
+    registry = get_registry()
+    registry.register_gauge("browser_rss_bytes", "RSS del navegador (chromedriver + Chrome y sus hijos)",
+                            lambda: get_leadpier_session(headless=True).get_stats()["driver_rss_bytes"])
+    registry.register_gauge("process_rss_bytes", "RSS del proceso del scheduler (sin el navegador)", process_rss)
+    registry.register_gauge("browser_processes", "Procesos de Chrome/chromedriver vivos registrados",
+                            lambda: get_browser_supervisor().live_processes()[0])
+    registry.register_gauge("browser_processes_rss_bytes", "RSS total de los procesos de navegador registrados",
+                            lambda: get_browser_supervisor().live_processes()[1])
+    registry.register_gauge("cache_hit_ratio", "Fracción de lecturas de LeadPier servidas desde caché",
+                            _cache_hit_ratios)
+    registry.register_gauge("job_queue_delay_seconds", "Demora entre el disparo y el inicio de la última corrida",
+                            _jobs.gauge("queue_delay_last"))
+    registry.register_gauge("job_runtime_seconds", "Duración de la última corrida de cada job",
+                            _jobs.gauge("runtime_last"))
+    registry.register_gauge("job_running_seconds", "Tiempo que lleva la corrida en curso (vacío si no corre)",
+                            _jobs.gauge("running_for"))
+    registry.register_gauge("job_skipped", "Disparos omitidos porque la corrida anterior seguía en curso",
+                            _jobs.gauge("skipped"))
+    registry.register_gauge("job_timeouts", "Corridas que excedieron su timeout", _jobs.gauge("timeouts"))
 
 def cleanup_on_exit():
     """Limpieza al salir del script"""
@@ -894,22 +1161,63 @@ def cleanup_on_exit():
         print("[CLEANUP] Sesiones cerradas correctamente")
     except:
         pass
+    killed = get_browser_supervisor().shutdown()
+    if killed:
+        print(f"[CLEANUP] {killed} proceso(s) de navegador huérfanos terminados")
 
 # ================== SCHEDULER ==================
-if __name__ == "__main__":
+# Cada job corre en su hilo: un ciclo lento no atrasa el keep-alive ni bloquea run_pending()
+_jobs = JobRunner()
+KEEP_ALIVE_TIMEOUT_SECONDS = 90
+
+def setup_runtime():
+    """Logging, vigilancia, métricas, señales y cleanup del proceso (también lo usa leadpier_daemon.py)"""
+    # Logging en segundo plano (LOG_LEVEL=DEBUG para ver el detalle por adset)
+    setup_logging()
+    
+    # Snapshots de tracemalloc entre ciclos (solo con MEMORY_WATCH=1)
+    install_memory_watchdog()
+    
     # Registrar cleanup al salir
     atexit.register(cleanup_on_exit)
     
+    # Endpoint de métricas en un hilo aparte (solo si METRICS_PORT está definido)
+    start_metrics()
+    
+    # kill -USR1 <pid> vuelca el buffer de llamadas HTTP a calls_dump.jsonl
+    install_dump_signal()
+    
+    # Profiling sin reiniciar: kill -USR2 <pid>, `python cycle_profiler.py armar N` o PROFILE_CYCLES=N
+    install_profile_signal()
+    
+    # Snapshot del último ciclo bueno: la primera revisión/escalamiento reusa lo que siga vigente
+    if WARM_SNAPSHOT:
+        _warm_snapshot.load(today_utc_minus_4_str())
+
+
+def process_signal_requests():
+    """Atiende desde el loop principal lo que pidieron SIGUSR1/SIGUSR2 (los handlers solo dejan el pedido)"""
+    process_pending_dump()
+    process_pending_arms()
+
+if __name__ == "__main__":
+    setup_runtime()
+    
     # Primera corrida ahora
     revisar_y_actualizar()
     
     # Primera corrida de escalamiento
     escalamiento()
 
-    # Schedulers con jitter para parecer más humano
-    schedule.every(10).minutes.do(revisar_con_jitter)  # Cada 10 minutos: apagado (con jitter)
-    schedule.every(1).hours.do(escalamiento_con_jitter)  # Cada 1 hora: escalamiento (con jitter)
-    schedule.every(2).minutes.do(keep_alive_leadpier)  # Cada 2 minutos: mantener sesión activa
+    # Schedulers con jitter para parecer más humano; revisión y escalamiento no se solapan entre sí
+    # (grupo "ciclos"): el escalamiento que llega durante una revisión espera y queda como demora en cola
+    schedule.every(REVISAR_INTERVAL_MINUTES).minutes.do(  # Cada 10 minutos: apagado (con jitter)
+        _jobs.add("revisión", revisar_con_jitter, timeout=REVISAR_DEADLINE_SECONDS, group="ciclos"))
+    schedule.every(ESCALAMIENTO_INTERVAL_MINUTES).minutes.do(  # Cada 1 hora: escalamiento (con jitter)
+        _jobs.add("escalamiento", escalamiento_con_jitter, timeout=ESCALAMIENTO_DEADLINE_SECONDS,
+                  overlap=OVERLAP_COALESCE, group="ciclos"))
+    schedule.every(2).minutes.do(  # Cada 2 minutos: mantener sesión activa
+        _jobs.add("keep-alive", keep_alive_leadpier, timeout=KEEP_ALIVE_TIMEOUT_SECONDS))
     
     # Mostrar horario actual y límite
     utc_minus_4_now = dt.datetime.utcnow() - dt.timedelta(hours=4)
@@ -917,7 +1225,9 @@ if __name__ == "__main__":
     print("[INFO] Schedulers activos:")
     print("   [STATS] Revisión y apagado: cada 10 minutos (+jitter 0-60s)")
     print("   [ESCALADO] Escalamiento: cada 1 hora (+jitter 0-120s)")
-    print("   [KEEP-ALIVE] Mantener sesión: cada 2 minutos")
+    print("   [KEEP-ALIVE] Mantener sesión: cada 2 minutos (cierre tras inactividad)")
+    if os.getenv("METRICS_PORT"):
+        print(f"   [METRICS] Prometheus: puerto {os.getenv('METRICS_PORT')} (/metrics)")
     print("   [STOP] Límite: Se detendrá a las 18:00 (6 PM) UTC-4")
     
     try:
@@ -931,6 +1241,7 @@ if __name__ == "__main__":
                 print("   El script se detendrá hasta mañana.")
                 break
                 
+            process_signal_requests()
             schedule.run_pending()
             time.sleep(1)
     except KeyboardInterrupt:
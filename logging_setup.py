@@ -0,0 +1,118 @@
+"""
+Logging con niveles y escritura en segundo plano
+- Los loops calientes (por adset) loguean a través de un QueueHandler: el hilo del ciclo solo
+  encola el registro; un QueueListener escribe a stdout (y a LOG_FILE si está definido)
+- INFO: una línea de resumen por cuenta y las mutaciones; DEBUG: detalle por adset
+- Nivel por entorno: LOG_LEVEL=DEBUG|INFO|WARNING (default INFO)
+"""
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE")
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+LOG_DATEFMT = "%H:%M:%S"
+
+ROOT_LOGGER = "leadpier"
+
+_lock = threading.Lock()
+_listener = None
+
+
+def get_logger(name):
+    """Logger hijo de 'leadpier' (p.ej. get_logger('revision') -> leadpier.revision)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def setup_logging(level=None, stream=None, log_file=None):
+    """
+    Configura el logger 'leadpier' con QueueHandler -> QueueListener (idempotente)
+
+    Args:
+        level: nivel (default: LOG_LEVEL del entorno)
+        stream: destino de consola (default: sys.stdout, igual que los print)
+        log_file: archivo adicional (default: LOG_FILE del entorno)
+
+    Returns:
+        el QueueListener en ejecución
+    """
+    global _listener
+    with _lock:
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(level or LOG_LEVEL)
+        if _listener is not None:
+            return _listener
+
+        formatter = logging.Formatter(LOG_FORMAT, LOG_DATEFMT)
+        handlers = [logging.StreamHandler(stream or sys.stdout)]
+        log_file = log_file or LOG_FILE
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(log_queue))
+        logger.propagate = False
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Vacía la cola y detiene el hilo escritor (se registra con atexit)"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        logger = logging.getLogger(ROOT_LOGGER)
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                logger.removeHandler(handler)
+        for handler in listener.handlers:
+            handler.flush()
+
+
+if __name__ == "__main__":
+    """Test de niveles y del escritor en segundo plano"""
+    import io
+    import time
+
+    print("\n" + "="*70)
+    print(" TEST: Logging con cola")
+    print("="*70 + "\n")
+
+    output = io.StringIO()
+    setup_logging(level="INFO", stream=output)
+    log = get_logger("test")
+    log.debug("detalle por adset %s", "123")
+    log.info("Cuenta %s: %d adsets", "act_1", 42)
+    stop_logging()
+    text = output.getvalue()
+    print(f"{'✓' if 'act_1: 42 adsets' in text else '✗'} INFO llega al destino")
+    print(f"{'✓' if 'detalle' not in text else '✗'} DEBUG se descarta en INFO")
+
+    class SlowStream(io.StringIO):
+        def write(self, s):
+            time.sleep(0.001)
+            return super().write(s)
+
+    slow = SlowStream()
+    setup_logging(level="DEBUG", stream=slow)
+    start = time.perf_counter()
+    for i in range(200):
+        log.debug("adset %d", i)
+    enqueue_s = time.perf_counter() - start
+    stop_logging()
+    print(f"{'✓' if enqueue_s < 0.1 else '✗'} El ciclo no espera al stdout lento: {enqueue_s * 1000:.1f} ms para 200 registros")
+    print(f"{'✓' if slow.getvalue().count('adset') == 200 else '✗'} stop_logging vacía la cola")
+
+    print("\n" + "="*70)
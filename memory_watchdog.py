@@ -0,0 +1,229 @@
+"""
+Vigilancia de memoria del scheduler (tracemalloc + RSS)
+- Opcional: MEMORY_WATCH=1 activa tracemalloc al arrancar (cuesta CPU y memoria extra)
+- Al cerrar cada ciclo toma un snapshot y lo compara con el del ciclo anterior:
+  sitios de asignación que más crecieron, memoria trazada y RSS del proceso
+- Avisa cuando el RSS o la memoria trazada crecen más de MEMORY_GROWTH_WARN_MB en un ciclo
+  (o el doble desde el primer ciclo), antes de que el worker se quede sin memoria
+"""
+import os
+import time
+import threading
+import tracemalloc
+
+from browser_processes import process_rss, format_rss
+from cycle_metrics import add_cycle_listener
+
+MEMORY_WATCH = os.getenv("MEMORY_WATCH", "0") == "1"
+MEMORY_WATCH_FRAMES = int(os.getenv("MEMORY_WATCH_FRAMES", "5"))
+MEMORY_WATCH_TOP = int(os.getenv("MEMORY_WATCH_TOP", "10"))
+MEMORY_GROWTH_WARN_MB = float(os.getenv("MEMORY_GROWTH_WARN_MB", "50"))
+MEMORY_SITE_MIN_KB = float(os.getenv("MEMORY_SITE_MIN_KB", "64"))  # sitios que crecen menos no se listan
+
+_MB = 1024 * 1024
+_STDLIB_DIR = os.path.dirname(os.__file__)
+
+
+class MemoryWatchdog:
+    """Compara snapshots de tracemalloc y el RSS del proceso entre ciclos"""
+
+    def __init__(self, frames=MEMORY_WATCH_FRAMES, top=MEMORY_WATCH_TOP, warn_mb=MEMORY_GROWTH_WARN_MB):
+        self.frames = frames
+        self.top = top
+        self.warn_bytes = warn_mb * _MB
+        self.site_min_bytes = MEMORY_SITE_MIN_KB * 1024
+        self.checks = 0
+        self.warnings = 0
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._previous = None       # (sitio -> (bytes, bloques), traced, rss)
+        self._baseline = None       # (traced, rss) del primer check
+
+    def start(self):
+        """Activa tracemalloc (si otro lo activó, se respeta su número de frames)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        print(f"[MEMORY] tracemalloc activo ({tracemalloc.get_traceback_limit()} frames); "
+              f"aviso si crece más de {self.warn_bytes / _MB:.0f} MB por ciclo")
+
+    def check(self, label="ciclo"):
+        """
+        Snapshot y comparación contra el check anterior
+
+        Returns:
+            dict con traced/rss actuales, crecimiento y top de sitios que crecieron (None si no hay tracemalloc)
+        """
+        if not tracemalloc.is_tracing():
+            return None
+
+        with self._lock:
+            start = time.perf_counter()
+            sites = _sites(tracemalloc.take_snapshot())
+            traced, peak = tracemalloc.get_traced_memory()
+            rss = process_rss()
+            self.checks += 1
+
+            if self._baseline is None:
+                self._baseline = (traced, rss)
+
+            growth_sites = []
+            traced_growth = rss_growth = None
+            if self._previous is not None:
+                previous_sites, previous_traced, previous_rss = self._previous
+                traced_growth = traced - previous_traced
+                rss_growth = rss - previous_rss if rss is not None and previous_rss is not None else None
+                for site, (size, count) in sites.items():
+                    previous_size, previous_count = previous_sites.get(site, (0, 0))
+                    if size - previous_size >= self.site_min_bytes:
+                        growth_sites.append({
+                            "site": site,
+                            "size_diff": size - previous_size,
+                            "count_diff": count - previous_count,
+                            "size": size,
+                        })
+                growth_sites.sort(key=lambda entry: entry["size_diff"], reverse=True)
+                del growth_sites[self.top:]
+
+            # Solo se conservan los totales por sitio del último check, no el snapshot completo
+            self._previous = (sites, traced, rss)
+            report = {
+                "label": label,
+                "traced_bytes": traced,
+                "traced_peak_bytes": peak,
+                "rss_bytes": rss,
+                "traced_growth_bytes": traced_growth,
+                "rss_growth_bytes": rss_growth,
+                "traced_since_start_bytes": traced - self._baseline[0],
+                "rss_since_start_bytes": (rss - self._baseline[1]
+                                          if rss is not None and self._baseline[1] is not None else None),
+                "growth_sites": growth_sites,
+                "snapshot_s": round(time.perf_counter() - start, 3),
+            }
+            report["warnings"] = self._warnings(report)
+            self.warnings += len(report["warnings"])
+            self.last_report = report
+        return report
+
+    def _warnings(self, report):
+        warnings = []
+        if report["rss_growth_bytes"] is not None and report["rss_growth_bytes"] > self.warn_bytes:
+            warnings.append(f"RSS creció {_format_mb(report['rss_growth_bytes'])} en un ciclo")
+        if report["traced_growth_bytes"] is not None and report["traced_growth_bytes"] > self.warn_bytes:
+            warnings.append(f"memoria Python creció {_format_mb(report['traced_growth_bytes'])} en un ciclo")
+        if report["rss_since_start_bytes"] is not None and report["rss_since_start_bytes"] > 2 * self.warn_bytes:
+            warnings.append(f"RSS creció {_format_mb(report['rss_since_start_bytes'])} desde el primer ciclo")
+        return warnings
+
+    def print_report(self, report):
+        """Imprime RSS, memoria trazada y los sitios que más crecieron"""
+        growth = ""
+        if report["rss_growth_bytes"] is not None:
+            growth = f" ({_format_mb(report['rss_growth_bytes'], signed=True)} en el ciclo)"
+        traced_growth = ""
+        if report["traced_growth_bytes"] is not None:
+            traced_growth = f" ({_format_mb(report['traced_growth_bytes'], signed=True)})"
+        print(f"\n🧠 MEMORIA {report['label']}: RSS {format_rss(report['rss_bytes'])}{growth} "
+              f"| Python {_format_mb(report['traced_bytes'])}{traced_growth} "
+              f"| snapshot {report['snapshot_s']:.2f}s")
+        for site in report["growth_sites"]:
+            print(f"   {_format_mb(site['size_diff'], signed=True):>10} {site['count_diff']:>+8} objs  {site['site']}")
+        for warning in report["warnings"]:
+            print(f"   [MEMORY WARNING] {warning}")
+
+    def on_cycle(self, record):
+        """Listener de cycle_metrics"""
+        report = self.check(record["cycle"])
+        if report is not None:
+            self.print_report(report)
+
+
+def _format_site(traceback):
+    """
+    Frame más interno fuera de la stdlib y de site-packages (el que identifica al código
+    del proyecto); si no hay ninguno, el más interno
+    """
+    frames = list(traceback)
+    for frame in reversed(frames):
+        if "site-packages" not in frame.filename and not frame.filename.startswith((_STDLIB_DIR, "<")):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+    frame = frames[-1]
+    return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+
+
+def _sites(snapshot):
+    """sitio -> (bytes, bloques), agrupando los tracebacks por su frame del proyecto"""
+    sites = {}
+    for stat in snapshot.statistics("traceback"):
+        if stat.traceback[-1].filename == tracemalloc.__file__:
+            continue
+        site = _format_site(stat.traceback)
+        size, count = sites.get(site, (0, 0))
+        sites[site] = (size + stat.size, count + stat.count)
+    return sites
+
+
+def _format_mb(n, signed=False):
+    return f"{n / _MB:+.1f} MB" if signed else f"{n / _MB:.1f} MB"
+
+
+_watchdog = None
+
+
+def get_memory_watchdog():
+    """Watchdog global (None si no se instaló)"""
+    return _watchdog
+
+
+def install_memory_watchdog(force=False):
+    """
+    Activa tracemalloc y el reporte por ciclo si MEMORY_WATCH=1 (o force=True)
+
+    Returns:
+        el MemoryWatchdog o None si está deshabilitado
+    """
+    global _watchdog
+    if _watchdog is not None:
+        return _watchdog
+    if not (MEMORY_WATCH or force):
+        return None
+    _watchdog = MemoryWatchdog()
+    _watchdog.start()
+    _watchdog.check("arranque")  # línea base
+    add_cycle_listener(_watchdog.on_cycle)
+    return _watchdog
+
+
+if __name__ == "__main__":
+    """Test: una fuga simulada entre ciclos aparece en el top y dispara el aviso"""
+    import tempfile
+    import cycle_metrics as cm
+    from cycle_metrics import cycle_metrics
+
+    print("\n" + "="*70)
+    print(" TEST: Vigilancia de memoria")
+    print("="*70 + "\n")
+
+    cm.METRICS_FILE = os.path.join(tempfile.mkdtemp(), "cycle_metrics.jsonl")
+    MEMORY_WATCH_FRAMES = 3
+    watchdog = install_memory_watchdog(force=True)
+    watchdog.warn_bytes = 5 * _MB
+
+    leaked = []
+
+    def leaky_cycle():
+        leaked.append([bytearray(1024) for _ in range(10_000)])  # ~10 MB que nunca se liberan
+
+    with cycle_metrics("revisión"):
+        leaky_cycle()
+    with cycle_metrics("revisión"):
+        leaky_cycle()
+
+    report = watchdog.last_report
+    top_site = report["growth_sites"][0]["site"] if report["growth_sites"] else ""
+    print(f"\n{'✓' if top_site.startswith('memory_watchdog.py') else '✗'} Sitio que más crece: {top_site}")
+    print(f"{'✓' if report['traced_growth_bytes'] > 9 * _MB else '✗'} Crecimiento trazado: {_format_mb(report['traced_growth_bytes'])}")
+    print(f"{'✓' if report['warnings'] else '✗'} Aviso por crecimiento: {report['warnings']}")
+    if report["rss_bytes"] is None:
+        print("· RSS no disponible (sin psutil ni /proc)")
+
+    print("\n" + "="*70)
@@ -0,0 +1,260 @@
+"""
+Consultas multi-ventana a Meta Insights
+Obtiene varias ventanas de spend (hoy, 7 días, ...) en un solo stream paginado
+y las agrega localmente en un mapa adset_id -> {ventana: spend}
+También expone `iter_records`, el recorrido paginado por generador que usan los scripts
+"""
+import json
+import time
+import queue
+import threading
+import contextvars
+import datetime as dt
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+GRAPH_API_VERSION = "v23.0"
+
+# Ventana = (since, until) en formato YYYY-MM-DD, inclusive
+Window = Tuple[str, str]
+
+# Campos que se conservan de cada fila de Insights
+WINDOW_ROW_FIELDS = ("adset_id", "spend", "date_start", "date_stop")
+
+
+def standard_windows(today: str, lookback_days=7) -> Dict[str, Window]:
+    """
+    Ventanas usadas por los scripts: hoy y los últimos `lookback_days` días hasta hoy
+
+    Args:
+        today: Fecha de hoy en UTC-4 (YYYY-MM-DD)
+    """
+    today_date = dt.date.fromisoformat(today)
+    since = (today_date - dt.timedelta(days=lookback_days)).isoformat()
+    return {
+        "today": (today, today),
+        f"{lookback_days}d": (since, today),
+    }
+
+
+def _paginate(get_fn: Callable, url: str, params: Dict, page_delay=0.0, fields: Optional[Tuple[str, ...]] = None):
+    """
+    Recorre las páginas de un endpoint de Graph
+
+    Args:
+        fields: si se pasan, se piden a `get_fn` en modo streaming (solo esos campos por registro)
+
+    Yields:
+        cada página (dict); una página vacía ({}) indica que la petición falló
+    """
+    while True:
+        page = (get_fn(url, params, fields=fields) if fields else get_fn(url, params)) or {}
+        yield page
+        next_url = page.get("paging", {}).get("next")
+        if not page.get("data") or not next_url:
+            break
+        url, params = next_url, {}  # 'next' ya trae la query completa
+        if page_delay:
+            time.sleep(page_delay)
+
+
+_PREFETCH_DONE = object()
+
+
+def _prefetch(iterator: Iterator, depth=1) -> Iterator:
+    """
+    Consume `iterator` en un thread, manteniendo hasta `depth` elementos adelantados
+    Mientras el consumidor procesa una página, la siguiente ya se está pidiendo
+    (el thread hereda el contexto del caller, incluido el deadline del ciclo)
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        # put con timeout para poder abandonar si el consumidor dejó de leer
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_PREFETCH_DONE, None))
+        except Exception as e:
+            put((_PREFETCH_DONE, e))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(produce,), daemon=True, name="graph-prefetch").start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def iter_records(get_fn: Callable, url: str, params: Dict, page_delay=0.0,
+                 fields: Optional[Tuple[str, ...]] = None, prefetch=True,
+                 status: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Recorre un endpoint paginado de Graph registro por registro
+
+    Solo hay en memoria la página actual (y la siguiente si `prefetch`); el recorrido
+    termina en la última página o en la primera que falle (igual que los loops de los scripts)
+
+    Args:
+        get_fn: función GET del script (fb_get)
+        page_delay: throttling entre páginas
+        fields: campos a conservar por registro (modo streaming de fb_get)
+        prefetch: pedir la página siguiente mientras se procesa la actual
+        status: dict opcional; queda status["complete"] = False si el recorrido cortó por una página fallida
+    """
+    if status is not None:
+        status["complete"] = True
+    pages = _paginate(get_fn, url, params, page_delay=page_delay, fields=fields)
+    if prefetch:
+        pages = _prefetch(pages)
+    for page in pages:
+        if not page and status is not None:
+            status["complete"] = False
+        yield from page.get("data", [])
+
+
+def fetch_adsets_windows(get_fn: Callable, access_token: str, account_id: str,
+                         windows: Dict[str, Window], page_delay=0.0) -> Tuple[Dict[str, Dict[str, float]], bool]:
+    """
+    Pide todas las ventanas en una sola consulta usando el parámetro `time_ranges`
+
+    Args:
+        get_fn: función GET del script (fb_get) con firma (url, params, fields=None) -> dict
+        access_token: token de Meta
+        account_id: cuenta publicitaria
+        windows: dict nombre -> (since, until)
+
+    Returns:
+        (dict adset_id -> {nombre_ventana: spend}, completo); si una página falla se devuelve lo
+        leído hasta ahí con completo=False (los adsets que faltan no tienen spend conocido, no 0)
+    """
+    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/insights"
+    params = {
+        "access_token": access_token,
+        "fields": "adset_id,spend",
+        "time_ranges": json.dumps([{"since": since, "until": until} for since, until in windows.values()]),
+        "level": "adset",
+        "limit": 1000
+    }
+
+    # Se agrega registro por registro: en memoria solo la página actual (y la siguiente en prefetch)
+    status = {}
+    rows = iter_records(get_fn, url, params, page_delay=page_delay, fields=WINDOW_ROW_FIELDS, status=status)
+    spend_map = aggregate_window_rows(rows, windows)
+    return spend_map, status["complete"]
+
+
+def aggregate_window_rows(rows: Iterable[Dict], windows: Dict[str, Window]) -> Dict[str, Dict[str, float]]:
+    """
+    Agrega filas de Insights (con date_start/date_stop) en adset_id -> {ventana: spend}
+    Todas las ventanas aparecen en el resultado (0.0 si el adset no tuvo spend en esa ventana)
+    """
+    window_by_range = {(since, until): name for name, (since, until) in windows.items()}
+    result: Dict[str, Dict[str, float]] = {}
+
+    for row in rows:
+        adset_id = row.get("adset_id")
+        name = window_by_range.get((row.get("date_start"), row.get("date_stop")))
+        if not adset_id or name is None:
+            continue
+        entry = result.setdefault(adset_id, {w: 0.0 for w in windows})
+        entry[name] += float(row.get("spend", 0) or 0)
+
+    return result
+
+
+def fetch_adsets_daily_spend(get_fn: Callable, access_token: str, account_id: str,
+                             since: str, until: str, page_delay=0.0) -> Optional[Dict[str, Dict[str, float]]]:
+    """
+    Pide el spend diario por adset de un rango en una sola consulta (`time_increment=1`)
+
+    Returns:
+        dict día -> {adset_id: spend} con todos los días del rango (vacío si no hubo spend),
+        o None si alguna página falló
+    """
+    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{account_id}/insights"
+    params = {
+        "access_token": access_token,
+        "fields": "adset_id,spend",
+        "time_range": json.dumps({"since": since, "until": until}),
+        "time_increment": 1,
+        "level": "adset",
+        "limit": 1000
+    }
+
+    start = dt.date.fromisoformat(since)
+    end = dt.date.fromisoformat(until)
+    daily: Dict[str, Dict[str, float]] = {
+        (start + dt.timedelta(days=i)).isoformat(): {} for i in range((end - start).days + 1)
+    }
+
+    status = {}
+    for row in iter_records(get_fn, url, params, page_delay=page_delay, fields=WINDOW_ROW_FIELDS, status=status):
+        adset_id = row.get("adset_id")
+        day = row.get("date_start")
+        if adset_id and day in daily:
+            daily[day][adset_id] = daily[day].get(adset_id, 0.0) + float(row.get("spend", 0) or 0)
+
+    return daily if status["complete"] else None
+
+
+def merge_window_maps(*maps: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Une mapas adset_id -> {ventana: spend} de varias cuentas"""
+    merged: Dict[str, Dict[str, float]] = {}
+    for spend_map in maps:
+        for adset_id, windows in spend_map.items():
+            merged.setdefault(adset_id, {}).update(windows)
+    return merged
+
+
+if __name__ == "__main__":
+    """Test del agregador multi-ventana"""
+    print("\n" + "="*70)
+    print(" TEST: Agregador multi-ventana de Insights")
+    print("="*70 + "\n")
+
+    windows = standard_windows("2025-01-08")
+    print(f"Ventanas: {windows}")
+
+    pages = [
+        {"data": [
+            {"adset_id": "1", "spend": "12.5", "date_start": "2025-01-08", "date_stop": "2025-01-08"},
+            {"adset_id": "1", "spend": "80", "date_start": "2025-01-01", "date_stop": "2025-01-08"},
+        ], "paging": {"next": "page2"}},
+        {"data": [
+            {"adset_id": "2", "spend": "30", "date_start": "2025-01-01", "date_stop": "2025-01-08"},
+        ]},
+    ]
+
+    def fake_get(url, params, fields=None):
+        return pages[0] if url.endswith("/insights") else pages[1]
+
+    spend_map, complete = fetch_adsets_windows(fake_get, "token", "act_1", windows)
+    print(f"Mapa: {spend_map}")
+    ok = complete and spend_map == {"1": {"today": 12.5, "7d": 80.0}, "2": {"today": 0.0, "7d": 30.0}}
+    print(f"{'✓' if ok else '✗'} Agregación correcta")
+
+    failing_get = lambda url, params, fields=None: pages[0] if url.endswith("/insights") else {}
+    partial_map, complete = fetch_adsets_windows(failing_get, "token", "act_1", windows)
+    print(f"{'✓' if not complete and list(partial_map) == ['1'] else '✗'} Página fallida: se conserva lo leído y se marca incompleto")
+
+    ids = [row["adset_id"] for row in iter_records(fake_get, "https://graph/act_1/insights", {})]
+    print(f"{'✓' if ids == ['1', '1', '2'] else '✗'} iter_records con prefetch: {ids}")
+
+    print("\n" + "="*70)
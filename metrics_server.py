@@ -0,0 +1,261 @@
+"""
+Endpoint de métricas estilo Prometheus para el scheduler
+- Opcional: solo se levanta si METRICS_PORT está definido (p.ej. METRICS_PORT=9108)
+- Se sirve desde un hilo daemon; nunca bloquea schedule.run_pending()
+- /calls devuelve el buffer de llamadas HTTP (call_recorder.py) en JSON lines
+- Se alimenta de los registros de cycle_metrics al cerrar cada ciclo y de gauges que
+  se evalúan en cada scrape (RSS del navegador, hit ratio del caché)
+"""
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from cycle_metrics import add_cycle_listener
+from call_recorder import get_call_recorder
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+CYCLE_BUCKETS = (5, 15, 30, 60, 120, 300, 540, 900, 1800, 3600)
+PREFIX = "leadpier_"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Counters, gauges e histogramas en memoria con exposición en formato texto de Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}         # nombre -> (tipo, ayuda)
+        self._values = {}       # nombre -> {labels -> valor}
+        self._histograms = {}   # nombre -> {labels -> [conteos por bucket, suma, total]}
+        self._buckets = {}
+        self._callbacks = {}    # nombre -> fn() -> valor o [(labels dict, valor)]
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._meta:
+            self._meta[name] = (kind, help_text)
+            self._values.setdefault(name, {})
+
+    def inc(self, name, help_text, labels=None, amount=1):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            self._values[name][key] = self._values[name].get(key, 0) + amount
+
+    def set(self, name, help_text, value, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._values[name][key] = value
+
+    def observe(self, name, help_text, value, labels=None, buckets=CYCLE_BUCKETS):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            self._buckets.setdefault(name, tuple(buckets))
+            series = self._histograms.setdefault(name, {}).setdefault(key, [[0] * len(buckets), 0.0, 0])
+            for i, bound in enumerate(self._buckets[name]):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def register_gauge(self, name, help_text, fn):
+        """Gauge calculado en cada scrape; fn devuelve un valor o una lista de (labels, valor)"""
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._callbacks[name] = fn
+
+    def render(self):
+        """Texto de exposición (text/plain; version=0.0.4)"""
+        lines = []
+        with self._lock:
+            meta = dict(self._meta)
+            values = {name: dict(series) for name, series in self._values.items()}
+            histograms = {name: {k: (list(v[0]), v[1], v[2]) for k, v in series.items()}
+                          for name, series in self._histograms.items()}
+            callbacks = dict(self._callbacks)
+
+        for name, (kind, help_text) in sorted(meta.items()):
+            full = PREFIX + name
+            samples = []
+            if name in callbacks:
+                try:
+                    result = callbacks[name]()
+                except Exception:
+                    result = None
+                if isinstance(result, list):
+                    samples = [(tuple(sorted(labels.items())), value) for labels, value in result if value is not None]
+                elif result is not None:
+                    samples = [((), result)]
+            elif kind != "histogram":
+                samples = sorted(values.get(name, {}).items())
+
+            if kind == "histogram" and not histograms.get(name):
+                continue
+            if kind != "histogram" and not samples:
+                continue
+
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "histogram":
+                bounds = self._buckets[name]
+                for labels, (counts, total_sum, count) in sorted(histograms[name].items()):
+                    for bound, bucket_count in zip(bounds, counts):
+                        lines.append(f"{full}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {bucket_count}")
+                    lines.append(f"{full}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(float(total_sum))}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {count}")
+            else:
+                for labels, value in samples:
+                    lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+_server = None
+
+
+def get_registry():
+    """Registro global de métricas"""
+    return _registry
+
+
+def _service(endpoint):
+    """'graph:/{id}/insights' -> 'graph'"""
+    return endpoint.split(":", 1)[0]
+
+
+def observe_cycle(record):
+    """Listener de cycle_metrics: traduce el registro de un ciclo a métricas"""
+    cycle = record["cycle"]
+    _registry.observe("cycle_duration_seconds", "Duración de cada ciclo", record["total_s"], {"cycle": cycle})
+    _registry.inc("cycles_total", "Ciclos ejecutados", {"cycle": cycle, "ok": str(record.get("ok", True)).lower()})
+    if record.get("ok", True):
+        _registry.set("cycle_last_success_timestamp_seconds", "Unix time del último ciclo exitoso",
+                      time.time(), {"cycle": cycle})
+
+    for endpoint, entry in record["calls"].items():
+        for status, count in entry["by_status"].items():
+            _registry.inc("http_requests_total", "Requests salientes por servicio, endpoint y status",
+                          {"service": _service(endpoint), "endpoint": endpoint, "status": status}, count)
+
+    counters = record.get("counters", {})
+    if counters.get("throttle_17"):
+        _registry.inc("graph_throttle_total", "Respuestas de Graph con error code 17 (rate limit)",
+                      amount=counters["throttle_17"])
+    for mutation in ("pausados", "escalados"):
+        if counters.get(mutation):
+            _registry.inc("mutations_total", "Mutaciones aplicadas en Graph", {"type": mutation}, counters[mutation])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in ("/metrics", "/"):
+            body = _registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/calls":
+            # Volcado del buffer de llamadas HTTP (JSON lines)
+            body = "".join(json.dumps(record.to_dict()) + "\n"
+                           for record in get_call_recorder().records()).encode("utf-8")
+            content_type = "application/x-ndjson"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # sin logs por scrape
+
+
+def start_metrics_server(port=None):
+    """
+    Levanta el endpoint /metrics en un hilo daemon
+
+    Args:
+        port: puerto (default: METRICS_PORT del entorno; sin puerto no se levanta nada)
+
+    Returns:
+        el servidor o None si está deshabilitado / no se pudo abrir el puerto
+    """
+    global _server
+    if _server is not None:
+        return _server
+
+    port = port if port is not None else os.getenv("METRICS_PORT", "")
+    if port == "":
+        return None
+
+    try:
+        server = ThreadingHTTPServer((METRICS_HOST, int(port)), _MetricsHandler)
+    except OSError as e:
+        print(f"[METRICS] No se pudo abrir el puerto {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    add_cycle_listener(observe_cycle)
+    _server = server
+    print(f"[METRICS] Endpoint Prometheus en http://{METRICS_HOST}:{server.server_address[1]}/metrics")
+    return server
+
+
+if __name__ == "__main__":
+    """Test del endpoint: un ciclo simulado y un scrape real"""
+    import urllib.request
+    from cycle_metrics import cycle_metrics, record_call, incr
+    import cycle_metrics as cm
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Endpoint de métricas")
+    print("="*70 + "\n")
+
+    cm.METRICS_FILE = os.path.join(tempfile.mkdtemp(), "cycle_metrics.jsonl")
+    server = start_metrics_server(port=0)
+    _registry.register_gauge("browser_rss_bytes", "RSS del navegador", lambda: 123456)
+
+    with cycle_metrics("revisión"):
+        record_call("graph:/{id}/insights", 0.3, 200)
+        record_call("graph:/{id}/insights", 0.1, 400)
+        record_call("leadpier:/v1/api/stats/user/sources", 0.5, 200)
+        incr("throttle_17")
+        incr("pausados", 2)
+
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    text = urllib.request.urlopen(url, timeout=5).read().decode()
+    checks = [
+        'leadpier_cycle_duration_seconds_count{cycle="revisión"} 1',
+        'leadpier_http_requests_total{endpoint="graph:/{id}/insights",service="graph",status="400"} 1',
+        'leadpier_graph_throttle_total 1',
+        'leadpier_mutations_total{type="pausados"} 2',
+        'leadpier_browser_rss_bytes 123456',
+        'leadpier_cycle_last_success_timestamp_seconds{cycle="revisión"}',
+    ]
+    for check in checks:
+        print(f"{'✓' if check in text else '✗'} {check}")
+
+    from call_recorder import record_http_call
+    record_http_call("GET", "graph:/{id}", 200, 1, 0.05)
+    calls = urllib.request.urlopen(url.replace("/metrics", "/calls"), timeout=5).read().decode().splitlines()
+    print(f"{'✓' if calls and json.loads(calls[-1])['endpoint'] == 'graph:/{id}' else '✗'} /calls devuelve el buffer")
+
+    print("\n" + "="*70)
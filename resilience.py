@@ -0,0 +1,237 @@
+"""
+Deadline por ciclo y circuit breaker por endpoint
+- Cada ciclo (revisión, escalamiento, activación) corre dentro de un deadline menor a su intervalo
+- Timeouts y esperas entre reintentos se recortan al tiempo restante del ciclo
+- Un endpoint que falla repetidamente se abre y falla rápido; se prueba de nuevo pasado el reset
+"""
+import os
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Tiempo mínimo para que valga la pena lanzar una request
+MIN_REQUEST_SECONDS = float(os.getenv("MIN_REQUEST_SECONDS", "2"))
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+
+
+class DeadlineExceeded(Exception):
+    """El ciclo se quedó sin tiempo"""
+
+
+class CircuitOpenError(Exception):
+    """El endpoint tiene el circuito abierto (falla rápido sin hacer la request)"""
+
+
+class Deadline:
+    """Instante límite de un ciclo (reloj monotónico)"""
+
+    def __init__(self, seconds, name="ciclo"):
+        self.name = name
+        self.budget = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def clamp_timeout(self, timeout):
+        """Recorta un timeout al tiempo restante; DeadlineExceeded si no alcanza para una request"""
+        remaining = self.remaining()
+        if remaining < MIN_REQUEST_SECONDS:
+            raise DeadlineExceeded(f"Deadline de {self.name} agotado ({self.budget:.0f}s)")
+        return min(timeout, remaining) if timeout else remaining
+
+
+_current_deadline = contextvars.ContextVar("cycle_deadline", default=None)
+
+
+def current_deadline():
+    """Deadline del ciclo en curso (None fuera de un ciclo)"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def cycle_deadline(seconds, name="ciclo"):
+    """
+    Ejecuta el bloque dentro de un deadline; si ya hay uno activo (p.ej. el wrapper con jitter
+    lo abrió antes) se respeta el existente
+    """
+    active = _current_deadline.get()
+    if active is not None:
+        yield active
+        return
+
+    deadline = Deadline(seconds, name)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+        print(f"[DEADLINE] {name}: {deadline.elapsed():.1f}s de {seconds:.0f}s")
+
+
+def with_cycle_deadline(seconds, name=None):
+    """Decorador: corre la función dentro de `cycle_deadline(seconds)`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with cycle_deadline(seconds, name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def deadline_expired():
+    """True si el ciclo en curso ya no tiene tiempo para más requests"""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.remaining() < MIN_REQUEST_SECONDS
+
+
+def budgeted_sleep(seconds):
+    """
+    Espera entre reintentos descontada del deadline
+
+    Returns:
+        True si durmió; False si la espera más una request no entran en el tiempo restante
+        (el caller debe dejar de reintentar)
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.remaining() < seconds + MIN_REQUEST_SECONDS:
+        print(f"[DEADLINE] Sin tiempo para esperar {seconds}s y reintentar ({deadline.remaining():.0f}s restantes)")
+        return False
+    time.sleep(seconds)
+    return True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un endpoint
+    - closed: pasan todas las requests; N fallas seguidas -> open
+    - open: falla rápido hasta que pase `reset_seconds` -> half-open
+    - half-open: pasa una sola request de prueba; éxito -> closed, falla -> open
+    """
+
+    def __init__(self, endpoint, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Decide si la request puede salir; CircuitOpenError si el circuito está abierto"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuito abierto para {self.endpoint}")
+                self.state = "half-open"
+                print(f"[CIRCUIT] {self.endpoint}: half-open, enviando request de prueba")
+
+            if self.state == "half-open":
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuito en prueba para {self.endpoint}")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"[CIRCUIT] {self.endpoint}: cerrado nuevamente")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Libera la prueba en curso sin contarla (la request no llegó a tener resultado del endpoint)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half-open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"[CIRCUIT] {self.endpoint}: abierto tras {self.consecutive_failures} fallas "
+                          f"(reintento en {self.reset_seconds:.0f}s)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint):
+    """Obtiene (o crea) el circuit breaker de una plantilla de endpoint"""
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+    return breaker
+
+
+def print_circuit_summary():
+    """Imprime los circuitos que no están cerrados o que rechazaron requests"""
+    troubled = [b for b in _breakers.values() if b.state != "closed" or b.rejected]
+    if not troubled:
+        return
+    print("\n🔌 CIRCUIT BREAKERS:")
+    for breaker in troubled:
+        print(f"   {breaker.endpoint}: {breaker.state} | fallas seguidas: {breaker.consecutive_failures} "
+              f"| requests rechazadas: {breaker.rejected}")
+
+
+if __name__ == "__main__":
+    """Test de deadline y circuit breaker"""
+    print("\n" + "="*70)
+    print(" TEST: Deadline y circuit breaker")
+    print("="*70 + "\n")
+
+    with cycle_deadline(3, "test") as deadline:
+        print(f"{'✓' if deadline.clamp_timeout(30) <= 3 else '✗'} Timeout recortado al deadline")
+        print(f"{'✓' if not budgeted_sleep(5) else '✗'} Espera de 5s rechazada con 3s de presupuesto")
+        with cycle_deadline(100) as inner:
+            print(f"{'✓' if inner is deadline else '✗'} Deadline anidado reutiliza el existente")
+
+    breaker = CircuitBreaker("graph:/{id}/insights", failure_threshold=2, reset_seconds=0.2)
+    breaker.record_failure()
+    breaker.record_failure()
+    try:
+        breaker.allow()
+        print("✗ El circuito debería estar abierto")
+    except CircuitOpenError:
+        print("✓ Circuito abierto tras 2 fallas")
+    time.sleep(0.25)
+    breaker.allow()
+    print(f"{'✓' if breaker.state == 'half-open' else '✗'} Half-open tras el reset")
+    breaker.record_success()
+    print(f"{'✓' if breaker.state == 'closed' else '✗'} Cerrado tras la prueba exitosa")
+
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(0.25)
+    breaker.allow()
+    breaker.release_probe()  # la prueba terminó sin resultado (p.ej. URL inválida)
+    try:
+        breaker.allow()
+        print("✓ Prueba liberada: el half-open acepta otra request de prueba")
+    except CircuitOpenError:
+        print("✗ El half-open quedó rechazando para siempre")
+
+    print("\n" + "="*70)
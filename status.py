@@ -86,7 +86,8 @@ def check_system():
         "leadpier_cookies.pkl",
         "leadpier_cache.json",
         "detection_state.json",
-        "cache_index.json"
+        "cache_index.json",
+        "chromedriver_cache.json"
     ]
     
     for filename in files:
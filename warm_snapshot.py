@@ -0,0 +1,310 @@
+"""
+Snapshot del último ciclo bueno para arrancar en caliente
+- Cada ciclo registra sus partes en una etapa propia (contextvar) que solo se confirma y se guarda
+  de forma atómica si el ciclo termina (`commit_cycle`): un ciclo cortado o caído no deja nada
+- Partes: el frame de LeadPier, los adsets activos por cuenta con sus budgets, el mapa de spend
+  del día y el hash del token con su vencimiento (el token en sí nunca se escribe a disco)
+- Al arrancar se recarga y se valida cada parte por edad (WARM_SNAPSHOT_MAX_AGE_MINUTES),
+  el spend además por día y el token por su vencimiento
+- Solo la primera corrida de cada ciclo usa lo restaurado (`claim`); las siguientes piden todo en vivo
+- Desactivar con WARM_SNAPSHOT=0
+"""
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+import contextvars
+
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WARM_SNAPSHOT = os.getenv("WARM_SNAPSHOT", "1") == "1"
+WARM_SNAPSHOT_FILE = os.getenv("WARM_SNAPSHOT_FILE", os.path.join(BASE_DIR, "warm_snapshot.json"))
+WARM_SNAPSHOT_MAX_AGE_MINUTES = float(os.getenv("WARM_SNAPSHOT_MAX_AGE_MINUTES", "15"))
+WARM_TOKEN_MAX_AGE_MINUTES = float(os.getenv("WARM_TOKEN_MAX_AGE_MINUTES", "60"))  # si el token no trae exp
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
+
+SNAPSHOT_VERSION = 2  # v1 guardaba el token en claro: se descarta
+
+# Partes registradas por el ciclo en curso (None fuera de un ciclo: no se registra nada)
+_cycle_stage = contextvars.ContextVar("warm_snapshot_stage", default=None)
+
+
+def token_expiry(bearer):
+    """Vencimiento (epoch) del claim `exp` si el token es un JWT; None si no se puede leer"""
+    try:
+        payload = bearer.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except (AttributeError, IndexError, ValueError, TypeError):
+        return None
+
+
+def token_hash(bearer):
+    return hashlib.sha256(bearer.encode("utf-8")).hexdigest()
+
+
+def frame_to_json(df):
+    return {"columns": list(df.columns), "data": df.values.tolist()}
+
+
+def frame_from_json(data):
+    return pd.DataFrame(data["data"], columns=data["columns"])
+
+
+class RestoredState:
+    """Partes del snapshot que pasaron la validación (None si no sirven)"""
+
+    def __init__(self, token_hash=None, token_expires_at=None, leadpier=None, spend=None, spend_day=None,
+                 adsets=None, age=None):
+        self.token_hash = token_hash
+        self.token_expires_at = token_expires_at
+        self.leadpier = leadpier
+        self.spend = spend
+        self.spend_day = spend_day
+        self.adsets = adsets or {}
+        self.age = age
+
+    def token_valid_for(self, bearer):
+        """True si el token restaurado es el actual y no vence pronto (se puede omitir la validación)"""
+        return (self.token_hash is not None and bool(bearer) and self.token_hash == token_hash(bearer)
+                and self.token_expires_at - time.time() > TOKEN_EXPIRY_MARGIN_SECONDS)
+
+    def spend_for(self, day):
+        """Mapa de spend restaurado si es del mismo día (None si no)"""
+        return self.spend if self.spend is not None and self.spend_day == day else None
+
+    def is_empty(self):
+        return self.token_hash is None and self.leadpier is None and self.spend is None and not self.adsets
+
+
+class WarmSnapshot:
+    """Estado del último ciclo bueno: se registra por ciclo, se confirma al terminarlo y se restaura al arrancar"""
+
+    def __init__(self, path=WARM_SNAPSHOT_FILE, max_age_minutes=WARM_SNAPSHOT_MAX_AGE_MINUTES):
+        self.path = path
+        self.max_age = max_age_minutes * 60
+        self._lock = threading.Lock()
+        self._parts = {}        # parte -> {"saved_at", ...}; solo partes de ciclos terminados
+        self._restored = None
+        self._claimed = set()
+
+    # ---------- registro por ciclo ----------
+    def start_cycle(self, cycle):
+        """
+        Abre la etapa del ciclo que arranca (en el contexto actual)
+
+        Returns:
+            estado restaurado para la primera corrida de `cycle` (ver claim)
+        """
+        _cycle_stage.set({})
+        return self.claim(cycle)
+
+    def _record(self, part, **data):
+        stage = _cycle_stage.get()
+        if stage is not None:
+            stage[part] = {"saved_at": time.time(), **data}
+
+    def record_token(self, bearer):
+        """Token recién validado (solo su hash); vence en su `exp` o WARM_TOKEN_MAX_AGE_MINUTES después"""
+        if bearer:
+            expires_at = token_expiry(bearer) or time.time() + WARM_TOKEN_MAX_AGE_MINUTES * 60
+            self._record("token", sha256=token_hash(bearer), expires_at=expires_at)
+
+    def record_leadpier(self, df):
+        if df is not None and not df.empty:
+            self._record("leadpier", frame=frame_to_json(df))
+
+    def record_spend(self, day, spend_map):
+        self._record("spend", day=day, spend=spend_map)
+
+    def record_adsets(self, account, rows):
+        """Adsets activos de una cuenta (solo si se recorrieron completos)"""
+        stage = _cycle_stage.get()
+        if stage is not None:
+            stage.setdefault("adsets", {})[account] = {"saved_at": time.time(), "rows": rows}
+
+    def commit_cycle(self):
+        """Confirma las partes del ciclo que terminó y guarda; devuelve True si se escribió"""
+        stage = _cycle_stage.get()
+        _cycle_stage.set(None)
+        if not stage:
+            return False
+        with self._lock:
+            for part, data in stage.items():
+                if part == "adsets":
+                    self._parts.setdefault("adsets", {}).update(data)
+                else:
+                    self._parts[part] = data
+        return self.save()
+
+    # ---------- persistencia ----------
+    def save(self):
+        """Escritura atómica (tmp + os.replace): un corte a mitad nunca deja un snapshot roto"""
+        with self._lock:
+            if not self._parts:
+                return False
+            state = {"version": SNAPSHOT_VERSION, "updated_at": time.time(), "parts": self._parts}
+            tmp_file = self.path + ".tmp"
+            try:
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.path)
+                return True
+            except (OSError, TypeError, ValueError) as e:
+                print(f"[WARM] Error al guardar snapshot: {e}")
+                return False
+
+    def load(self, today):
+        """
+        Lee el snapshot y valida cada parte (edad, día del spend, vencimiento del token)
+
+        Args:
+            today: fecha actual en la zona de los reportes (el spend de otro día no sirve)
+
+        Returns:
+            RestoredState (vacío si no hay snapshot o nada pasó la validación)
+        """
+        restored = RestoredState()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            print("[WARM] Sin snapshot previo - arranque en frío")
+            self._restored = restored
+            return restored
+        except (OSError, ValueError) as e:
+            print(f"[WARM] Snapshot ilegible ({e}) - arranque en frío")
+            self._restored = restored
+            return restored
+
+        if state.get("version") != SNAPSHOT_VERSION:
+            print(f"[WARM] Snapshot de otra versión ({state.get('version')}) - arranque en frío")
+            self._restored = restored
+            return restored
+
+        now = time.time()
+        parts = state.get("parts", {})
+        fresh = lambda part: part is not None and now - part.get("saved_at", 0) <= self.max_age
+        kept = {}
+
+        token = parts.get("token")
+        if token and token.get("sha256") and token.get("expires_at", 0) - now > TOKEN_EXPIRY_MARGIN_SECONDS:
+            restored.token_hash, restored.token_expires_at = token["sha256"], token["expires_at"]
+            kept["token"] = token
+
+        leadpier = parts.get("leadpier")
+        if fresh(leadpier):
+            try:
+                restored.leadpier = frame_from_json(leadpier["frame"])
+                kept["leadpier"] = leadpier
+            except (KeyError, ValueError) as e:
+                print(f"[WARM] Frame de LeadPier inválido: {e}")
+
+        spend = parts.get("spend")
+        if fresh(spend) and spend.get("day") == today:
+            restored.spend, restored.spend_day = spend["spend"], today
+            kept["spend"] = spend
+
+        adsets = {account: entry for account, entry in parts.get("adsets", {}).items() if fresh(entry)}
+        restored.adsets = {account: entry["rows"] for account, entry in adsets.items()}
+        if adsets:
+            kept["adsets"] = adsets
+
+        restored.age = now - state.get("updated_at", now)
+        with self._lock:
+            # Lo restaurado conserva su saved_at: guardarlo de nuevo no lo rejuvenece
+            for part, data in kept.items():
+                self._parts.setdefault(part, data)
+        self._restored = restored
+        self.print_summary(restored)
+        return restored
+
+    def claim(self, cycle):
+        """Estado restaurado para la primera corrida de `cycle` (None en las siguientes o si no hay)"""
+        with self._lock:
+            if self._restored is None or self._restored.is_empty() or cycle in self._claimed:
+                return None
+            self._claimed.add(cycle)
+            return self._restored
+
+    def print_summary(self, restored):
+        parts = []
+        if restored.token_hash is not None:
+            parts.append(f"token (vence en {(restored.token_expires_at - time.time()) / 60:.0f} min)")
+        if restored.leadpier is not None:
+            parts.append(f"LeadPier ({len(restored.leadpier)} filas)")
+        if restored.spend is not None:
+            parts.append(f"spend ({len(restored.spend)} adsets)")
+        if restored.adsets:
+            parts.append(f"adsets de {len(restored.adsets)} cuenta(s)")
+        if parts:
+            print(f"\n♨️  ARRANQUE EN CALIENTE (snapshot de hace {restored.age / 60:.1f} min): {', '.join(parts)}")
+        else:
+            print(f"[WARM] Snapshot de hace {restored.age / 60:.1f} min vencido - arranque en frío")
+
+
+if __name__ == "__main__":
+    """Test: etapa por ciclo, guardado atómico, recarga y validación por edad, día y vencimiento"""
+    import tempfile
+
+    print("\n" + "="*70)
+    print(" TEST: Snapshot de arranque en caliente")
+    print("="*70 + "\n")
+
+    path = os.path.join(tempfile.mkdtemp(), "warm_snapshot.json")
+    exp = time.time() + 3600
+    jwt = "x." + base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=") + ".y"
+    print(f"{'✓' if abs(token_expiry(jwt) - exp) < 1 and token_expiry('opaco') is None else '✗'} Vencimiento del JWT")
+
+    snapshot = WarmSnapshot(path)
+    lp_df = pd.DataFrame({"adset_name_norm": ["a", "b"], "revenue": [10.5, float("nan")], "epl": [1, 2]})
+    snapshot.start_cycle("revisión")
+    snapshot.record_leadpier(lp_df)
+    snapshot.save()  # p.ej. al salir con el ciclo a medias
+    print(f"{'✓' if not os.path.exists(path) else '✗'} Un ciclo sin terminar no se guarda")
+
+    snapshot.start_cycle("revisión")
+    snapshot.record_token(jwt)
+    snapshot.record_leadpier(lp_df)
+    snapshot.record_spend("2024-01-01", {"1": 12.5})
+    snapshot.record_adsets("act_1", [{"id": "1", "name": "A", "status": "ACTIVE", "daily_budget": "5000"}])
+    snapshot.commit_cycle()
+    print(f"{'✓' if os.path.exists(path) and not os.path.exists(path + '.tmp') else '✗'} Ciclo terminado: guardado atómico")
+    with open(path, encoding="utf-8") as f:
+        print(f"{'✓' if jwt not in f.read() else '✗'} El token no se escribe en claro")
+
+    restored = WarmSnapshot(path).load("2024-01-01")
+    print(f"{'✓' if restored.leadpier is not None and restored.leadpier.shape == (2, 3) else '✗'} Frame de LeadPier restaurado")
+    print(f"{'✓' if restored.token_valid_for(jwt) and not restored.token_valid_for('otro') else '✗'} Token vigente")
+    print(f"{'✓' if restored.adsets['act_1'][0]['daily_budget'] == '5000' else '✗'} Adsets con budget")
+
+    other_day = WarmSnapshot(path).load("2024-01-02")
+    print(f"{'✓' if other_day.spend_for('2024-01-02') is None and other_day.leadpier is not None else '✗'} Spend de otro día descartado")
+
+    old = WarmSnapshot(path, max_age_minutes=0)
+    time.sleep(0.01)
+    stale = old.load("2024-01-01")
+    print(f"{'✓' if stale.leadpier is None and not stale.adsets and stale.token_hash is not None else '✗'} Datos viejos descartados (el token vale por su vencimiento)")
+
+    warm = WarmSnapshot(path)
+    warm.load("2024-01-01")
+    first, second, other = warm.claim("revisión"), warm.claim("revisión"), warm.claim("escalamiento")
+    print(f"{'✓' if first is not None and second is None and other is not None else '✗'} Solo la primera corrida de cada ciclo lo usa")
+
+    with open(path, encoding="utf-8") as f:
+        original = json.load(f)["parts"]["leadpier"]["saved_at"]
+    time.sleep(0.01)
+    warm.start_cycle("escalamiento")
+    warm.record_spend("2024-01-01", {"1": 13.0})
+    warm.commit_cycle()
+    with open(path, encoding="utf-8") as f:
+        resaved = json.load(f)["parts"]["leadpier"]["saved_at"]
+    print(f"{'✓' if resaved == original else '✗'} Re-guardar no rejuvenece lo restaurado")
+
+    print("\n" + "="*70)